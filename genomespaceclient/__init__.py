@@ -1,4 +1,19 @@
-from .client import GSDataFormat  # noqa
-from .client import GSFileMetadata  # noqa
-from .client import GenomeSpaceClient  # noqa
+import sys
+
 from .shell import main  # noqa
+
+if sys.version_info >= (3, 7):
+    # Import the client on first use, so that the genomespace command does
+    # not load requests and the storage libraries before parsing arguments
+    _CLIENT_EXPORTS = ('GSDataFormat', 'GSFileMetadata', 'GenomeSpaceClient')
+
+    def __getattr__(name):
+        if name in _CLIENT_EXPORTS:
+            from . import client
+            return getattr(client, name)
+        raise AttributeError(
+            "module {0!r} has no attribute {1!r}".format(__name__, name))
+else:
+    from .client import GSDataFormat  # noqa
+    from .client import GSFileMetadata  # noqa
+    from .client import GenomeSpaceClient  # noqa
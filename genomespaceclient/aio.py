@@ -0,0 +1,608 @@
+"""
+An asyncio based GenomeSpace client, with the same interface as
+:class:`genomespaceclient.GenomeSpaceClient` but with all methods as
+coroutines. Requires Python 3.5.3 or later and aiohttp, which can be installed
+with ``pip install python-genomespaceclient[async]``.
+"""
+import asyncio
+import collections
+import errno
+import glob
+import logging
+import os
+import re
+import time
+from urllib.parse import urlparse
+
+from genomespaceclient import gs_glob
+from genomespaceclient import storage_handlers
+from genomespaceclient.client import DEFAULT_TIMEOUT
+from genomespaceclient.client import GSDirectoryListing
+from genomespaceclient.client import GSFileMetadata
+from genomespaceclient.exceptions import GSClientException
+from genomespaceclient.workers import TaskResult
+from genomespaceclient.workers import TransferSummary
+from genomespaceclient.workers import check_results
+
+try:
+    import aiohttp
+    from yarl import URL
+except ImportError:
+    aiohttp = None
+
+
+log = logging.getLogger(__name__)
+
+
+class AsyncGenomeSpaceClient(object):
+    """
+    A simple asyncio GenomeSpace client
+    """
+
+    def __init__(self, username=None, password=None, token=None,
+                 session=None, pool_size=100, timeout=DEFAULT_TIMEOUT):
+        """
+        Constructs a new asyncio GenomeSpace client. A username/password
+        combination or a token must be supplied.
+
+        :type username: :class:`str`
+        :param username: GenomeSpace username
+
+        :type password: :class:`str`
+        :param password: GenomeSpace password
+
+        :type token: :class:`str`
+        :param token: A GenomeSpace auth token. If supplied, the token will be
+                      used instead of the username/password.
+
+        :type session: :class:`aiohttp.ClientSession`
+        :param session: An externally configured session to use for all
+                        requests. If not supplied, the client creates its own
+                        session when first used.
+
+        :type pool_size: :class:`int`
+        :param pool_size: Maximum number of simultaneous connections per
+                          host. Ignored if a session is supplied.
+
+        :type timeout: :class:`tuple`
+        :param timeout: A (connect, read) tuple of timeouts in seconds, or a
+                        single value for both. Use None to wait forever.
+        """
+        if aiohttp is None:
+            raise GSClientException(
+                "aiohttp is required for AsyncGenomeSpaceClient. Install it"
+                " with: pip install python-genomespaceclient[async]")
+        self.username = username
+        self.password = password
+        self.token = token
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self._session = session
+        self._owns_session = session is None
+        self._auth_lock = None
+
+    @property
+    def session(self):
+        # aiohttp sessions must be created within a running event loop
+        if self._session is None:
+            if isinstance(self.timeout, tuple):
+                connect_timeout, read_timeout = self.timeout
+            else:
+                connect_timeout = read_timeout = self.timeout
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit_per_host=self.pool_size),
+                timeout=aiohttp.ClientTimeout(total=None,
+                                              sock_connect=connect_timeout,
+                                              sock_read=read_timeout))
+        return self._session
+
+    async def close(self):
+        """
+        Closes the client's session. Externally supplied sessions are left
+        open.
+        """
+        if self._owns_session and self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    async def _get_gs_auth_cookie(self, server_url):
+        """
+        Returns a cookie containing a GenomeSpace auth token.
+        If an auth token was not provided at client initalisation, a request
+        is made to the identity server to obtain a new session token.
+        """
+        if not self.token:
+            if self._auth_lock is None:
+                self._auth_lock = asyncio.Lock()
+            async with self._auth_lock:
+                # another task may have logged in while we waited
+                if not self.token:
+                    self.token = await self._login(server_url)
+        return {"gs-token": self.token}
+
+    async def _login(self, server_url):
+        parsed_uri = urlparse(server_url)
+        url = "{uri.scheme}://{uri.netloc}/identityServer/basic".format(
+            uri=parsed_uri)
+        async with self.session.get(
+                url, auth=aiohttp.BasicAuth(self.username,
+                                            self.password)) as response:
+            response.raise_for_status()
+            cookie = response.cookies.get("gs-token")
+            return cookie.value if cookie else None
+
+    async def _api_generic_request(self, method, genomespace_url,
+                                   headers=None, body=None,
+                                   allow_redirects=True):
+        """
+        Makes a request to a GenomeSpace API endpoint, after adding some
+        standard headers, including authentication headers.
+
+        :return: the response, with its body already read. Raises an
+                 exception in case of an unexpected response.
+        """
+        req_headers = {'Accept': 'application/json',
+                       'Content-Type': 'application/json'}
+        req_headers.update(headers or {})
+
+        cookies = await self._get_gs_auth_cookie(genomespace_url)
+        response = await self.session.request(
+            method, genomespace_url, cookies=cookies, headers=req_headers,
+            data=body, allow_redirects=allow_redirects)
+        try:
+            response.raise_for_status()
+            await response.read()
+        finally:
+            response.release()
+        return response
+
+    async def _api_json_request(self, method, genomespace_url, headers=None,
+                                body=None):
+        response = await self._api_generic_request(
+            method, genomespace_url, headers=headers, body=body)
+        if "application/json" not in response.headers["content-type"]:
+            raise GSClientException("Expected json content but received: %s" %
+                                    (response.headers["content-type"],))
+        return await response.json()
+
+    async def _internal_copy(self, source, destination):
+        if not gs_glob.is_same_genomespace_server(source, destination):
+            raise GSClientException(
+                "Copying between two different GenomeSpace servers is"
+                " currently unsupported.")
+        dest_is_dir = await self._is_dir_path(destination)
+        async for f in gs_iglob(self, source):
+            if dest_is_dir:
+                basename = os.path.basename(f)
+                dstname = destination + "/" + basename
+            else:
+                dstname = destination
+            # GS internal copies automatically handle files or folders
+            copy_source = f.replace(
+                gs_glob.GENOMESPACE_URL_REGEX.match(f).group(1), "/")
+            await self._api_json_request(
+                "PUT", dstname, headers={'x-gs-copy-source': copy_source})
+
+    async def _get_download_info(self, genomespace_url):
+        response = await self._api_generic_request(
+            "GET", genomespace_url, allow_redirects=False)
+        # GenomeSpace may redirect to another API URL before redirecting to
+        # the actual storage URL. See GenomeSpaceClient._get_download_info
+        redirect_count = 0
+        while gs_glob.is_genomespace_url(response.headers['Location']):
+            response = await self._api_generic_request(
+                "GET", response.headers['Location'], allow_redirects=False)
+            if redirect_count > 4:
+                raise GSClientException("Too many redirects while trying to"
+                                        " fetch: {}".format(genomespace_url))
+            redirect_count += 1
+
+        return response.headers
+
+    async def _run_task(self, results, key, coro):
+        """
+        Awaits a coroutine and records its outcome as a
+        :class:`TaskResult`, so that a failure does not cancel its siblings.
+        """
+        try:
+            results.append(TaskResult(key, value=await coro))
+        except Exception as e:
+            log.debug("Task %s failed: %s", key, e)
+            results.append(TaskResult(key, error=e))
+
+    async def _upload(self, source, destination, recurse, limit):
+        dest_is_dir = await self._is_dir_path(destination)
+
+        start_time = time.time()
+        results = []
+        tasks = []
+        for f in glob.iglob(source):
+            if dest_is_dir:
+                basename = os.path.basename(f)
+                dstname = destination + "/" + basename
+            else:
+                dstname = destination
+
+            if os.path.isdir(f):
+                if dest_is_dir:
+                    coro = self._upload_tree(results, f, dstname, recurse,
+                                             limit)
+                else:
+                    raise GSClientException(
+                        "Source is a folder, and therefore, the"
+                        " destination must also be a folder.")
+            else:
+                coro = self._upload_file(f, dstname, limit)
+            tasks.append(self._run_task(results, f, coro))
+        await asyncio.gather(*tasks)
+        check_results(results, "uploading")
+        return TransferSummary(results, time.time() - start_time)
+
+    async def _upload_tree(self, results, source, destination, recurse,
+                           limit, create_path=True):
+        async with limit:
+            await self.mkdir(destination, create_path=create_path)
+        tasks = []
+        for item in os.listdir(source):
+            srcname = os.path.join(source, item)
+            dstname = destination + "/" + item
+            if os.path.isdir(srcname) and recurse:
+                coro = self._upload_tree(results, srcname, dstname, recurse,
+                                         limit, create_path=False)
+            else:
+                coro = self._upload_file(srcname, dstname, limit)
+            tasks.append(self._run_task(results, srcname, coro))
+        await asyncio.gather(*tasks)
+
+    async def _upload_file(self, source, destination, limit):
+        async with limit:
+            url = destination.replace("/datamanager/v1.0/file/",
+                                      "/datamanager/v1.0/uploadinfo/")
+            upload_info = await self._api_json_request("GET", url)
+            handler = storage_handlers.create_handler(
+                upload_info.get("uploadType"))
+            # Uploads go through the storage provider's blocking SDK
+            loop = asyncio.get_event_loop()
+            return await loop.run_in_executor(None, handler.upload, source,
+                                              upload_info)
+
+    async def _download(self, source, destination, recurse, limit):
+        dest_is_dir = await self._is_dir_path(destination)
+
+        start_time = time.time()
+        results = []
+        tasks = []
+        async for f, entry in gs_iglob_entries(self, source):
+            if dest_is_dir:
+                basename = os.path.basename(f)
+                dstname = destination + "/" + basename
+            else:
+                dstname = destination
+
+            if await self._is_dir_entry(entry, f):
+                if dest_is_dir:
+                    coro = self._download_tree(results, f, dstname, recurse,
+                                               limit)
+                else:
+                    raise GSClientException(
+                        "Source is a folder, and therefore, the"
+                        " destination must also be a folder.")
+            else:
+                coro = self._download_file(f, dstname, limit)
+            tasks.append(self._run_task(results, f, coro))
+        await asyncio.gather(*tasks)
+        check_results(results, "downloading")
+        return TransferSummary(results, time.time() - start_time)
+
+    async def _download_tree(self, results, source, destination, recurse,
+                             limit):
+        async with limit:
+            listing = await self.list(source)
+        try:
+            os.makedirs(destination)
+        except OSError as e:
+            # be happy if someone already created the path
+            if e.errno != errno.EEXIST:
+                raise
+        tasks = []
+        for item in listing.contents:
+            srcname = source + "/" + item.name
+            dstname = os.path.join(destination, item.name)
+            async with limit:
+                is_dir = recurse and await self._is_dir_entry(item, srcname)
+            if is_dir:
+                coro = self._download_tree(results, srcname, dstname,
+                                           recurse, limit)
+            else:
+                coro = self._download_file(srcname, dstname, limit)
+            tasks.append(self._run_task(results, srcname, coro))
+        await asyncio.gather(*tasks)
+
+    async def _download_file(self, source, destination, limit):
+        async with limit:
+            download_info = await self._get_download_info(source)
+            location = download_info['Location']
+            if not destination or os.path.isdir(destination):
+                filename = os.path.basename(urlparse(location).path)
+                destination = os.path.join(destination, filename)
+            bytes_copied = 0
+            # Storage URLs are usually signed, so must be sent unaltered
+            async with self.session.get(URL(location, encoded=True)) as resp:
+                resp.raise_for_status()
+                with open(destination, 'wb') as handle:
+                    async for block in resp.content.iter_chunked(65536):
+                        handle.write(block)
+                        bytes_copied += len(block)
+            return bytes_copied
+
+    async def _is_dir_path(self, path):
+        if gs_glob.is_genomespace_url(path):
+            return await self.isdir(path)
+        else:
+            return os.path.isdir(path)
+
+    async def _is_dir_entry(self, entry, genomespace_url):
+        """
+        Async equivalent of :func:`gs_glob.is_dir_entry`.
+        """
+        is_dir = gs_glob.entry_is_dir(entry)
+        if is_dir is None:
+            return await self.isdir(genomespace_url)
+        return is_dir
+
+    async def copy(self, source, destination, recurse=False, parallel=10):
+        """
+        Copies a file to/from/within GenomeSpace. See
+        :meth:`GenomeSpaceClient.copy`.
+
+        :type parallel: :class:`int`
+        :param parallel: Maximum number of files to transfer, and folders
+                         to create or list, concurrently.
+
+        :rtype: :class:`genomespaceclient.workers.TransferSummary`
+        :return: Per-file results and aggregate throughput of an upload or
+                 download. None for copies within GenomeSpace.
+        """
+        log.debug("copy: %s -> %s", source, destination)
+
+        limit = asyncio.Semaphore(parallel)
+        if gs_glob.is_genomespace_url(
+                source) and gs_glob.is_genomespace_url(destination):
+            await self._internal_copy(source, destination)
+        elif gs_glob.is_genomespace_url(
+                source) and not gs_glob.is_genomespace_url(destination):
+            return await self._download(source, destination, recurse, limit)
+        elif not gs_glob.is_genomespace_url(
+                source) and gs_glob.is_genomespace_url(destination):
+            return await self._upload(source, destination, recurse, limit)
+        else:
+            raise GSClientException(
+                "Either source or destination must be a valid GenomeSpace"
+                " location")
+
+    async def move(self, source, destination):
+        """
+        Moves a file within GenomeSpace. See :meth:`GenomeSpaceClient.move`.
+        """
+        log.debug("move: %s -> %s", source, destination)
+        if gs_glob.is_genomespace_url(source):
+            await self.copy(source, destination)
+            await self.delete(source)
+        else:
+            raise GSClientException(
+                "Source must be a valid GenomeSpace location")
+
+    async def list(self, genomespace_url):
+        """
+        Returns a :class:`GSDirectoryListing` of a GenomeSpace folder. See
+        :meth:`GenomeSpaceClient.list`.
+        """
+        log.debug("list: %s", genomespace_url)
+        json_data = await self._api_json_request("GET", genomespace_url)
+        return GSDirectoryListing.from_json(json_data)
+
+    async def delete(self, genomespace_url, recurse=False, parallel=10):
+        """
+        Deletes a file or folder within GenomeSpace. The contents of a folder
+        are deleted concurrently. See :meth:`GenomeSpaceClient.delete`.
+
+        :type parallel: :class:`int`
+        :param parallel: Maximum number of requests to make concurrently
+                         when deleting recursively.
+        """
+        log.debug("delete: %s", genomespace_url)
+        limit = asyncio.Semaphore(parallel)
+        async for f, entry in gs_iglob_entries(self, genomespace_url):
+            await self._delete_item(f, limit, recurse, entry)
+
+    async def _delete_item(self, genomespace_url, limit, recurse=False,
+                           entry=None):
+        # The limit is only held for each request, since the contents of a
+        # folder must be deleted before the folder itself
+        async with limit:
+            is_dir = recurse and await self._is_dir_entry(entry,
+                                                          genomespace_url)
+            if is_dir:
+                listing = await self.list(genomespace_url)
+        if is_dir:
+            await asyncio.gather(*[
+                self._delete_item(f.url, limit, recurse=recurse, entry=f)
+                for f in listing.contents])
+
+        async with limit:
+            try:
+                await self._api_generic_request("DELETE", genomespace_url)
+            except aiohttp.ClientResponseError as e:
+                if e.status == 404:
+                    # Folders become non-existent on openstack
+                    # when the last file gets deleted, so ignore
+                    pass
+                else:
+                    raise e
+
+    async def isdir(self, genomespace_url):
+        """
+        Returns True if a given genomespace_url is a directory
+        """
+        try:
+            md = await self.get_metadata(genomespace_url)
+            return md.is_directory
+        except GSClientException:
+            return False
+        except aiohttp.ClientResponseError as e:
+            if e.status == 404:
+                return False
+            else:
+                raise e
+
+    async def mkdir(self, genomespace_url, create_path=True):
+        """
+        Creates a folder at a given location. See
+        :meth:`GenomeSpaceClient.mkdir`.
+        """
+        log.debug("mkdir: %s", genomespace_url)
+        if create_path:
+            dirname, _ = os.path.split(genomespace_url)
+            if gs_glob.is_genomespace_url(dirname):
+                await self.mkdir(dirname, create_path)
+
+        return await self._api_json_request("PUT", genomespace_url,
+                                            body='{"isDirectory": true}')
+
+    async def get_metadata(self, genomespace_url):
+        """
+        Returns the :class:`GSFileMetadata` of a GenomeSpace file or folder.
+        See :meth:`GenomeSpaceClient.get_metadata`.
+        """
+        log.debug("get_metadata: %s", genomespace_url)
+        url = re.sub(r"((http[s]?://.*/datamanager/)(v[0-9]+.[0-9]+/)?file)",
+                     r'\g<2>v1.0/filemetadata', genomespace_url)
+        json_data = await self._api_json_request("GET", url)
+        return GSFileMetadata.from_json(json_data)
+
+    async def get_remaining_token_time(self, genomespace_url):
+        """
+        Gets the time to live of the gs-token in milliseconds, or 0 if there
+        is no token. See :meth:`GenomeSpaceClient.get_remaining_token_time`.
+        """
+        if not self.token:
+            return 0
+        url_components = urlparse(genomespace_url)
+        location = '{uri.scheme}://{uri.netloc}' \
+                   '/identityServer/usermanagement/utility/token/remainingTime'
+        url = location.format(uri=url_components)
+        async with self.session.get(
+                url, cookies={"gs-token": self.token}) as result:
+            if result.status == 200:
+                return int(await result.text())
+        return 0
+
+
+class _GlobIterator(object):
+    """
+    Iterates with ``async for`` over the (path, entry) tuples matching a
+    pattern, matched by a :class:`gs_glob._Globber` as the blocking client
+    does. The folders reached at each level are fetched concurrently, up to
+    ``max_workers`` at a time, and their matches are yielded as soon as each
+    folder is listed. Async generators are only available from Python 3.6.
+    """
+
+    def __init__(self, client, gs_path, max_workers, entries=True):
+        self.client = client
+        self.gs_path = gs_path
+        self.max_workers = max_workers
+        self.entries = entries
+        self._globber = None
+        self._limit = None
+        self._matches = collections.deque()
+        self._started = False
+        self._done = False
+        self._completed = None
+        self._remaining = 0
+        self._next_states = []
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        while not self._matches:
+            if self._done:
+                raise StopAsyncIteration
+            await self._advance()
+        match = self._matches.popleft()
+        return match if self.entries else match[0]
+
+    async def _advance(self):
+        if not self._started:
+            self._started = True
+            await self._start()
+        elif self._remaining:
+            self._remaining -= 1
+            states = await next(self._completed)
+            self._matches.extend(
+                self._globber.expand(states, self._next_states))
+        elif self._next_states:
+            self._start_level(self._next_states)
+        else:
+            self._done = True
+
+    async def _start(self):
+        # Ignore query_str while globbing, but add it back before returning
+        dirname, basename, query_str = gs_glob.gs_path_split(self.gs_path)
+        if not gs_glob.is_genomespace_url(dirname):
+            self._done = True
+        elif not gs_glob.has_magic(self.gs_path):
+            # Patterns ending with a slash should match only directories
+            if basename or await self.client.isdir(dirname):
+                self._matches.append((self.gs_path, None))
+            self._done = True
+        else:
+            self._globber = gs_glob._Globber(self.gs_path, query_str)
+            self._limit = asyncio.Semaphore(self.max_workers)
+            self._start_level(self._globber.start())
+
+    def _start_level(self, states):
+        self._next_states = []
+        folders = self._globber.group(states)
+        self._remaining = len(folders)
+        self._completed = iter(asyncio.as_completed(
+            [self._fetch(url, folder_states)
+             for url, folder_states in folders]))
+
+    async def _fetch(self, url, states):
+        async with self._limit:
+            if self._globber.needs_isdir(url, states):
+                self._globber.set_isdir(url, await self.client.isdir(url))
+            if self._globber.needs_listing(url, states):
+                listing = await self.client.list(url + "/")
+                self._globber.set_listing(url, listing.contents)
+        return states
+
+
+def gs_iglob(client, gs_path, max_workers=gs_glob.GLOB_MAX_WORKERS):
+    """
+    Async equivalent of :func:`genomespaceclient.gs_glob.gs_iglob`, for use
+    with an :class:`AsyncGenomeSpaceClient`.
+
+    E.g.
+
+    .. code-block:: python
+
+        async for path in gs_iglob(client, ".../Home/folder1/*.txt"):
+            print(path)
+    """
+    return _GlobIterator(client, gs_path, max_workers, entries=False)
+
+
+def gs_iglob_entries(client, gs_path, max_workers=gs_glob.GLOB_MAX_WORKERS):
+    """
+    Async equivalent of :func:`genomespaceclient.gs_glob.gs_iglob_entries`.
+    """
+    return _GlobIterator(client, gs_path, max_workers)
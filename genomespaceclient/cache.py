@@ -0,0 +1,95 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache(object):
+    """
+    A thread-safe cache holding at most ``max_size`` entries. When full, the
+    least recently used entry is evicted. Entries expire ``ttl`` seconds
+    after they were stored, or never if ``ttl`` is None. A ``max_size`` of 0
+    disables the cache, so that every lookup is a miss.
+
+    The number of cache hits and misses is recorded in the ``hits`` and
+    ``misses`` attributes.
+    """
+
+    def __init__(self, max_size=1000, ttl=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.max_size > 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None or (entry[1] is not None and
+                                 entry[1] <= time.time()):
+                self.misses += 1
+                return default
+            # re-insert to mark as most recently used
+            self._entries[key] = entry
+            self.hits += 1
+            return entry[0]
+
+    def peek(self, key, default=None):
+        """
+        Returns an unexpired entry without marking it as recently used or
+        counting a hit or miss.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or (entry[1] is not None and
+                                 entry[1] <= time.time()):
+                return default
+            return entry[0]
+
+    def put(self, key, value, ttl=None):
+        """
+        Stores a value in the cache. ``ttl`` overrides the default time to
+        live of the cache for this entry only.
+        """
+        if not self.enabled:
+            return
+        ttl = self.ttl if ttl is None else ttl
+        expires = time.time() + ttl if ttl is not None else None
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (value, expires)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def invalidate_prefix(self, prefix):
+        """
+        Removes all entries whose key starts with the given prefix.
+        """
+        with self._lock:
+            for key in [k for k in self._entries if k.startswith(prefix)]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __contains__(self, key):
+        """
+        Checks whether an unexpired entry exists, without marking it as
+        recently used or counting a hit or miss.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and (entry[1] is None or
+                                          entry[1] > time.time())
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,151 @@
+import base64
+import binascii
+import hashlib
+import threading
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+# Size of the blocks in which files are read for hashing
+READ_BLOCK_SIZE = 1024 * 1024
+
+
+class StreamHasher(object):
+    """
+    Computes checksums of data as it is transferred, on a background
+    thread, so that hashing overlaps with network and disk I/O. hashlib
+    releases the GIL while hashing large buffers, so the transfer is not
+    slowed down by the hashing.
+
+    Data is either passed in directly with :meth:`update`, or read back
+    from a file which has just been written with :meth:`update_from_file`,
+    in the order in which it appears in the stream. At most ``max_pending``
+    updates are queued, to bound memory use when hashing falls behind.
+
+    If no algorithms are given, no thread is started and all updates are
+    ignored, so that callers need not check whether checksums are wanted.
+    """
+
+    def __init__(self, algorithms, max_pending=16):
+        self._hashes = [(algorithm, hashlib.new(algorithm))
+                        for algorithm in algorithms]
+        self._queue = queue.Queue(max_pending)
+        self._error = None
+        self._cancelled = False
+        self._digests = None
+        self._thread = None
+        if self._hashes:
+            self._thread = threading.Thread(target=self._run)
+            self._thread.daemon = True
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            if self._error is not None or self._cancelled:
+                continue
+            try:
+                if isinstance(item, tuple):
+                    self._hash_file(*item)
+                else:
+                    self._update(item)
+            except Exception as e:
+                self._error = e
+
+    def _update(self, data):
+        for _, hash_object in self._hashes:
+            hash_object.update(data)
+
+    def _hash_file(self, path, offset, length):
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            while length > 0 and not self._cancelled:
+                block = f.read(min(length, READ_BLOCK_SIZE))
+                if not block:
+                    raise IOError("%s is shorter than expected" % (path,))
+                self._update(block)
+                length -= len(block)
+
+    @property
+    def enabled(self):
+        return self._thread is not None
+
+    def update(self, data):
+        if self._thread is not None:
+            self._queue.put(data)
+
+    def update_from_file(self, path, offset, length):
+        if self._thread is not None and length > 0:
+            self._queue.put((path, offset, length))
+
+    def hexdigests(self):
+        """
+        Waits for all queued data to be hashed, and returns a dict of
+        algorithm name to checksum as a hexadecimal string.
+        """
+        if self._digests is None:
+            self.close()
+            if self._error is not None:
+                raise self._error
+            self._digests = dict((algorithm, hash_object.hexdigest())
+                                 for algorithm, hash_object in self._hashes)
+        return self._digests
+
+    def close(self):
+        """
+        Stops the background thread once all queued data has been hashed.
+        """
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+
+    def cancel(self):
+        """
+        Stops the background thread without hashing the queued data, after
+        a transfer has failed.
+        """
+        self._cancelled = True
+        self.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.cancel()
+
+
+def content_md5(digest):
+    """
+    Returns the value of a Content-MD5 header for a binary MD5 digest.
+    """
+    return base64.b64encode(digest).decode('ascii')
+
+
+def md5_from_content_md5(value):
+    """
+    Converts a base64 encoded Content-MD5 header to a hexadecimal MD5
+    checksum. Returns None if the value is not a valid MD5 checksum.
+    """
+    try:
+        digest = base64.b64decode(value.strip())
+    except (binascii.Error, TypeError, ValueError):
+        return None
+    if len(digest) != 16:
+        return None
+    return binascii.hexlify(digest).decode('ascii')
+
+
+def multipart_etag(part_digests):
+    """
+    Returns the ETag which S3 assigns to an object uploaded in parts with
+    the given binary MD5 digests.
+    """
+    return '%s-%d' % (hashlib.md5(b"".join(part_digests)).hexdigest(),
+                      len(part_digests))
@@ -1,30 +1,102 @@
 import errno
 import glob
+import io
 import logging
 import os
 import re
+import shutil
+import threading
+import time
+import weakref
 
+from genomespaceclient import cache
 from genomespaceclient import gs_glob
+from genomespaceclient import progress as progress_module
+from genomespaceclient import remote_file
 from genomespaceclient import storage_handlers
+from genomespaceclient import util
+from genomespaceclient import workers
 from genomespaceclient.exceptions import GSClientException
 
 import requests
 from requests.exceptions import HTTPError
 
 try:
-    from urllib.parse import urlparse
+    from urllib.parse import unquote, urlparse
 except ImportError:
+    from urllib import unquote
     from urlparse import urlparse
 
 
 log = logging.getLogger(__name__)
 
+# (connect, read) timeouts in seconds used for all HTTP requests
+DEFAULT_TIMEOUT = (10, 300)
+
+# Number of times an interrupted download is resumed before giving up
+MAX_RESUME_ATTEMPTS = 5
+
+# Modification times which differ by no more than this many seconds are
+# considered equal when syncing, to allow for coarse remote timestamps
+SYNC_MTIME_TOLERANCE = 2
+
+# Auth tokens are renewed this many seconds before they expire
+TOKEN_REFRESH_MARGIN = 300
+
+# Presigned storage URLs which will expire within this many seconds are not
+# reused for further downloads
+PRESIGNED_URL_EXPIRY_MARGIN = 60
+
+# Seconds for which upload credentials without an advertised expiry time
+# are reused for further uploads to the same folder
+UPLOAD_INFO_TTL = 600
+
+GENOMESPACE_API_FILE_REGEX = re.compile(
+    r"((http[s]?://.*/datamanager/)(v[0-9]+.[0-9]+/)?(filemetadata|file))")
+
+
+# Placeholder for nested metadata which has not been parsed yet
+_UNPARSED = object()
+
+
+def _lazy_property(name, parse):
+    """
+    Returns a property which parses the raw JSON stored in the slot
+    ``_<name>_json`` on first access, and keeps the result in ``_<name>``.
+    """
+    slot = "_" + name
+    json_slot = slot + "_json"
+
+    def getter(self):
+        value = getattr(self, slot)
+        if value is _UNPARSED:
+            value = parse(getattr(self, json_slot))
+            setattr(self, slot, value)
+            setattr(self, json_slot, None)
+        return value
+
+    def setter(self, value):
+        setattr(self, slot, value)
+        setattr(self, json_slot, None)
+
+    return property(getter, setter)
+
 
 class GSDataFormat(object):
     """
     See: http://www.genomespace.org/support/api/restful-access-to-dm#appendix_c
+
+    Data formats parsed from JSON are shared between all metadata which
+    refers to them, and should therefore not be modified. Only the most
+    recently used ``SHARED_FORMATS`` are kept for sharing.
     """
 
+    __slots__ = ('name', 'url', 'file_extension', 'description')
+
+    SHARED_FORMATS = 1000
+
+    _shared = cache.LRUCache(max_size=SHARED_FORMATS)
+
     def __init__(self, name, url, file_extension, description):
         self.name = name
         self.url = url
@@ -34,12 +106,15 @@ class GSDataFormat(object):
     @staticmethod
     def from_json(json_data):
         if json_data:
-            return GSDataFormat(
-                json_data.get('name'),
-                json_data.get('url'),
-                json_data.get('fileExtension'),
-                json_data.get('description')
-            )
+            fields = (json_data.get('name'),
+                      json_data.get('url'),
+                      json_data.get('fileExtension'),
+                      json_data.get('description'))
+            data_format = GSDataFormat._shared.get(fields)
+            if data_format is None:
+                data_format = GSDataFormat(*fields)
+                GSDataFormat._shared.put(fields, data_format)
+            return data_format
         else:
             return None
 
@@ -49,6 +124,8 @@ class GSSidObject(object):
     See: http://www.genomespace.org/support/api/restful-access-to-dm#sid
     """
 
+    __slots__ = ('name', 'type', 'id')
+
     def __init__(self, name, sid_type, sid_id=None):
         self.name = name
         self.type = sid_type
@@ -71,6 +148,8 @@ class GSAceObject(object):
     See: http://www.genomespace.org/support/api/restful-access-to-dm#ace
     """
 
+    __slots__ = ('permission', 'sid', 'id')
+
     def __init__(self, permission, sid, ace_id=None):
         self.permission = permission
         self.sid = sid
@@ -93,6 +172,8 @@ class GSAclObject(object):
     See: http://www.genomespace.org/support/api/restful-access-to-dm#acl
     """
 
+    __slots__ = ('object_id', 'object_type')
+
     def __init__(self, object_id, object_type):
         self.object_id = object_id
         self.object_type = object_type
@@ -113,6 +194,8 @@ class GSEffectiveAcl(object):
     See: http://www.genomespace.org/support/api/restful-access-to-dm#appendix_f
     """
 
+    __slots__ = ('access_control_entries', 'object', 'id')
+
     def __init__(self, access_control_entries, effective_acl_object,
                  effective_acl_id=None):
         self.access_control_entries = access_control_entries
@@ -135,8 +218,18 @@ class GSEffectiveAcl(object):
 class GSFileMetadata(object):
     """
     See: http://www.genomespace.org/support/api/restful-access-to-dm#appendix_a
+
+    When created from JSON, the effective ACL is only parsed when it is
+    first accessed, since listings of large folders rarely need it.
     """
 
+    __slots__ = ('name', 'path', 'url', 'parent_url', 'size', 'owner',
+                 'is_directory', 'is_link', 'target_path', 'last_modified',
+                 'data_format', 'available_data_formats',
+                 '_effective_acl', '_effective_acl_json')
+
+    effective_acl = _lazy_property('effective_acl', GSEffectiveAcl.from_json)
+
     def __init__(self, name, path, url, parentUrl, size, owner, is_directory,
                  is_link, target_path, last_modified, data_format,
                  available_data_formats, effective_acl):
@@ -156,7 +249,7 @@ class GSFileMetadata(object):
 
     @staticmethod
     def from_json(json_data):
-        return GSFileMetadata(
+        metadata = GSFileMetadata(
             json_data.get('name'),
             json_data.get('path'),
             json_data.get('url'),
@@ -170,8 +263,10 @@ class GSFileMetadata(object):
             GSDataFormat.from_json(json_data.get('dataFormat')),
             [GSDataFormat.from_json(data_fmt)
              for data_fmt in json_data.get('availableDataFormats', [])],
-            GSEffectiveAcl.from_json(json_data.get('effectiveAcl'))
+            _UNPARSED
         )
+        metadata._effective_acl_json = json_data.get('effectiveAcl')
+        return metadata
 
 
 class GSDirectoryListing(object):
@@ -179,6 +274,8 @@ class GSDirectoryListing(object):
     See: http://www.genomespace.org/support/api/restful-access-to-dm#appendix_b
     """
 
+    __slots__ = ('contents', 'directory')
+
     def __init__(self, contents, directory):
         self.contents = contents
         self.directory = directory
@@ -192,12 +289,114 @@ class GSDirectoryListing(object):
         )
 
 
+class _PendingFolder(object):
+    """
+    A folder being deleted recursively, which tracks how many of its items
+    are yet to be deleted.
+    """
+
+    def __init__(self, url, parent=None):
+        self.url = url
+        self.parent = parent
+        self.failed = False
+        # the folder listing is pending until all items are scheduled
+        self._pending = 1
+        self._lock = threading.Lock()
+
+    def add_item(self):
+        with self._lock:
+            self._pending += 1
+
+    def item_done(self, success):
+        """
+        Records that an item has been processed, and returns True if it was
+        the last one.
+        """
+        with self._lock:
+            self.failed = self.failed or not success
+            self._pending -= 1
+            return self._pending == 0
+
+
+def _renew_token(client_ref, server_url, stale_token):
+    """
+    Renews the token of a client which has not been garbage collected.
+    Renewal timers only hold a weak reference to their client, so that a
+    client which is no longer used can be collected before its token
+    expires.
+    """
+    client = client_ref()
+    if client is not None:
+        client._renew_token(server_url, stale_token)
+
+
+class _DownloadRetry(object):
+    """
+    The retry policy for the download of a GenomeSpace file. A cached
+    storage location is reused where possible, and retried once with a
+    fresh location if it fails, since it may have been revoked. Otherwise,
+    a resumable download is retried up to ``MAX_RESUME_ATTEMPTS`` times.
+    """
+
+    def __init__(self, client, source, resume=True):
+        self.client = client
+        self.source = source
+        self.resume = resume
+        self.key = client._metadata_cache_key(source)
+        self._download_info = client.download_info_cache.get(self.key)
+        self._reused = self._download_info is not None
+        self._attempts = 0
+
+    @property
+    def download_info(self):
+        # The storage location is resolved afresh on each retry, since an
+        # interruption may be caused by a presigned URL expiring
+        if self._download_info is None:
+            self._download_info = self.client._get_download_info(
+                self.source)
+        return self._download_info
+
+    def call(self, download):
+        """
+        Calls download(download_info) with the storage location of the
+        file until it succeeds or is not retried, and returns its result.
+        """
+        while True:
+            try:
+                return download(self.download_info)
+            except requests.exceptions.RequestException as e:
+                if not self._failed(e):
+                    raise
+
+    def _failed(self, error):
+        """
+        Records a failed attempt, and returns True if the download should
+        be retried.
+        """
+        self.client.download_info_cache.invalidate(self.key)
+        self._download_info = None
+        if self._reused:
+            self._reused = False
+            log.debug("Download of %s from a cached location failed,"
+                      " retrying: %s", self.source, error)
+            return True
+        if not self.resume or self._attempts >= MAX_RESUME_ATTEMPTS:
+            return False
+        self._attempts += 1
+        log.debug("Download of %s interrupted, resuming: %s", self.source,
+                  error)
+        return True
+
+
 class GenomeSpaceClient():
     """
     A simple GenomeSpace client
     """
 
-    def __init__(self, username=None, password=None, token=None):
+    def __init__(self, username=None, password=None, token=None,
+                 session=None, pool_size=10, timeout=DEFAULT_TIMEOUT,
+                 metadata_cache_ttl=None, metadata_cache_size=10000,
+                 token_cache=None):
         """
         Constructs a new GenomeSpace client. A username/password
         combination or a token must be supplied.
@@ -211,10 +410,91 @@ class GenomeSpaceClient():
         :type token: :class:`str`
         :param token: A GenomeSpace auth token. If supplied, the token will be
                       used instead of the username/password.
+
+        :type session: :class:`requests.Session`
+        :param session: An externally configured session to use for all
+                        requests. If not supplied, the client creates its own
+                        pooled keep-alive session. The gs-token cookie set
+                        by logging in is stored in the session, and kept up
+                        to date when the token is renewed.
+
+        :type pool_size: :class:`int`
+        :param pool_size: Maximum number of keep-alive connections to retain
+                          per host. Ignored if a session is supplied.
+
+        :type timeout: :class:`tuple`
+        :param timeout: A (connect, read) tuple of timeouts in seconds, or a
+                        single value for both. Use None to wait forever.
+
+        :type metadata_cache_ttl: :class:`float`
+        :param metadata_cache_ttl: If set, file metadata is cached for this
+                                   many seconds, including metadata of every
+                                   entry returned by a folder listing. By
+                                   default, metadata is not cached.
+
+        :type metadata_cache_size: :class:`int`
+        :param metadata_cache_size: Maximum number of metadata entries to
+                                    cache before evicting the least recently
+                                    used one.
+
+        :type token_cache: :class:`genomespaceclient.token_cache.TokenCache`
+        :param token_cache: If supplied, tokens obtained with a username and
+                            password are stored in this cache and reused by
+                            later clients with the same password until they
+                            expire, or are rejected by the server. Tokens of
+                            logged in clients are renewed in the background
+                            shortly before they expire.
         """
         self.username = username
         self.password = password
         self.token = token
+        self.timeout = timeout
+        self._owns_session = session is None
+        self._auth_lock = threading.Lock()
+        self.token_cache = token_cache
+        self._token_refresh_timer = None
+        self.session = session or util.create_session(pool_size=pool_size)
+        self.metadata_cache = cache.LRUCache(
+            max_size=metadata_cache_size if metadata_cache_ttl else 0,
+            ttl=metadata_cache_ttl)
+        # uploadinfo responses by destination folder, so that the storage
+        # credentials can be reused for other files in the same folder
+        self.upload_info_cache = cache.LRUCache(max_size=1000,
+                                                ttl=UPLOAD_INFO_TTL)
+        # Folders which this client has created or found to exist
+        self.folder_cache = cache.LRUCache(max_size=10000)
+        # Presigned storage locations of files, kept until they expire
+        self.download_info_cache = cache.LRUCache(max_size=10000)
+        # Storage handlers by storage type and transfer config
+        self._handlers = cache.LRUCache(max_size=32)
+        # API base URLs which redirect to another base URL, such as
+        # https://dm.genomespace.org/datamanager/file/ to
+        # https://gsui.genomespace.org/datamanager/v1.0/file/
+        self._api_base_urls = {}
+
+    def close(self):
+        """
+        Releases all pooled connections held by this client. Externally
+        supplied sessions are left open.
+        """
+        if self._token_refresh_timer:
+            self._token_refresh_timer.cancel()
+        self._handlers.clear()
+        if self._owns_session:
+            self.session.close()
+
+    def __del__(self):
+        # The renewal timer only holds a weak reference to the client, and
+        # would otherwise wait until the token expires
+        timer = getattr(self, '_token_refresh_timer', None)
+        if timer:
+            timer.cancel()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
 
     def _get_gs_auth_cookie(self, server_url):
         """
@@ -223,16 +503,92 @@ class GenomeSpaceClient():
         is made to the identity server to obtain a new session token.
         """
         if not self.token:
-            parsed_uri = urlparse(server_url)
-            url = "{uri.scheme}://{uri.netloc}/identityServer/basic".format(
-                uri=parsed_uri)
-            response = requests.get(url,
+            with self._auth_lock:
+                # another worker may have logged in while we waited
+                if not self.token:
+                    self._set_token(server_url, *self._obtain_token(
+                        server_url))
+        return {"gs-token": self.token}
+
+    def _get_server_url(self, genomespace_url):
+        return "{uri.scheme}://{uri.netloc}".format(
+            uri=urlparse(genomespace_url))
+
+    def _obtain_token(self, server_url, stale_token=None):
+        """
+        Returns a (token, expiry time) tuple from the token cache, or by
+        logging in. The expiry time is None if it is unknown. A cached token
+        equal to stale_token is ignored.
+        """
+        server = self._get_server_url(server_url)
+        cached = (self.token_cache.get(server, self.username, self.password)
+                  if self.token_cache else None)
+        if (cached and cached[0] != stale_token and
+                cached[1] - time.time() > TOKEN_REFRESH_MARGIN):
+            log.debug("Using cached token for %s at %s", self.username,
+                      server)
+            return cached
+        token = self._login(server_url)
+        remaining = self._get_remaining_token_time(server_url, token) / 1000.0
+        expires = time.time() + remaining if remaining else None
+        if self.token_cache and expires:
+            self.token_cache.put(server, self.username, token, expires,
+                                 self.password)
+        return token, expires
+
+    def _set_token(self, server_url, token, expires):
+        """
+        Sets the token used by all requests, and schedules it to be renewed
+        in a background thread shortly before it expires, so that long
+        running transfers are not interrupted. Must be called while holding
+        the auth lock.
+        """
+        self.token = token
+        # The session, which may be shared with the caller, keeps the token
+        # set by the login, so it must not be left with a stale one
+        for cookie in self.session.cookies:
+            if cookie.name == "gs-token" and cookie.value != token:
+                cookie.value = token
+        if self._token_refresh_timer:
+            self._token_refresh_timer.cancel()
+            self._token_refresh_timer = None
+        if expires:
+            delay = max(expires - time.time() - TOKEN_REFRESH_MARGIN, 0)
+            self._token_refresh_timer = threading.Timer(
+                delay, _renew_token,
+                args=(weakref.ref(self), server_url, token))
+            self._token_refresh_timer.daemon = True
+            self._token_refresh_timer.start()
+
+    def _renew_token(self, server_url, stale_token):
+        """
+        Replaces stale_token with a new token. Since all workers share the
+        client's token, only the first worker to notice that a token is
+        stale renews it, and the others use the renewed token.
+        """
+        with self._auth_lock:
+            if self.token != stale_token:
+                return
+            log.debug("Renewing token for %s", self.username)
+            try:
+                # Another process may already have renewed the token
+                self._set_token(server_url, *self._obtain_token(
+                    server_url, stale_token=stale_token))
+            except Exception as e:
+                log.warning("Could not renew token for %s: %s",
+                            self.username, e)
+
+    def _login(self, server_url):
+        parsed_uri = urlparse(server_url)
+        url = "{uri.scheme}://{uri.netloc}/identityServer/basic".format(
+            uri=parsed_uri)
+        response = self.session.get(url,
                                     auth=requests.auth.HTTPBasicAuth(
                                         self.username,
-                                        self.password))
-            response.raise_for_status()
-            self.token = response.cookies.get("gs-token")
-        return {"gs-token": self.token}
+                                        self.password),
+                                    timeout=self.timeout)
+        response.raise_for_status()
+        return response.cookies.get("gs-token")
 
     def _api_generic_request(self, request_func, genomespace_url, headers=None,
                              body=None, allow_redirects=True):
@@ -241,9 +597,9 @@ class GenomeSpaceClient():
         standard headers, including authentication headers.
         Also performs some standard validations on the result.
 
-        :type request_func: :func to call. Must be from the requests package,
-                            and maybe a get, put, post etc.
-        :param request_func: Calls the requested method in the requests package
+        :type request_func: :func to call. Must be a method of the client's
+                            session, and maybe a get, put, post etc.
+        :param request_func: Calls the requested method on the session
                             after adding some standard headers.
 
         :type genomespace_url: :class:`str`
@@ -264,12 +620,29 @@ class GenomeSpaceClient():
                        'Content-Type': 'application/json'}
         req_headers.update(headers or {})
 
+        cookies = self._get_gs_auth_cookie(genomespace_url)
         response = request_func(genomespace_url,
-                                cookies=self._get_gs_auth_cookie(
-                                    genomespace_url),
+                                cookies=cookies,
                                 headers=req_headers,
                                 data=body,
-                                allow_redirects=allow_redirects)
+                                allow_redirects=allow_redirects,
+                                timeout=self.timeout)
+        if (response.status_code == requests.codes.unauthorized and
+                self.username and self.password):
+            # The token may have expired or been revoked, and must not be
+            # served from the token cache again
+            if self.token_cache:
+                self.token_cache.invalidate(
+                    self._get_server_url(genomespace_url), self.username,
+                    cookies["gs-token"])
+            self._renew_token(genomespace_url, cookies["gs-token"])
+            response = request_func(genomespace_url,
+                                    cookies=self._get_gs_auth_cookie(
+                                        genomespace_url),
+                                    headers=req_headers,
+                                    data=body,
+                                    allow_redirects=allow_redirects,
+                                    timeout=self.timeout)
         response.raise_for_status()
         return response
 
@@ -295,15 +668,36 @@ class GenomeSpaceClient():
 
     def _api_get_request(self, genomespace_url, headers=None):
         return self._api_json_request(
-            requests.get, genomespace_url, headers=headers)
+            self.session.get, genomespace_url, headers=headers)
 
     def _api_put_request(self, genomespace_url, headers=None, body=None):
         return self._api_json_request(
-            requests.put, genomespace_url, headers=headers, body=body)
+            self.session.put, genomespace_url, headers=headers, body=body)
 
     def _api_delete_request(self, genomespace_url, headers=None, body=None):
         return self._api_generic_request(
-            requests.delete, genomespace_url, headers=headers)
+            self.session.delete, genomespace_url, headers=headers)
+
+    def _metadata_cache_key(self, genomespace_url):
+        """
+        Returns a key which is identical for all equivalent forms of a
+        GenomeSpace URL, with or without API version or trailing slash.
+        """
+        return GENOMESPACE_API_FILE_REGEX.sub(
+            r'\g<2>v1.0/file', genomespace_url).rstrip("/")
+
+    def _invalidate_metadata(self, genomespace_url):
+        """
+        Removes cached metadata of a modified file or folder, its contents,
+        and its parent folder.
+        """
+        key = self._metadata_cache_key(genomespace_url)
+        self.download_info_cache.invalidate(key)
+        if not self.metadata_cache.enabled:
+            return
+        self.metadata_cache.invalidate(key)
+        self.metadata_cache.invalidate_prefix(key + "/")
+        self.metadata_cache.invalidate(key.rsplit("/", 1)[0])
 
     def _internal_copy(self, source, destination):
         if not gs_glob.is_same_genomespace_server(source, destination):
@@ -324,16 +718,78 @@ class GenomeSpaceClient():
         copy_source = source.replace(
             gs_glob.GENOMESPACE_URL_REGEX.match(source).group(1),
             "/")
+        self._invalidate_metadata(destination)
         return self._api_put_request(
             destination, headers={'x-gs-copy-source': copy_source})
 
     def _get_upload_info(self, genomespace_url):
         url = genomespace_url.replace("/datamanager/v1.0/file/",
                                       "/datamanager/v1.0/uploadinfo/")
-        return self._api_get_request(url)
+        upload_info = self._api_get_request(url)
+        self._cache_upload_info(genomespace_url, upload_info)
+        return upload_info
+
+    def _get_upload_info_key_field(self, upload_info):
+        """
+        Returns the name of the field in an uploadinfo response which holds
+        the location of the object within its bucket or container.
+        """
+        upload_type = (upload_info.get("uploadType") or "").lower()
+        if upload_type == "s3":
+            return "s3ObjectKey"
+        elif upload_type == "swift":
+            return "path"
+        return None
+
+    def _cache_upload_info(self, genomespace_url, upload_info):
+        """
+        Remembers an uploadinfo response for the folder of genomespace_url,
+        provided the object location it contains ends with the file's path,
+        so that the location of other files in the same folder can be
+        derived from it.
+        """
+        field = self._get_upload_info_key_field(upload_info)
+        if not field:
+            return
+        folder, name = genomespace_url.rsplit("/", 1)
+        location = upload_info.get(field) or ""
+        name = unquote(name)
+        if not name or not location.endswith("/" + name):
+            return
+        ttl = None
+        expires = util.parse_timestamp(
+            (upload_info.get("amazonCredentials") or {}).get("expiration"))
+        if expires:
+            ttl = min(UPLOAD_INFO_TTL, expires - time.time() -
+                      storage_handlers.CREDENTIALS_EXPIRY_MARGIN)
+            if ttl <= 0:
+                return
+        self.upload_info_cache.put(
+            folder, (upload_info, location[:-len(name)]), ttl=ttl)
+
+    def _get_cached_upload_info(self, genomespace_url):
+        """
+        Returns an uploadinfo response for genomespace_url derived from the
+        cached response for another file in the same folder, or None.
+        """
+        folder, name = genomespace_url.rsplit("/", 1)
+        cached = self.upload_info_cache.get(folder)
+        if not cached or not name:
+            return None
+        upload_info, prefix = cached
+        upload_info = dict(upload_info)
+        upload_info[self._get_upload_info_key_field(upload_info)] = (
+            prefix + unquote(name))
+        return upload_info
 
     def _get_download_info(self, genomespace_url):
-        response = self._api_generic_request(requests.get, genomespace_url,
+        """
+        Returns the response headers of the redirect from a GenomeSpace URL
+        to the storage location of the file. Presigned locations are also
+        stored in download_info_cache until shortly before they expire.
+        """
+        url = self._get_canonical_url(genomespace_url)
+        response = self._api_generic_request(self.session.get, url,
                                              allow_redirects=False)
         # This is for an edge case where GenomeSpace urls such as
         # https://dm.genomespace.org/datamanager/file/Home redirect to
@@ -343,83 +799,212 @@ class GenomeSpaceClient():
         # no longer matches an API URL.
         redirect_count = 0
         while gs_glob.is_genomespace_url(response.headers['Location']):
-            response = self._api_generic_request(requests.get,
-                                                 response.headers['Location'],
+            self._learn_api_base_url(url, response.headers['Location'])
+            url = response.headers['Location']
+            response = self._api_generic_request(self.session.get, url,
                                                  allow_redirects=False)
             if redirect_count > 4:
                 raise GSClientException("Too many redirects while trying to"
                                         " fetch: {}".format(genomespace_url))
             redirect_count += 1
 
+        expires = util.get_presigned_url_expiry(response.headers['Location'])
+        if expires:
+            ttl = expires - time.time() - PRESIGNED_URL_EXPIRY_MARGIN
+            if ttl > 0:
+                self.download_info_cache.put(
+                    self._metadata_cache_key(genomespace_url),
+                    response.headers, ttl=ttl)
         return response.headers
 
-    def _upload(self, source, destination, recurse=False):
+    def _learn_api_base_url(self, url, redirect_url):
+        """
+        Remembers that the API base URL of url redirects to the API base
+        URL of redirect_url, if the rest of both URLs is the same.
+        """
+        match = gs_glob.GENOMESPACE_URL_REGEX.match(url)
+        redirect_match = gs_glob.GENOMESPACE_URL_REGEX.match(redirect_url)
+        base, redirect_base = match.group(1), redirect_match.group(1)
+        if base != redirect_base and (
+                url[len(base):].rstrip("/") ==
+                redirect_url[len(redirect_base):].rstrip("/")):
+            log.debug("Learnt canonical API URL %s for %s", redirect_base,
+                      base)
+            self._api_base_urls[base] = redirect_base
+
+    def _get_canonical_url(self, genomespace_url):
+        """
+        Rewrites a GenomeSpace URL to use the API base URL it would
+        eventually be redirected to, where known.
+        """
+        url = genomespace_url
+        # Guard against redirect loops between base URLs
+        for _ in range(5):
+            match = gs_glob.GENOMESPACE_URL_REGEX.match(url)
+            base = match.group(1) if match else None
+            if base not in self._api_base_urls:
+                break
+            url = self._api_base_urls[base] + url[len(base):]
+        return url
+
+    def _upload(self, source, destination, recurse=False, parallel=1,
+                resume=False, config=None, progress=None):
         dest_is_dir = self._is_dir_path(destination)
 
-        for f in glob.iglob(source):
-            if dest_is_dir:
-                basename = os.path.basename(f)
-                dstname = destination + "/" + basename
-            else:
-                dstname = destination
-
-            if os.path.isdir(f):
+        checksums = {}
+        start_time = time.time()
+        with workers.WorkerPool(parallel) as pool:
+            for f in glob.iglob(source):
                 if dest_is_dir:
-                    self._upload_tree(f, dstname, recurse)
+                    basename = os.path.basename(f)
+                    dstname = destination + "/" + basename
                 else:
-                    raise GSClientException(
-                        "Source is a folder, and therefore, the destination"
-                        " must also be a folder.")
-            else:
-                self._upload_file(f, dstname)
-
-    def _upload_tree(self, source, destination, recurse):
+                    dstname = destination
+
+                if os.path.isdir(f):
+                    if dest_is_dir:
+                        pool.submit(f, self._upload_tree, pool, f, dstname,
+                                    recurse, resume, config, checksums,
+                                    progress)
+                    else:
+                        raise GSClientException(
+                            "Source is a folder, and therefore, the"
+                            " destination must also be a folder.")
+                else:
+                    pool.submit(f, self._upload_file, f, dstname, resume,
+                                config, checksums, progress)
+            results = pool.join()
+        summary = workers.TransferSummary(results, time.time() - start_time,
+                                          checksums)
+        log.debug("upload: %s", summary)
+        workers.check_results(results, "uploading")
+        return summary
+
+    def _upload_tree(self, pool, source, destination, recurse, resume,
+                     config, checksums, progress, create_path=True):
         contents = os.listdir(source)
-        self.mkdir(destination, create_path=True)
-        errors = []
+        # The folder is created before any of its contents are scheduled,
+        # and since its parent must exist by then, subfolders never need to
+        # create intermediate paths.
+        self.mkdir(destination, create_path=create_path)
         for item in contents:
             srcname = os.path.join(source, item)
             dstname = destination + "/" + item
-            try:
-                if os.path.isdir(srcname) and recurse:
-                    self._upload_tree(srcname, dstname, recurse)
-                else:
-                    self._upload_file(srcname, dstname)
-            # catch the Error from the recursive upload so that we can
-            # continue with other files
-            except Exception as err:
-                errors.extend(err)
-        if errors:
-            raise GSClientException("Some errors occurred while uploading:"
-                                    " %s" % (errors,))
-
-    def _upload_file(self, source, destination):
-        upload_info = self._get_upload_info(destination)
-        handler = storage_handlers.create_handler(
-            upload_info.get("uploadType"))
-        handler.upload(source, upload_info)
+            if os.path.isdir(srcname) and recurse:
+                pool.submit(srcname, self._upload_tree, pool, srcname,
+                            dstname, recurse, resume, config, checksums,
+                            progress, create_path=False)
+            else:
+                pool.submit(srcname, self._upload_file, srcname, dstname,
+                            resume, config, checksums, progress)
 
-    def _download(self, source, destination, recurse=False):
-        dest_is_dir = self._is_dir_path(destination)
+    def _upload_file(self, source, destination, resume=False, config=None,
+                     checksums=None, progress=None):
+        tracker = self._track_progress(progress, source)
+        try:
+            size = self._upload_file_with_retry(source, destination, resume,
+                                                config, checksums, tracker)
+        finally:
+            if tracker:
+                tracker.finish()
+        log.debug("uploaded: %s -> %s", source, destination)
+        return size
+
+    def _track_progress(self, progress, name):
+        if progress is None:
+            return None
+        return progress_module.TransferProgress(progress, name)
 
-        for f in gs_glob.gs_iglob(self, source):
-            if dest_is_dir:
-                basename = os.path.basename(f)
-                dstname = destination + "/" + basename
-            else:
-                dstname = destination
+    def _upload_file_with_retry(self, source, destination, resume, config,
+                                checksums, tracker):
+        file_checksums = {}
+        upload_info = self._get_cached_upload_info(destination)
+        if upload_info:
+            try:
+                size = self._upload_file_with_info(
+                    source, destination, upload_info, resume, config,
+                    file_checksums, tracker)
+            except storage_handlers.transfer_errors() as e:
+                # The reused credentials may have expired or been revoked,
+                # so try once more with fresh ones
+                log.debug("Upload of %s with cached credentials failed,"
+                          " retrying with new credentials: %s", source, e)
+                self.upload_info_cache.invalidate(
+                    destination.rsplit("/", 1)[0])
+                upload_info = None
+        if not upload_info:
+            size = self._upload_file_with_info(
+                source, destination, self._get_upload_info(destination),
+                resume, config, file_checksums, tracker)
+        self._invalidate_metadata(destination)
+        self._record_checksums(checksums, source, file_checksums)
+        return size
+
+    def _get_handler(self, storage_type, config=None):
+        """
+        Returns a storage handler for a storage type and transfer config,
+        which shares this client's session. Handlers are reused by the
+        client until it is closed.
+        """
+        if not storage_type:
+            return None
+        key = (storage_type.lower(), config)
+        handler = self._handlers.get(key)
+        if handler is None:
+            handler = storage_handlers.create_handler(
+                storage_type, session=self.session, timeout=self.timeout,
+                config=config)
+            self._handlers.put(key, handler)
+        return handler
+
+    def _upload_file_with_info(self, source, destination, upload_info,
+                               resume, config, checksums=None, tracker=None):
+        handler = self._get_handler(upload_info.get("uploadType"), config)
+        return handler.upload(
+            source, upload_info,
+            refresh_upload_info=lambda: self._get_upload_info(destination),
+            resume=resume, checksums=checksums, progress=tracker)
+
+    def _record_checksums(self, checksums, source, file_checksums):
+        if checksums is not None and file_checksums:
+            # Transfers run concurrently, but dict assignment is atomic
+            checksums[source] = file_checksums
+
+    def _download(self, source, destination, recurse=False, parallel=1,
+                  resume=False, config=None, progress=None):
+        dest_is_dir = self._is_dir_path(destination)
 
-            if self.isdir(f):
+        checksums = {}
+        start_time = time.time()
+        with workers.WorkerPool(parallel) as pool:
+            for f, entry in gs_glob.gs_iglob_entries(self, source):
                 if dest_is_dir:
-                    self._download_tree(f, dstname, recurse)
+                    basename = os.path.basename(f)
+                    dstname = destination + "/" + basename
                 else:
-                    raise GSClientException(
-                        "Source is a folder, and therefore, the destination"
-                        " must also be a folder.")
-            else:
-                self._download_file(f, dstname)
-
-    def _download_tree(self, source, destination, recurse):
+                    dstname = destination
+
+                if gs_glob.is_dir_entry(self, entry, f):
+                    if dest_is_dir:
+                        pool.submit(f, self._download_tree, pool, f, dstname,
+                                    recurse, resume, config, checksums,
+                                    progress)
+                    else:
+                        raise GSClientException(
+                            "Source is a folder, and therefore, the"
+                            " destination must also be a folder.")
+                else:
+                    pool.submit(f, self._download_file, f, dstname, resume,
+                                config, checksums, progress)
+            results = pool.join()
+        summary = workers.TransferSummary(results, time.time() - start_time,
+                                          checksums)
+        log.debug("download: %s", summary)
+        workers.check_results(results, "downloading")
+        return summary
+
+    def _download_tree(self, pool, source, destination, recurse, resume,
+                       config, checksums, progress):
         contents = self.list(source).contents
         try:
             os.makedirs(destination)
@@ -427,29 +1012,55 @@ class GenomeSpaceClient():
             # be happy if someone already created the path
             if e.errno != errno.EEXIST:
                 raise
-        errors = []
+        # Each child is processed as a separate task, so that a failure
+        # is recorded against that child without affecting its siblings
         for item in contents:
             srcname = source + "/" + item.name
             dstname = os.path.join(destination, item.name)
-            try:
-                if self.isdir(srcname) and recurse:
-                    self._download_tree(srcname, dstname, recurse)
-                else:
-                    self._download_file(srcname, dstname)
-            # catch the Error from the recursive download so that we can
-            # continue with other files
-            except Exception as err:
-                errors.extend(err)
-        if errors:
-            raise GSClientException("Some errors occurred while downloading:"
-                                    " %s" % (errors,))
-
-    def _download_file(self, source, destination):
-        download_info = self._get_download_info(source)
+            pool.submit(srcname, self._download_item, pool, srcname, dstname,
+                        recurse, resume, config, checksums, progress, item)
+
+    def _download_item(self, pool, source, destination, recurse, resume,
+                       config, checksums, progress, entry):
+        if recurse and gs_glob.is_dir_entry(self, entry, source):
+            self._download_tree(pool, source, destination, recurse, resume,
+                                config, checksums, progress)
+        else:
+            return self._download_file(source, destination, resume, config,
+                                       checksums, progress)
+
+    def _download_file(self, source, destination, resume=False, config=None,
+                       checksums=None, progress=None):
+        tracker = self._track_progress(progress, source)
+        try:
+            return self._download_file_with_retry(
+                source, destination, resume, config, checksums, tracker)
+        finally:
+            if tracker:
+                tracker.finish()
+
+    def _download_file_with_retry(self, source, destination, resume, config,
+                                  checksums, tracker):
         storage_type = gs_glob.GENOMESPACE_URL_REGEX.match(
             source).group(4)
-        handler = storage_handlers.create_handler(storage_type)
-        handler.download(download_info, destination)
+        handler = self._get_handler(storage_type, config)
+
+        def download(download_info):
+            file_checksums = {}
+            size = handler.download(download_info, destination,
+                                    resume=resume, checksums=file_checksums,
+                                    progress=tracker)
+            self._record_checksums(checksums, source, file_checksums)
+            return size
+        return self._with_download_retry(source, download, resume)
+
+    def _with_download_retry(self, source, download, resume=True):
+        """
+        Calls download(download_info) with the storage location of a
+        GenomeSpace file, and returns its result. Failed attempts are
+        retried as described in :class:`_DownloadRetry`.
+        """
+        return _DownloadRetry(self, source, resume).call(download)
 
     def _is_dir_path(self, path):
         if gs_glob.is_genomespace_url(path):
@@ -457,7 +1068,8 @@ class GenomeSpaceClient():
         else:
             return os.path.isdir(path)
 
-    def copy(self, source, destination, recurse=False):
+    def copy(self, source, destination, recurse=False, parallel=1,
+             resume=False, config=None, progress=None):
         """
         Copies a file to/from/within GenomeSpace.
 
@@ -473,6 +1085,38 @@ class GenomeSpaceClient():
         :param destination: Local filename or GenomeSpace URL of destination
                             file.
 
+        :type recurse: :class:`bool`
+        :param recurse: Copy folders recursively.
+
+        :type parallel: :class:`int`
+        :param parallel: Number of files to transfer concurrently when
+                         copying multiple files. Errors are collected per
+                         file and reported together once all other files
+                         have been transferred.
+
+        :type resume: :class:`bool`
+        :param resume: When downloading, continue partially downloaded files
+                       from where they left off, provided the remote file
+                       has not changed since. Interrupted downloads are also
+                       resumed automatically. When uploading, continue
+                       unfinished multipart uploads, and keep the parts of
+                       failed ones instead of aborting them.
+
+        :type config: :class:`storage_handlers.TransferConfig`
+        :param config: Controls the size and number of parts large files
+                       are split into and transferred concurrently, and
+                       which checksums are computed while transferring.
+
+        :type progress: :func:
+        :param progress: Called as ``progress(name, bytes_done, total,
+                         finished)`` as each file is transferred, at most
+                         every half a second per file, and once more when
+                         the file's transfer ends. See
+                         :class:`genomespaceclient.progress.TransferProgress`.
+
+        :rtype: :class:`genomespaceclient.workers.TransferSummary`
+        :return: Per-file results, checksums and aggregate throughput of an
+                 upload or download. None for copies within GenomeSpace.
         """
         log.debug("copy: %s -> %s", source, destination)
 
@@ -481,15 +1125,151 @@ class GenomeSpaceClient():
             self._internal_copy(source, destination)
         elif gs_glob.is_genomespace_url(
                 source) and not gs_glob.is_genomespace_url(destination):
-            self._download(source, destination, recurse=recurse)
+            return self._download(source, destination, recurse=recurse,
+                                  parallel=parallel, resume=resume,
+                                  config=config, progress=progress)
         elif not gs_glob.is_genomespace_url(
                 source) and gs_glob.is_genomespace_url(destination):
-            self._upload(source, destination, recurse=recurse)
+            return self._upload(source, destination, recurse=recurse,
+                                parallel=parallel, resume=resume,
+                                config=config, progress=progress)
         else:
             raise GSClientException(
                 "Either source or destination must be a valid GenomeSpace"
                 " location")
 
+    def upload_stream(self, stream, destination, config=None,
+                      checksums=None, progress=None):
+        """
+        Uploads data from a file-like object, such as a pipe, or from an
+        iterable of byte strings, to a GenomeSpace file. The data is
+        uploaded as it is read, without being written to a local file, and
+        its size need not be known in advance.
+
+        E.g.
+        .. code-block:: python
+            client.upload_stream(sys.stdin.buffer,
+                    "https://dm.genomespace.org/datamanager/v1.0/file/Home/MyBucket/hello.txt")
+
+        :type stream: file-like object or iterable
+        :param stream: A binary file-like object, or an iterable of byte
+                       strings, to read the data from.
+
+        :type destination: :class:`str`
+        :param destination: GenomeSpace URL of destination file.
+
+        :type config: :class:`storage_handlers.TransferConfig`
+        :param config: Controls the size of the parts the data is split
+                       into, and how many parts are uploaded concurrently.
+                       At most ``max_streams + 1`` parts are held in memory
+                       at a time.
+
+        :type checksums: :class:`dict`
+        :param checksums: If given, updated with the checksums of the
+                          uploaded data requested by ``config.checksums``,
+                          by algorithm name.
+
+        :type progress: :func:
+        :param progress: Called with the progress of the upload, as for
+                         :meth:`copy`. The total size is None.
+
+        :rtype: :class:`int`
+        :return: the number of bytes uploaded.
+        """
+        log.debug("upload_stream: -> %s", destination)
+        if (not gs_glob.is_genomespace_url(destination) or
+                destination.endswith("/")):
+            raise GSClientException(
+                "Destination must be a GenomeSpace file location")
+        # Cached credentials are not reused, since a stream cannot be read
+        # again if they turn out to be invalid
+        upload_info = self._get_upload_info(destination)
+        handler = self._get_handler(upload_info.get("uploadType"), config)
+        tracker = self._track_progress(progress, "-")
+        try:
+            size = handler.upload_stream(
+                stream, upload_info,
+                refresh_upload_info=lambda: self._get_upload_info(
+                    destination),
+                checksums=checksums, progress=tracker)
+        finally:
+            if tracker:
+                tracker.finish()
+        self._invalidate_metadata(destination)
+        log.debug("uploaded: stream -> %s", destination)
+        return size
+
+    def download_stream(self, genomespace_url, fileobj=None,
+                        chunk_size=65536):
+        """
+        Downloads a GenomeSpace file without writing it to a local file. The
+        data is either written to a file-like object as it is received, or
+        returned as an iterator of chunks.
+
+        Interrupted downloads are continued after the data already received,
+        provided the file has not changed since.
+
+        E.g.
+        .. code-block:: python
+            client.download_stream("https://dm.genomespace.org/datamanager/v1.0/file/Home/MyBucket/hello.txt",
+                                   sys.stdout.buffer)
+
+        :type genomespace_url: :class:`str`
+        :param genomespace_url: GenomeSpace URL of source file.
+
+        :type fileobj: file-like object
+        :param fileobj: A binary file-like object to write the data to. If
+                        None, an iterator of chunks is returned instead, and
+                        the download starts when it is first advanced.
+
+        :type chunk_size: :class:`int`
+        :param chunk_size: Maximum size in bytes of each chunk.
+
+        :rtype: :class:`int` or iterator
+        :return: the number of bytes written to fileobj, or an iterator of
+                 byte strings if fileobj is None.
+        """
+        log.debug("download_stream: %s", genomespace_url)
+        if not gs_glob.is_genomespace_url(genomespace_url):
+            raise GSClientException(
+                "Source must be a valid GenomeSpace location")
+        chunks = self._iter_download(genomespace_url, chunk_size)
+        if fileobj is None:
+            return chunks
+        size = 0
+        for chunk in chunks:
+            fileobj.write(chunk)
+            size += len(chunk)
+        return size
+
+    def _iter_download(self, source, chunk_size):
+        storage_type = gs_glob.GENOMESPACE_URL_REGEX.match(
+            source).group(4)
+        handler = self._get_handler(storage_type)
+        # The state records how much has been yielded, so that a retry
+        # continues after it
+        state = {}
+        chunks = [None]
+
+        def next_chunk(download_info):
+            if chunks[0] is None:
+                chunks[0] = handler.download_stream(download_info, state,
+                                                    chunk_size)
+            try:
+                return next(chunks[0], None)
+            except Exception:
+                chunks[0] = None
+                raise
+
+        # A generator cannot yield from within the retry loop, so each
+        # chunk is fetched through it, sharing the attempts made
+        retry = _DownloadRetry(self, source)
+        while True:
+            chunk = retry.call(next_chunk)
+            if chunk is None:
+                return
+            yield chunk
+
     def move(self, source, destination):
         """
         Moves a file within GenomeSpace.
@@ -516,6 +1296,315 @@ class GenomeSpaceClient():
             raise GSClientException(
                 "Source must be a valid GenomeSpace location")
 
+    def open(self, genomespace_url, mode='rb',
+             block_size=remote_file.DEFAULT_BLOCK_SIZE,
+             read_ahead=remote_file.DEFAULT_READ_AHEAD,
+             cache_size=remote_file.DEFAULT_CACHE_SIZE,
+             buffer_size=io.DEFAULT_BUFFER_SIZE):
+        """
+        Opens a GenomeSpace file for reading, without downloading it. The
+        returned file object is seekable, and only fetches the parts of the
+        file which are read, using HTTP range requests.
+
+        E.g.
+
+        .. code-block:: python
+
+            f = client.open(
+                "https://dm.genomespace.org/datamanager/v1.0/file/Home/MyBucket/reads.bam")
+            f.seek(-28, os.SEEK_END)
+            eof_block = f.read()
+
+        :type genomespace_url: :class:`str`
+        :param genomespace_url: GenomeSpace URL of the file to open.
+
+        :type mode: :class:`str`
+        :param mode: Must be 'rb'. Only reading in binary mode is supported.
+
+        :type block_size: :class:`int`
+        :param block_size: Size in bytes of the blocks in which the file is
+                           fetched and cached.
+
+        :type read_ahead: :class:`int`
+        :param read_ahead: Minimum number of bytes fetched by a read of data
+                           which is not cached.
+
+        :type cache_size: :class:`int`
+        :param cache_size: Maximum number of bytes of recently read blocks
+                           to keep in memory.
+
+        :type buffer_size: :class:`int`
+        :param buffer_size: Size of the buffer of the returned file object.
+
+        :rtype: :class:`io.BufferedReader`
+        :return: a file object wrapping a
+                 :class:`genomespaceclient.remote_file.RemoteFile`.
+        """
+        log.debug("open: %s", genomespace_url)
+        if mode != 'rb':
+            raise ValueError("GenomeSpace files can only be opened in 'rb'"
+                             " mode, not %r" % (mode,))
+        key = self._metadata_cache_key(genomespace_url)
+
+        def locate(refresh):
+            download_info = None
+            if refresh:
+                self.download_info_cache.invalidate(key)
+            else:
+                download_info = self.download_info_cache.get(key)
+            if download_info is None:
+                download_info = self._get_download_info(genomespace_url)
+            return download_info['Location']
+
+        raw = remote_file.RemoteFile(
+            genomespace_url, locate, self.session, timeout=self.timeout,
+            block_size=block_size, read_ahead=read_ahead,
+            cache_size=cache_size)
+        return io.BufferedReader(raw, buffer_size)
+
+    def sync(self, source, destination, delete=False, parallel=1,
+             config=None, progress=None):
+        """
+        Makes a destination folder a mirror of a source folder, transferring
+        only new and changed files. One of the folders must be local and the
+        other a GenomeSpace folder.
+
+        Files are compared using the size and modification time recorded in
+        the remote folder listings, so that unchanged files cost no requests
+        beyond one listing per remote folder. When uploading, a file is
+        transferred if its size differs or it was modified after the remote
+        copy. When downloading, a file is transferred if its size or
+        modification time differs, and downloaded files are given the
+        remote modification time.
+
+        E.g.
+        .. code-block:: python
+            client.sync("/tmp/results/",
+                        "https://dm.genomespace.org/datamanager/v1.0/file/Home/MyBucket/results/")
+
+        :type source: :class:`str`
+        :param source: Local path or GenomeSpace URL of the source folder.
+
+        :type destination: :class:`str`
+        :param destination: Local path or GenomeSpace URL of the destination
+                            folder. Created if it does not exist.
+
+        :type delete: :class:`bool`
+        :param delete: Delete files and folders in the destination which do
+                       not exist in the source.
+
+        :type parallel: :class:`int`
+        :param parallel: Number of folders to list and files to transfer or
+                         delete concurrently.
+
+        :type config: :class:`storage_handlers.TransferConfig`
+        :param config: Controls the size and number of parts large files
+                       are split into and transferred concurrently, and
+                       which checksums are computed while transferring.
+
+        :type progress: :func:
+        :param progress: Called with the progress of each transferred file,
+                         as for :meth:`copy`.
+
+        :rtype: :class:`genomespaceclient.workers.SyncSummary`
+        :return: The files transferred, skipped and deleted.
+        """
+        log.debug("sync: %s -> %s", source, destination)
+        source = source.rstrip("/")
+        destination = destination.rstrip("/")
+        if gs_glob.is_genomespace_url(source) and \
+                not gs_glob.is_genomespace_url(destination):
+            upload = False
+            local_root, remote_root = destination, source
+        elif not gs_glob.is_genomespace_url(source) and \
+                gs_glob.is_genomespace_url(destination):
+            if not os.path.isdir(source):
+                raise GSClientException(
+                    "Source must be a folder: %s" % source)
+            upload = True
+            local_root, remote_root = source, destination
+        else:
+            raise GSClientException(
+                "Exactly one of source and destination must be a GenomeSpace"
+                " location")
+
+        start_time = time.time()
+        remote_files, remote_dirs = self._list_remote_tree(
+            remote_root, parallel, missing_ok=upload)
+        local_files, local_dirs = self._list_local_tree(local_root)
+        if upload:
+            plan = self._plan_sync(local_files, local_dirs, remote_files,
+                                   remote_dirs, upload)
+        else:
+            plan = self._plan_sync(remote_files, remote_dirs, local_files,
+                                   local_dirs, upload)
+        changed, skipped, new_dirs, extras = plan
+
+        checksums = {}
+        with workers.WorkerPool(parallel) as pool:
+            if upload:
+                for path in new_dirs:
+                    # parents are listed before their children
+                    self.mkdir(remote_root + path, create_path=not path)
+                for path in changed:
+                    pool.submit(path, self._upload_file,
+                                self._local_path(local_root, path),
+                                remote_root + path, False, config,
+                                checksums, progress)
+            else:
+                for path in new_dirs:
+                    self._makedirs(self._local_path(local_root, path))
+                for path in changed:
+                    pool.submit(path, self._download_synced_file,
+                                remote_root + path,
+                                self._local_path(local_root, path),
+                                remote_files[path], config, checksums,
+                                progress)
+            results = pool.join()
+
+        deletions = []
+        if delete and extras:
+            with workers.WorkerPool(parallel) as pool:
+                for path in extras:
+                    if upload:
+                        pool.submit(path, self._delete_item,
+                                    remote_root + path, recurse=True,
+                                    entry=remote_files.get(path) or
+                                    remote_dirs.get(path))
+                    else:
+                        pool.submit(path, self._delete_local_item,
+                                    self._local_path(local_root, path))
+                deletions = pool.join()
+
+        summary = workers.SyncSummary(results, time.time() - start_time,
+                                      skipped=skipped, deletions=deletions,
+                                      checksums=checksums)
+        log.debug("sync: %s", summary)
+        workers.check_results(results + deletions, "syncing")
+        return summary
+
+    def _list_remote_tree(self, genomespace_url, parallel=1,
+                          missing_ok=False):
+        """
+        Lists a remote folder tree, listing up to ``parallel`` folders
+        concurrently. Returns dicts of files and folders by path relative to
+        genomespace_url, where each path starts with "/". The root folder is
+        included with an empty path. If missing_ok is True, a root folder
+        which does not exist is treated as empty, and is not included.
+        """
+        with workers.WorkerPool(parallel) as pool:
+            pool.submit("", self._list_remote_folder, pool, genomespace_url,
+                        "")
+            results = pool.join()
+        files, dirs = {}, {}
+        for result in results:
+            if result.error:
+                if (missing_ok and not result.key and
+                        isinstance(result.error, HTTPError) and
+                        result.error.response.status_code == 404):
+                    continue
+                raise result.error
+            folder, contents = result.value
+            dirs[result.key] = folder
+            for entry in contents:
+                path = result.key + "/" + entry.name.rstrip("/")
+                if gs_glob.is_dir_entry(self, entry,
+                                        genomespace_url + path):
+                    dirs[path] = entry
+                else:
+                    files[path] = entry
+        return files, dirs
+
+    def _list_remote_folder(self, pool, genomespace_url, path):
+        listing = self.list(genomespace_url + path)
+        for entry in listing.contents:
+            subpath = path + "/" + entry.name.rstrip("/")
+            if gs_glob.is_dir_entry(self, entry, genomespace_url + subpath):
+                pool.submit(subpath, self._list_remote_folder, pool,
+                            genomespace_url, subpath)
+        return listing.directory, listing.contents
+
+    def _list_local_tree(self, local_path):
+        """
+        Returns dicts of (size, mtime) tuples of the files, and of the
+        folders, within local_path, in the same form as
+        :meth:`_list_remote_tree`.
+        """
+        files, dirs = {}, {}
+        if not os.path.isdir(local_path):
+            return files, dirs
+        for dirpath, dirnames, filenames in os.walk(local_path):
+            path = os.path.relpath(dirpath, local_path).replace(os.sep, "/")
+            path = "" if path == "." else "/" + path
+            dirs[path] = None
+            for name in filenames:
+                st = os.stat(os.path.join(dirpath, name))
+                files[path + "/" + name] = (st.st_size, st.st_mtime)
+        return files, dirs
+
+    def _plan_sync(self, src_files, src_dirs, dst_files, dst_dirs, upload):
+        """
+        Compares source and destination trees, and returns the paths of
+        files to transfer, files to skip, folders to create and destination
+        items which do not exist in the source, in that order.
+        """
+        changed, skipped = [], []
+        for path in sorted(src_files):
+            if path not in dst_files:
+                changed.append(path)
+                continue
+            if upload:
+                (size, mtime), remote = src_files[path], dst_files[path]
+            else:
+                remote, (size, mtime) = src_files[path], dst_files[path]
+            remote_mtime = util.parse_timestamp(remote.last_modified)
+            if size != remote.size:
+                changed.append(path)
+            elif remote_mtime is None:
+                skipped.append(path)
+            elif upload and mtime > remote_mtime + SYNC_MTIME_TOLERANCE:
+                changed.append(path)
+            elif not upload and abs(
+                    mtime - remote_mtime) > SYNC_MTIME_TOLERANCE:
+                changed.append(path)
+            else:
+                skipped.append(path)
+        new_dirs = sorted(path for path in src_dirs if path not in dst_dirs)
+        extras = []
+        for path in sorted(set(dst_files) | set(dst_dirs)):
+            if path in src_files or path in src_dirs:
+                continue
+            # Deleting a folder also deletes its contents
+            if not any(path.startswith(extra + "/") for extra in extras):
+                extras.append(path)
+        return changed, skipped, new_dirs, extras
+
+    def _local_path(self, local_root, path):
+        return os.path.join(local_root, *path.split("/"))
+
+    def _makedirs(self, path):
+        try:
+            os.makedirs(path)
+        except OSError as e:
+            # be happy if someone already created the path
+            if e.errno != errno.EEXIST:
+                raise
+
+    def _download_synced_file(self, source, destination, entry, config,
+                              checksums=None, progress=None):
+        size = self._download_file(source, destination, config=config,
+                                   checksums=checksums, progress=progress)
+        mtime = util.parse_timestamp(entry.last_modified)
+        if mtime is not None:
+            os.utime(destination, (mtime, mtime))
+        return size
+
+    def _delete_local_item(self, path):
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        else:
+            os.remove(path)
+
     def list(self, genomespace_url):
         """
         Returns a list of files within a GenomeSpace folder.
@@ -533,9 +1622,15 @@ class GenomeSpaceClient():
         """
         log.debug("list: %s", genomespace_url)
         json_data = self._api_get_request(genomespace_url)
-        return GSDirectoryListing.from_json(json_data)
-
-    def delete(self, genomespace_url, recurse=False):
+        listing = GSDirectoryListing.from_json(json_data)
+        if self.metadata_cache.enabled:
+            for entry in listing.contents + [listing.directory]:
+                if entry and entry.url:
+                    self.metadata_cache.put(
+                        self._metadata_cache_key(entry.url), entry)
+        return listing
+
+    def delete(self, genomespace_url, recurse=False, parallel=1):
         """
         Deletes a file within a GenomeSpace folder.
 
@@ -545,17 +1640,111 @@ class GenomeSpaceClient():
 
         :type genomespace_url: :class:`str`
         :param genomespace_url: GenomeSpace URL of file to delete.
+
+        :type recurse: :class:`bool`
+        :param recurse: Delete folders and their contents.
+
+        :type parallel: :class:`int`
+        :param parallel: Number of folders to list and items to delete
+                         concurrently when deleting recursively. Files are
+                         deleted as soon as their folder has been listed,
+                         and each folder is deleted once all of its contents
+                         have been.
+
+        :rtype: :class:`genomespaceclient.workers.DeleteSummary`
+        :return: The number of files and folders deleted.
         """
         log.debug("delete: %s", genomespace_url)
-        for f in gs_glob.gs_iglob(self, genomespace_url):
-            self._delete_item(f, recurse)
+        start_time = time.time()
+        with workers.WorkerPool(parallel) as pool:
+            for f, entry in gs_glob.gs_iglob_entries(self, genomespace_url):
+                self._submit_delete(pool, f, recurse, entry)
+            results = pool.join()
+        summary = workers.DeleteSummary(results, time.time() - start_time)
+        log.debug("delete: %s", summary)
+        workers.check_results(results, "deleting")
+        return summary
+
+    def _delete_item(self, genomespace_url, recurse=False, entry=None):
+        with workers.WorkerPool() as pool:
+            self._submit_delete(pool, genomespace_url, recurse, entry)
+            workers.check_results(pool.join(), "deleting")
+
+    def _submit_delete(self, pool, genomespace_url, recurse, entry,
+                       parent=None):
+        """
+        Schedules a file or folder to be deleted. A folder deleted
+        recursively is listed, its contents scheduled for deletion, and the
+        folder itself deleted once all of its contents have been. If any of
+        them could not be deleted, neither are the folders containing it.
+        """
+        key = self._metadata_cache_key(genomespace_url)
+        if entry is None:
+            # Cached metadata is looked at before it is invalidated, without
+            # counting as a hit, since it is not served to the caller
+            entry = self.metadata_cache.peek(key)
+        is_dir = gs_glob.is_dir_entry(self, entry, genomespace_url)
+        self._invalidate_metadata(genomespace_url)
+        self.folder_cache.invalidate(key)
+        self.folder_cache.invalidate_prefix(key + "/")
+        if recurse and is_dir:
+            folder = _PendingFolder(genomespace_url, parent)
+            pool.submit(genomespace_url + "/", self._delete_folder_contents,
+                        pool, folder)
+        else:
+            kind = (workers.DeleteSummary.FOLDER if is_dir
+                    else workers.DeleteSummary.FILE)
+            pool.submit(genomespace_url, self._delete_file, pool,
+                        genomespace_url, parent, kind)
 
-    def _delete_item(self, genomespace_url, recurse=False):
-        if recurse:
-            if self.isdir(genomespace_url):
-                for f in self.list(genomespace_url).contents:
-                    self._delete_item(f.url, recurse=recurse)
+    def _delete_folder_contents(self, pool, folder):
+        success = False
+        try:
+            for f in self.list(folder.url).contents:
+                folder.add_item()
+                self._submit_delete(pool, f.url, True, f, folder)
+            success = True
+        finally:
+            # The listing itself is counted as an item of the folder, so
+            # that the folder is not deleted before all items are scheduled
+            self._finish_delete(pool, folder, success)
+
+    def _delete_file(self, pool, genomespace_url, parent,
+                     kind=workers.DeleteSummary.FILE):
+        """
+        Deletes a file, or a folder which is not deleted recursively, and
+        returns ``kind``, which tells the two apart in the summary.
+        """
+        success = False
+        try:
+            self._delete_url(genomespace_url)
+            success = True
+            return kind
+        finally:
+            self._finish_delete(pool, parent, success)
+
+    def _delete_folder(self, pool, folder):
+        success = False
+        try:
+            self._delete_url(folder.url)
+            success = True
+            return workers.DeleteSummary.FOLDER
+        finally:
+            self._finish_delete(pool, folder.parent, success)
 
+    def _finish_delete(self, pool, folder, success):
+        """
+        Records that an item of folder has been processed, and schedules the
+        folder to be deleted if that was its last item.
+        """
+        if folder and folder.item_done(success):
+            if folder.failed:
+                # The folder is not empty, so leave it and its parents
+                self._finish_delete(pool, folder.parent, False)
+            else:
+                pool.submit(folder.url, self._delete_folder, pool, folder)
+
+    def _delete_url(self, genomespace_url):
         try:
             self._api_delete_request(genomespace_url)
         except HTTPError as e:
@@ -603,14 +1792,48 @@ class GenomeSpaceClient():
         """
         log.debug("mkdir: %s", genomespace_url)
         if create_path:
-            dirname, _ = os.path.split(genomespace_url)
-            if not gs_glob.is_genomespace_url(dirname):
-                return
+            for ancestor in self._get_missing_ancestors(genomespace_url):
+                self._create_folder(ancestor)
+        return self._create_folder(genomespace_url)
+
+    def _create_folder(self, genomespace_url):
+        self._invalidate_metadata(genomespace_url)
+        result = self._api_put_request(genomespace_url,
+                                       body='{"isDirectory": true}')
+        self.folder_cache.put(self._metadata_cache_key(genomespace_url), True)
+        return result
+
+    def _get_missing_ancestors(self, genomespace_url):
+        """
+        Returns the ancestors of a folder which do not exist yet, starting
+        with the outermost one. Folders known to exist are not checked
+        again, and the deepest existing ancestor of the rest is found by
+        bisecting the path, so that a path of depth n needs at most about
+        log2(n) requests.
+        """
+        ancestors = []
+        dirname = os.path.dirname(genomespace_url.rstrip("/"))
+        while gs_glob.is_genomespace_url(dirname):
+            ancestors.insert(0, dirname)
+            dirname = os.path.dirname(dirname)
+
+        # Every ancestor of an existing folder also exists, so search for
+        # the number of existing ancestors between lo and hi
+        lo, hi = 0, len(ancestors)
+        for depth in range(len(ancestors), 0, -1):
+            if self.folder_cache.get(
+                    self._metadata_cache_key(ancestors[depth - 1])):
+                lo = depth
+                break
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            if self.isdir(ancestors[mid - 1]):
+                self.folder_cache.put(
+                    self._metadata_cache_key(ancestors[mid - 1]), True)
+                lo = mid
             else:
-                self.mkdir(dirname, create_path)
-
-        return self._api_put_request(genomespace_url,
-                                     body='{"isDirectory": true}')
+                hi = mid - 1
+        return ancestors[lo:]
 
     def get_metadata(self, genomespace_url):
         """
@@ -631,10 +1854,18 @@ class GenomeSpaceClient():
                  http://www.genomespace.org/support/api/restful-access-to-dm#appendix_b
         """
         log.debug("get_metadata: %s", genomespace_url)
+        if self.metadata_cache.enabled:
+            key = self._metadata_cache_key(genomespace_url)
+            metadata = self.metadata_cache.get(key)
+            if metadata is not None:
+                return metadata
         url = re.sub(r"((http[s]?://.*/datamanager/)(v[0-9]+.[0-9]+/)?file)",
                      r'\g<2>v1.0/filemetadata', genomespace_url)
         json_data = self._api_get_request(url)
-        return GSFileMetadata.from_json(json_data)
+        metadata = GSFileMetadata.from_json(json_data)
+        if self.metadata_cache.enabled:
+            self.metadata_cache.put(key, metadata)
+        return metadata
 
     def get_remaining_token_time(self, genomespace_url):
         """
@@ -655,13 +1886,17 @@ class GenomeSpaceClient():
         :rtype: :class:`int`
         :return: the time the token has left to live in milliseconds.
         """
-        if not self.token:
+        return self._get_remaining_token_time(genomespace_url, self.token)
+
+    def _get_remaining_token_time(self, genomespace_url, token):
+        if not token:
             return 0
         url_components = urlparse(genomespace_url)
         location = '{uri.scheme}://{uri.netloc}' \
                    '/identityServer/usermanagement/utility/token/remainingTime'
         url = location.format(uri=url_components)
-        result = requests.get(url, cookies={"gs-token": self.token})
+        result = self.session.get(url, cookies={"gs-token": token},
+                                  timeout=self.timeout)
         if result.status_code == requests.codes.ok:
             return int(result.text)
         return 0
@@ -1,2 +1,23 @@
 class GSClientException(Exception):
     pass
+
+
+class GSTransferException(GSClientException):
+    """
+    Raised when one or more items of a multi-item operation, such as a
+    recursive copy, could not be processed. The individual failures are
+    available as a list of :class:`genomespaceclient.workers.TaskResult`
+    through the ``errors`` attribute.
+    """
+
+    def __init__(self, message, errors=None):
+        super(GSTransferException, self).__init__(message)
+        self.errors = errors or []
+
+
+class GSChecksumException(GSClientException):
+    """
+    Raised when the checksum of transferred data does not match the
+    checksum reported by the storage service.
+    """
+    pass
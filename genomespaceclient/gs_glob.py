@@ -4,6 +4,7 @@
 import fnmatch
 import os
 import re
+from concurrent.futures import ThreadPoolExecutor
 try:
     from urllib.parse import urlparse
 except ImportError:
@@ -17,6 +18,12 @@ GENOMESPACE_URL_REGEX = re.compile(
 # cannot be used in a url since it denotes the start of a query string
 MAGIC_CHECK = re.compile('[*[]')
 
+# Maximum number of folders to list concurrently while globbing
+GLOB_MAX_WORKERS = 8
+
+# Marks a '**' path segment, which matches any number of nested folders
+RECURSIVE = object()
+
 
 def is_genomespace_url(url):
     return bool(GENOMESPACE_URL_REGEX.match(url))
@@ -52,6 +59,31 @@ def find_magic_match(s):
     return MAGIC_CHECK.search(s)
 
 
+def entry_is_dir(entry):
+    """
+    Returns whether a folder listing entry is a directory, or None if the
+    listing is ambiguous, such as when there is no entry, the flag is
+    missing, or a name carries the trailing slash GenomeSpace Swift adds to
+    folder names without being flagged as a directory.
+    """
+    if (entry is None or entry.is_directory is None or
+            ((entry.name or "").endswith("/") and not entry.is_directory)):
+        return None
+    return entry.is_directory
+
+
+def is_dir_entry(client, entry, genomespace_url):
+    """
+    Returns True if a folder listing entry is a directory. The listing's
+    ``is_directory`` flag is used where possible, and the server is only
+    asked when the listing is ambiguous (see :func:`entry_is_dir`).
+    """
+    is_dir = entry_is_dir(entry)
+    if is_dir is None:
+        return client.isdir(genomespace_url)
+    return is_dir
+
+
 def gs_iglob(client, gs_path):
     """
     Returns an iterator which yields genomespace paths matching a given
@@ -66,48 +98,215 @@ def gs_iglob(client, gs_path):
     Matches Python glob module characteristics except for '?' which is
     unsupported.
     """
+    for path, _ in gs_iglob_entries(client, gs_path):
+        yield path
+
+
+def gs_iglob_entries(client, gs_path, max_workers=GLOB_MAX_WORKERS):
+    """
+    Same as :func:`gs_iglob`, but yields (path, entry) tuples, where entry
+    is the :class:`GSFileMetadata` of a wildcard match taken from its parent
+    folder's listing, or None if the path was matched without a listing.
+
+    A ``**`` path segment matches any number of nested folders, including
+    none. Each folder is listed at most once, and the listings of up to
+    ``max_workers`` folders at the same depth are fetched concurrently.
+    """
     # Ignore query_str while globbing, but add it back before returning
     dirname, basename, query_str = gs_path_split(gs_path)
     if not is_genomespace_url(dirname):
         return
     if not has_magic(gs_path):
         if basename:
-            yield gs_path
+            yield gs_path, None
         else:
             # Patterns ending with a slash should match only directories
             if client.isdir(dirname):
-                yield gs_path
+                yield gs_path, None
         return
-    if has_magic(dirname):
-        dirs = gs_iglob(client, dirname)
-    else:
-        dirs = [dirname]
-
-    if has_magic(basename):
-        glob_in_dir = _glob1
-    else:
-        glob_in_dir = _glob0
-    for dirname in dirs:
-        for name in glob_in_dir(client, dirname, basename):
-            yield dirname + "/" + name + query_str
-
-
-# See python glob module implementation, which this is closely based on
-def _glob1(client, dirname, pattern):
-    if client.isdir(dirname):
-        listing = client.list(dirname + "/")
-        names = [entry.name for entry in listing.contents]
-        return fnmatch.filter(names, pattern)
-    else:
-        return []
-
-
-def _glob0(client, dirname, basename):
-    if basename == '':
-        # `os.path.split()` returns an empty basename for paths ending with a
-        # directory separator.  'q*x/' should match only directories.
-        if client.isdir(dirname):
-            return [basename]
-    else:
-        return [basename]
-    return []
+
+    globber = _Globber(gs_path, query_str)
+
+    def fetch(folder):
+        url, states = folder
+        if globber.needs_isdir(url, states):
+            globber.set_isdir(url, client.isdir(url))
+        if globber.needs_listing(url, states):
+            globber.set_listing(url, client.list(url + "/").contents)
+
+    states = globber.start()
+    while states:
+        folders = globber.group(states)
+        if len(folders) > 1 and max_workers > 1:
+            with ThreadPoolExecutor(min(max_workers,
+                                        len(folders))) as executor:
+                list(executor.map(fetch, folders))
+        else:
+            for folder in folders:
+                fetch(folder)
+        next_states = []
+        for url, folder_states in folders:
+            for match in globber.expand(folder_states, next_states):
+                yield match
+        states = next_states
+
+
+def _compile_segment(segment):
+    """
+    Returns a compiled regex for a wildcard path segment, RECURSIVE for
+    '**', or the segment itself if it has no wildcards.
+    """
+    if segment == "**":
+        return RECURSIVE
+    elif has_magic(segment):
+        return re.compile(fnmatch.translate(segment))
+    return segment
+
+
+class _Globber(object):
+    """
+    Matches a wildcard pattern against the folders beneath the part of it
+    before the first wildcard, one level at a time. The state of each
+    partial match is a (folder url, folder entry, index of the next
+    segment) tuple.
+
+    The globber makes no requests itself, so that the blocking and asyncio
+    clients share it. States are grouped by folder with :meth:`group`, and
+    before the states of a folder are expanded, the caller asks the server
+    whether it is a folder if :meth:`needs_isdir`, then lists it if
+    :meth:`needs_listing`.
+    """
+
+    def __init__(self, gs_path, query_str=""):
+        path = gs_path[:len(gs_path) - len(query_str)] if query_str \
+            else gs_path
+        segments = path.split("/")
+        first_magic = next(i for i, segment in enumerate(segments)
+                           if has_magic(segment))
+        self.root = "/".join(segments[:first_magic])
+        self.segments = [_compile_segment(segment)
+                         for segment in segments[first_magic:]]
+        self.query_str = query_str
+        # Literal segments after a '**' are checked against the listing,
+        # since the recursion would otherwise yield them for every folder
+        self._after_recursive = [RECURSIVE in self.segments[:index]
+                                 for index in range(len(self.segments))]
+        self._listings = {}
+        self._is_dir = {}
+        self._seen_states = set()
+        self._seen_matches = set()
+
+    def start(self):
+        """
+        Returns the states of the first level.
+        """
+        return [(self.root, None, 0)]
+
+    def group(self, states):
+        """
+        Returns a list of (folder url, states) tuples, in order of first
+        appearance, since a folder may be reached by more than one partial
+        match.
+        """
+        folders = []
+        by_url = {}
+        for url, entry, index in states:
+            is_dir = entry_is_dir(entry)
+            if is_dir is not None:
+                self._is_dir.setdefault(url, is_dir)
+            if url not in by_url:
+                by_url[url] = []
+                folders.append((url, by_url[url]))
+            by_url[url].append((url, entry, index))
+        return folders
+
+    def needs_isdir(self, url, states):
+        return url not in self._is_dir and any(
+            self._must_be_dir(entry, index) for _, entry, index in states)
+
+    def set_isdir(self, url, is_dir):
+        self._is_dir[url] = is_dir
+
+    def needs_listing(self, url, states):
+        return url not in self._listings and self._is_dir.get(url) and any(
+            self._list_segment(index) for _, _, index in states)
+
+    def set_listing(self, url, contents):
+        self._listings[url] = contents
+
+    def expand(self, states, next_states):
+        """
+        Returns the new matches of states, with the query string added back,
+        and appends their partial matches to next_states.
+        """
+        matches = []
+        for url, entry, index in states:
+            if (url, index) in self._seen_states:
+                continue
+            self._seen_states.add((url, index))
+            for path, match_entry in self._expand(url, entry, index,
+                                                  next_states):
+                if path not in self._seen_matches:
+                    self._seen_matches.add(path)
+                    matches.append((path + self.query_str, match_entry))
+        return matches
+
+    def _expand(self, url, entry, index, next_states):
+        segment = self.segments[index]
+        last = index == len(self.segments) - 1
+        if self._must_be_dir(entry, index) and not self._is_dir[url]:
+            return []
+        if segment == "":
+            # A trailing slash matches only directories
+            return [(url + "/", entry)]
+        if segment is RECURSIVE:
+            if not last:
+                # match no folders at all
+                next_states.append((url, entry, index + 1))
+            matches = []
+            for child_url, child in self._children(url):
+                if last:
+                    matches.append((child_url, child))
+                # Children which are not folders are dropped when expanded
+                next_states.append((child_url.rstrip("/"), child, index))
+            return matches
+        if (not hasattr(segment, "match") and
+                not self._after_recursive[index] and
+                url not in self._listings):
+            # Like glob, don't check whether literal segments exist
+            child_url = url + "/" + segment
+            if last:
+                return [(child_url, None)]
+            next_states.append((child_url, None, index + 1))
+            return []
+        matches = []
+        for child_url, child in self._children(url):
+            if not self._matches(segment, child.name):
+                continue
+            if last:
+                matches.append((child_url, child))
+            else:
+                next_states.append((child_url.rstrip("/"), child, index + 1))
+        return matches
+
+    def _matches(self, segment, name):
+        if hasattr(segment, "match"):
+            return segment.match(name)
+        # GenomeSpace Swift may add a trailing slash to folder names
+        return name.rstrip("/") == segment
+
+    def _list_segment(self, index):
+        segment = self.segments[index]
+        return segment != "" and (segment is RECURSIVE or
+                                  hasattr(segment, "match") or
+                                  self._after_recursive[index])
+
+    def _must_be_dir(self, entry, index):
+        # Partial matches taken from a listing only continue into folders,
+        # while literal segments are not checked, like glob
+        return (entry is not None or self.segments[index] == "" or
+                self._list_segment(index))
+
+    def _children(self, url):
+        return [(url + "/" + child.name, child)
+                for child in self._listings.get(url, [])]
@@ -0,0 +1,138 @@
+import sys
+import threading
+import time
+
+from genomespaceclient import util
+
+# Default minimum number of seconds between progress reports
+DEFAULT_INTERVAL = 0.5
+
+
+class TransferProgress(object):
+    """
+    Tracks the number of bytes transferred of a single file, and reports
+    it to a callback at most once every ``interval`` seconds, so that
+    transfers made of many small blocks do not call the callback for each
+    block.
+
+    The callback is called as ``callback(name, bytes_done, total,
+    finished)``, where ``name`` identifies the file being transferred,
+    ``total`` is its size in bytes, or None if it is not known, and
+    ``finished`` is True for the last report of the transfer, which is
+    always made, whether or not the transfer succeeded.
+
+    Updates may be made concurrently from several threads, as when the
+    parts of a file are transferred in parallel.
+    """
+
+    def __init__(self, callback, name, interval=DEFAULT_INTERVAL):
+        self.callback = callback
+        self.name = name
+        self.interval = interval
+        self.bytes_done = 0
+        self.total = None
+        self._next_report = 0
+        self._lock = threading.Lock()
+
+    def start(self, total, bytes_done=0):
+        """
+        Starts, or restarts, a transfer of ``total`` bytes, of which
+        ``bytes_done`` have already been transferred, for example by an
+        interrupted attempt which is being resumed.
+        """
+        with self._lock:
+            self.total = total
+            self.bytes_done = bytes_done
+            self._next_report = 0
+        self.update(0)
+
+    def update(self, count):
+        """
+        Records that another ``count`` bytes have been transferred.
+        """
+        with self._lock:
+            self.bytes_done += count
+            now = time.time()
+            if now < self._next_report:
+                return
+            self._next_report = now + self.interval
+            bytes_done = self.bytes_done
+        self.callback(self.name, bytes_done, self.total, False)
+
+    def finish(self):
+        with self._lock:
+            bytes_done = self.bytes_done
+        self.callback(self.name, bytes_done, self.total, True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.finish()
+
+
+class StatusLine(object):
+    """
+    A progress callback which aggregates all in-flight transfers into a
+    single status line, which is redrawn in place on a terminal at most
+    once every ``interval`` seconds.
+    """
+
+    def __init__(self, stream=None, interval=DEFAULT_INTERVAL):
+        self.stream = stream or sys.stderr
+        self.interval = interval
+        self.files_done = 0
+        self._transfers = {}
+        self._bytes_finished = 0
+        self._start = time.time()
+        self._next_render = 0
+        self._width = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, name, bytes_done, total, finished):
+        with self._lock:
+            if finished:
+                self._transfers.pop(name, None)
+                self._bytes_finished += bytes_done
+                self.files_done += 1
+            else:
+                self._transfers[name] = (bytes_done, total)
+            now = time.time()
+            if now >= self._next_render:
+                self._next_render = now + self.interval
+                self._render(now)
+
+    def _render(self, now):
+        in_flight = list(self._transfers.values())
+        bytes_done = self._bytes_finished + sum(
+            done for done, _ in in_flight)
+        parts = ["{0} files done".format(self.files_done)]
+        if in_flight:
+            if all(total is not None for _, total in in_flight):
+                parts.append("{0} in progress ({1} of {2})".format(
+                    len(in_flight),
+                    util.format_file_size(sum(
+                        done for done, _ in in_flight)),
+                    util.format_file_size(sum(
+                        total for _, total in in_flight))))
+            else:
+                parts.append("{0} in progress".format(len(in_flight)))
+        elapsed = now - self._start
+        parts.append("{0} at {1}/s".format(
+            util.format_file_size(bytes_done),
+            util.format_file_size(bytes_done / elapsed if elapsed else 0)))
+        line = ", ".join(parts)
+        # Pad the line to overwrite the end of a longer previous one
+        self.stream.write("\r" + line.ljust(self._width))
+        self.stream.flush()
+        self._width = len(line)
+
+    def close(self):
+        """
+        Draws the final status, and moves to the next line.
+        """
+        with self._lock:
+            if self._width or self.files_done:
+                self._render(time.time())
+                self.stream.write("\n")
+                self.stream.flush()
@@ -0,0 +1,186 @@
+import io
+import logging
+
+from genomespaceclient import cache
+from genomespaceclient.exceptions import GSClientException
+
+import requests
+
+log = logging.getLogger(__name__)
+
+# Default size of the blocks in which remote files are fetched and cached
+DEFAULT_BLOCK_SIZE = 1024 * 1024
+
+# Default number of bytes fetched by a read which misses the block cache
+DEFAULT_READ_AHEAD = 4 * 1024 * 1024
+
+# Default total size of the blocks cached by a remote file
+DEFAULT_CACHE_SIZE = 16 * 1024 * 1024
+
+
+class RemoteFile(io.RawIOBase):
+    """
+    A read-only, seekable, unbuffered file object over a file in storage,
+    which is read with HTTP range requests. Use
+    :meth:`genomespaceclient.GenomeSpaceClient.open` to open one.
+
+    Data is fetched in blocks of ``block_size`` bytes, which are kept in a
+    least recently used cache of up to ``cache_size`` bytes. A read which
+    misses the cache fetches at least ``read_ahead`` bytes, so that reading
+    a file sequentially takes few requests, while reading a few bytes at an
+    arbitrary offset does not download the rest of the file.
+    """
+
+    def __init__(self, name, locate, session, timeout=None,
+                 block_size=DEFAULT_BLOCK_SIZE, read_ahead=DEFAULT_READ_AHEAD,
+                 cache_size=DEFAULT_CACHE_SIZE):
+        """
+        :type name: :class:`str`
+        :param name: The GenomeSpace URL of the file.
+
+        :type locate: :func:
+        :param locate: Returns the storage URL of the file. Called with
+                       ``refresh=True`` when a request to the previously
+                       returned URL failed, for example because a presigned
+                       URL expired.
+        """
+        self.name = name
+        self.block_size = block_size
+        self._read_ahead = max(read_ahead // block_size, 1)
+        self._locate = locate
+        self._location = locate(refresh=False)
+        self._session = session
+        self._timeout = timeout
+        self._blocks = cache.LRUCache(max_size=cache_size // block_size)
+        self._position = 0
+        self._validator = None
+        self.size = None
+        # The first response also reveals the size of the file
+        self._fetch(0, 1)
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        self._check_closed()
+        return self._position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        self._check_closed()
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self._position + offset
+        elif whence == io.SEEK_END:
+            position = self.size + offset
+        else:
+            raise ValueError("Invalid whence: %r" % (whence,))
+        if position < 0:
+            raise ValueError("Negative seek position %d" % (position,))
+        self._position = position
+        return position
+
+    def readinto(self, buffer):
+        self._check_closed()
+        view = memoryview(buffer)
+        remaining = min(len(view), max(self.size - self._position, 0))
+        last = (self._position + remaining - 1) // self.block_size
+        copied = 0
+        while copied < remaining:
+            index, offset = divmod(self._position, self.block_size)
+            block = self._get_block(index, last)
+            length = min(len(block) - offset, remaining - copied)
+            view[copied:copied + length] = block[offset:offset + length]
+            copied += length
+            self._position += length
+        return copied
+
+    def close(self):
+        if not self.closed:
+            self._blocks.clear()
+        super(RemoteFile, self).close()
+
+    def _check_closed(self):
+        if self.closed:
+            raise ValueError("I/O operation on closed file.")
+
+    def _get_block(self, index, last):
+        """
+        Returns the block with the given index, fetching it along with any
+        following uncached blocks up to ``last`` or the read-ahead limit,
+        whichever is further.
+        """
+        block = self._blocks.get(index)
+        if block is not None:
+            return block
+        # Never fetch more blocks than the cache can hold, or they would be
+        # evicted before they are read
+        limit = max(min(max(last - index + 1, self._read_ahead),
+                        self._blocks.max_size), 1)
+        count = 1
+        while count < limit and index + count not in self._blocks:
+            count += 1
+        return self._fetch(index, count)[0]
+
+    def _fetch(self, index, count):
+        """
+        Fetches ``count`` blocks starting at the block with the given index
+        in a single request, caches them and returns them as a list.
+        """
+        start = index * self.block_size
+        end = start + count * self.block_size - 1
+        if self.size is not None:
+            end = min(end, self.size - 1)
+        try:
+            data = self._request(start, end)
+        except requests.exceptions.RequestException as e:
+            log.debug("Reading %s failed, locating it again: %s",
+                      self.name, e)
+            self._location = self._locate(refresh=True)
+            data = self._request(start, end)
+        blocks = [data[offset:offset + self.block_size]
+                  for offset in range(0, len(data), self.block_size)]
+        for offset, block in enumerate(blocks):
+            self._blocks.put(index + offset, block)
+        return blocks or [b""]
+
+    def _request(self, start, end):
+        headers = {'Range': 'bytes=%d-%d' % (start, end)}
+        if self._validator:
+            headers['If-Range'] = self._validator
+        response = self._session.get(self._location, headers=headers,
+                                     timeout=self._timeout, stream=True)
+        try:
+            if response.status_code == 416 and start == 0:
+                # The file is empty
+                self.size = 0
+                return b""
+            response.raise_for_status()
+            content_range = response.headers.get('Content-Range', '')
+            if (response.status_code != 206 or
+                    not content_range.startswith('bytes %d-' % start)):
+                if self.size is None:
+                    raise GSClientException(
+                        "Storage for {0} does not support range"
+                        " requests".format(self.name))
+                raise GSClientException(
+                    "{0} changed while it was being read".format(self.name))
+            if self.size is None:
+                self.size = int(content_range.rsplit('/', 1)[-1])
+                end = min(end, self.size - 1)
+                etag = response.headers.get('ETag')
+                # Weak ETags cannot be used to validate ranges
+                if etag and not etag.startswith('W/'):
+                    self._validator = etag
+                else:
+                    self._validator = response.headers.get('Last-Modified')
+            data = response.content
+        finally:
+            response.close()
+        if len(data) != end - start + 1:
+            raise requests.exceptions.ChunkedEncodingError(
+                "Received %s of %s bytes" % (len(data), end - start + 1))
+        return data
@@ -2,21 +2,150 @@ import argparse
 import logging
 import sys
 
-from genomespaceclient import GenomeSpaceClient
 from genomespaceclient import util
 
 
 log = logging.getLogger(__name__)
 
 
+# The client and its dependencies are only imported once a subcommand needs
+# them, so that the shell starts quickly, and --help or invalid arguments
+# are reported without delay.
 def get_client(args):
+    from genomespaceclient.client import GenomeSpaceClient
+    from genomespaceclient.token_cache import TokenCache
+
+    token_cache = None if args.no_token_cache else TokenCache()
     return GenomeSpaceClient(username=args.user, password=args.password,
-                             token=args.token)
+                             token=args.token, token_cache=token_cache)
+
+
+def add_transfer_arguments(parser, parallel=1):
+    """
+    Adds the options shared by the commands which transfer files, with
+    ``parallel`` as the default number of files to transfer concurrently.
+    """
+    parser.add_argument(
+        '--parallel', type=int, metavar='N',
+        help="Number of files to transfer concurrently.",
+        required=False, default=parallel)
+    parser.add_argument(
+        '--streams', type=int, metavar='N',
+        help="Number of parts of a large file to transfer concurrently.",
+        required=False, default=4)
+    parser.add_argument(
+        '--part-size', type=util.parse_file_size, metavar='SIZE',
+        help="Size of each part of a large file, e.g. 16M.",
+        required=False, default='16M')
+    parser.add_argument(
+        '--multipart-threshold', type=util.parse_file_size, metavar='SIZE',
+        help="Transfer files of at least this size in parts, e.g. 64M.",
+        required=False, default='64M')
+    parser.add_argument(
+        '--segment-size', type=util.parse_file_size, metavar='SIZE',
+        help="Upload files larger than this to Swift as segments of this"
+        " size, e.g. 1G. Defaults to 2G.",
+        required=False, default=None)
+    parser.add_argument(
+        '--no-progress', action='store_true',
+        help="Do not show the progress of transfers on a terminal.",
+        required=False, default=False)
+    parser.add_argument(
+        '--checksum', action='append', choices=('md5', 'sha256'),
+        help="Compute a checksum of each file while it is transferred, and"
+        " print it. Downloads are checked against the MD5 checksum reported"
+        " by the storage, if any. May be given more than once.",
+        required=False, default=None)
+
+
+def get_transfer_config(args):
+    from genomespaceclient.storage_handlers import TransferConfig
+
+    return TransferConfig(multipart_threshold=args.multipart_threshold,
+                          part_size=args.part_size,
+                          max_streams=args.streams,
+                          segment_size=args.segment_size,
+                          checksums=args.checksum)
+
+
+def print_checksums(checksums, stream=None):
+    """
+    Prints checksums by file in the format of ``md5sum --tag``.
+    """
+    stream = stream or sys.stdout
+    for path in sorted(checksums):
+        for algorithm in sorted(checksums[path]):
+            stream.write("{0} ({1}) = {2}\n".format(
+                algorithm.upper(), path, checksums[path][algorithm]))
+
+
+def get_stdout():
+    return getattr(sys.stdout, 'buffer', sys.stdout)
+
+
+def get_status_line(args):
+    """
+    Returns a status line which shows the progress of all transfers on
+    stderr, or None if stderr is not a terminal.
+    """
+    from genomespaceclient.progress import StatusLine
+
+    if args.no_progress or not sys.stderr.isatty():
+        return None
+    return StatusLine(sys.stderr)
 
 
 def genomespace_copy_files(args):
     client = get_client(args)
-    client.copy(args.source, args.destination, recurse=args.recurse)
+    config = get_transfer_config(args)
+    if args.destination == '-':
+        client.download_stream(args.source, get_stdout())
+        return
+    status_line = get_status_line(args)
+    try:
+        if args.source == '-':
+            # sys.stdin and sys.stdout are already binary on Python 2
+            stdin = getattr(sys.stdin, 'buffer', sys.stdin)
+            checksums = {}
+            client.upload_stream(stdin, args.destination, config=config,
+                                 checksums=checksums, progress=status_line)
+            summary = None
+            checksums = {'-': checksums} if checksums else {}
+        else:
+            summary = client.copy(args.source, args.destination,
+                                  recurse=args.recurse,
+                                  parallel=args.parallel, resume=args.resume,
+                                  config=config, progress=status_line)
+            checksums = summary.checksums if summary else {}
+    finally:
+        if status_line:
+            status_line.close()
+    print_checksums(checksums)
+    if summary and args.recurse:
+        log.info("%s", summary)
+
+
+def genomespace_sync_files(args):
+    client = get_client(args)
+    config = get_transfer_config(args)
+    status_line = get_status_line(args)
+    try:
+        summary = client.sync(args.source, args.destination,
+                              delete=args.delete, parallel=args.parallel,
+                              config=config, progress=status_line)
+    finally:
+        if status_line:
+            status_line.close()
+    print_checksums(summary.checksums)
+    print(summary)
+
+
+def genomespace_cat_files(args):
+    client = get_client(args)
+    stdout = get_stdout()
+    for file_url in args.file_url:
+        client.download_stream(file_url, stdout)
+        stdout.flush()
 
 
 def genomespace_move_files(args):
@@ -26,7 +155,10 @@ def genomespace_move_files(args):
 
 def genomespace_delete_files(args):
     client = get_client(args)
-    client.delete(args.file_url, recurse=args.recurse)
+    summary = client.delete(args.file_url, recurse=args.recurse,
+                            parallel=args.parallel)
+    if args.recurse:
+        log.info("%s", summary)
 
 
 def genomespace_create_folder(args):
@@ -65,6 +197,11 @@ def process_args(args):
         '-t', '--token', type=str,
         help="GenomeSpace auth token.",
         required=False)
+    parser.add_argument(
+        '--no-token-cache', action='store_true',
+        help="Log in afresh instead of reusing the token saved in"
+        " ~/.genomespace/tokens.json by a previous login.",
+        required=False, default=False)
 
     # debugging and logging settings
     parser.add_argument("-v", "--verbose", action="count",
@@ -87,19 +224,60 @@ def process_args(args):
         "3. Copy a file within GenomeSpace\n"
         "{0} cp https://dmdev.genomespace.org/datamanager/v1.0/file/Home/"
         "s3:test/hello.txt https://dmdev.genomespace.org/datamanager/v1.0/"
-        "file/Home/s3:test/hello2.txt".format(parser.prog))
+        "file/Home/s3:test/hello2.txt\n\n"
+        "4. Upload the output of a command to a GenomeSpace file\n"
+        "gzip -c /tmp/myfile.txt | {0} cp - https://dmdev.genomespace.org/"
+        "datamanager/v1.0/file/Home/s3:test/myfile.txt.gz\n\n"
+        "5. Pipe a GenomeSpace file into a command\n"
+        "{0} cp https://dmdev.genomespace.org/datamanager/v1.0/file/Home/"
+        "s3:test/myfile.txt.gz - | gunzip -c".format(parser.prog))
     file_copy_parser.add_argument(
         '-R', '--recurse', action='store_true',
         help="Copy files recursively.",
         required=False, default=False)
+    file_copy_parser.add_argument(
+        '--resume', action='store_true',
+        help="Resume partially downloaded files and interrupted"
+        " multipart uploads.",
+        required=False, default=False)
+    add_transfer_arguments(file_copy_parser)
     file_copy_parser.add_argument(
         'source', type=str,
-        help="Local path or GenomeSpace URI of source file.")
+        help="Local path or GenomeSpace URI of source file, or - to upload"
+        " standard input.")
     file_copy_parser.add_argument(
         'destination', type=str,
-        help="Local path or GenomeSpace URI of destination file.")
+        help="Local path or GenomeSpace URI of destination file, or - to"
+        " download to standard output.")
     file_copy_parser.set_defaults(func=genomespace_copy_files)
 
+    # sync commands
+    file_sync_parser = subparsers.add_parser(
+        'sync',
+        formatter_class=argparse.RawTextHelpFormatter,
+        help='Copy new and changed files between a local and a GenomeSpace'
+        ' folder',
+        description="Files are compared by size and modification time.\n\n"
+        "Examples:\n\n"
+        "1. Mirror a local folder into GenomeSpace\n"
+        "{0} sync --delete /tmp/results/ https://dmdev.genomespace.org/"
+        "datamanager/v1.0/file/Home/s3:test/results/\n\n"
+        "2. Fetch new and changed files from a GenomeSpace folder\n"
+        "{0} sync https://dmdev.genomespace.org/datamanager/v1.0/file/Home/"
+        "s3:test/results/ /tmp/results/".format(parser.prog))
+    file_sync_parser.add_argument(
+        '--delete', action='store_true',
+        help="Delete destination files which do not exist in the source.",
+        required=False, default=False)
+    add_transfer_arguments(file_sync_parser, parallel=4)
+    file_sync_parser.add_argument(
+        'source', type=str,
+        help="Local path or GenomeSpace URI of source folder.")
+    file_sync_parser.add_argument(
+        'destination', type=str,
+        help="Local path or GenomeSpace URI of destination folder.")
+    file_sync_parser.set_defaults(func=genomespace_sync_files)
+
     # file move commands
     file_move_parser = subparsers.add_parser(
         'mv',
@@ -124,6 +302,13 @@ def process_args(args):
                                 help="GenomeSpace URI of folder to list.")
     gs_list_parser.set_defaults(func=genomespace_list_files)
 
+    gs_cat_parser = subparsers.add_parser(
+        'cat',
+        help='Write the contents of GenomeSpace files to standard output')
+    gs_cat_parser.add_argument('file_url', type=str, nargs='+',
+                               help="GenomeSpace URI of file to write.")
+    gs_cat_parser.set_defaults(func=genomespace_cat_files)
+
     # delete commands
     gs_rm_parser = subparsers.add_parser(
         'rm',
@@ -132,6 +317,10 @@ def process_args(args):
         '-R', '--recurse', action='store_true',
         help="Delete files recursively.",
         required=False, default=False)
+    gs_rm_parser.add_argument(
+        '--parallel', type=int, metavar='N',
+        help="Number of files to delete concurrently.",
+        required=False, default=1)
     gs_rm_parser.add_argument(
         'file_url', type=str,
         help="GenomeSpace URI of file/folder to delete.")
@@ -154,12 +343,17 @@ def process_args(args):
     return args
 
 
-def configure_logging(verbosity_count):
+def writes_to_stdout(args):
+    return (args.func is genomespace_cat_files or
+            getattr(args, 'destination', None) == '-')
+
+
+def configure_logging(verbosity_count, stream=None):
     if verbosity_count < 3:
         logging.getLogger('requests').setLevel(logging.ERROR)
     # set global logging level
     logging.basicConfig(
-        stream=sys.stdout,
+        stream=stream or sys.stdout,
         level=logging.DEBUG if verbosity_count > 3 else logging.ERROR,
         format='%(levelname)-5s: %(name)s: %(message)s')
     # Set client log level
@@ -172,7 +366,9 @@ def configure_logging(verbosity_count):
 def main():
     try:
         args = process_args(sys.argv)
-        configure_logging(args.verbosity_count)
+        # keep log messages out of file contents written to stdout
+        configure_logging(args.verbosity_count,
+                          sys.stderr if writes_to_stdout(args) else None)
         # invoke subcommand
         args.func(args)
     finally:
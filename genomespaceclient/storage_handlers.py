@@ -1,104 +1,1547 @@
+import binascii
+import hashlib
+import itertools
+import json
 import logging
 import os
+import re
+import threading
+import time
 from abc import ABCMeta, abstractmethod
+from concurrent.futures import FIRST_COMPLETED
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
 
-from cloudbridge.factory import CloudProviderFactory, ProviderList
-
+from genomespaceclient import cache
 from genomespaceclient import util
+from genomespaceclient.checksums import READ_BLOCK_SIZE
+from genomespaceclient.checksums import StreamHasher
+from genomespaceclient.checksums import content_md5
+from genomespaceclient.checksums import md5_from_content_md5
+from genomespaceclient.checksums import multipart_etag
+from genomespaceclient.exceptions import GSChecksumException
+from genomespaceclient.exceptions import GSClientException
 
 import requests
 
 try:
-    from urllib.parse import urlparse
+    from urllib.parse import quote, urlparse
 except ImportError:
+    from urllib import quote
     from urlparse import urlparse
 
 log = logging.getLogger(__name__)
 
+# Suffix of the file which records the identity of a download in progress,
+# so that it can be resumed later.
+RESUME_SUFFIX = ".gs-resume"
+
+# Temporary credentials which will expire within this many seconds are
+# treated as already expired.
+CREDENTIALS_EXPIRY_MARGIN = 300
+
+MD5_REGEX = re.compile(r"^[0-9a-fA-F]{32}$")
+
+
+class TransferConfig(object):
+    """
+    Controls how individual files are split into parts when transferred.
+    """
+
+    def __init__(self, multipart_threshold=64 * 1024 * 1024,
+                 part_size=16 * 1024 * 1024, max_streams=4,
+                 max_part_retries=3, segment_size=None, checksums=None):
+        """
+        :type multipart_threshold: :class:`int`
+        :param multipart_threshold: Files of at least this many bytes are
+                                    transferred in parts. Smaller files are
+                                    transferred as a single stream.
+
+        :type part_size: :class:`int`
+        :param part_size: Size of each part in bytes.
+
+        :type max_streams: :class:`int`
+        :param max_streams: Maximum number of parts of a single file to
+                            transfer concurrently.
+
+        :type max_part_retries: :class:`int`
+        :param max_part_retries: Number of times a failed part is retried
+                                 before the transfer is abandoned.
+
+        :type segment_size: :class:`int`
+        :param segment_size: Size of each segment of a file uploaded to
+                             Swift. Files larger than this are uploaded as
+                             a static large object. Defaults to
+                             :attr:`SwiftStorageHandler.SEGMENT_SIZE`.
+
+        :type checksums: :class:`tuple`
+        :param checksums: Names of hashlib algorithms, such as 'md5' and
+                          'sha256', with which to compute checksums of the
+                          data while it is transferred. MD5 checksums are
+                          compared with the checksum reported by the
+                          storage service, where there is one.
+        """
+        self.multipart_threshold = multipart_threshold
+        self.part_size = part_size
+        self.max_streams = max_streams
+        self.max_part_retries = max_part_retries
+        self.segment_size = segment_size
+        self.checksums = tuple(checksums or ())
+
+
+class _ObjectChanged(requests.exceptions.RequestException):
+    """
+    Raised when a ranged request reveals that an object has changed since
+    a download started.
+    """
+    pass
+
+
+class _PartCancelled(Exception):
+    """
+    Raised when the download of a range is stopped because another range
+    of the same object failed.
+    """
+    pass
+
+
+def transfer_errors():
+    """
+    Returns the exception types with which the storage services fail a
+    transfer, for instance because its credentials have expired or been
+    revoked, as opposed to errors in the transferred data or local files.
+    """
+    errors = [requests.exceptions.RequestException]
+    try:
+        # botocore is only installed with the S3 provider
+        from botocore.exceptions import BotoCoreError, ClientError
+        errors.extend([BotoCoreError, ClientError])
+    except ImportError:
+        pass
+    return tuple(errors)
+
+
+def _iter_chunks(stream, chunk_size):
+    """
+    Yields the data of a file-like object or an iterable of byte strings in
+    chunks of chunk_size bytes. Only the last chunk may be shorter.
+    """
+    if hasattr(stream, 'read'):
+        pieces = iter(lambda: stream.read(chunk_size), b"")
+    else:
+        pieces = iter(stream)
+    buffer = bytearray()
+    for piece in pieces:
+        buffer += piece
+        while len(buffer) >= chunk_size:
+            yield bytes(buffer[:chunk_size])
+            del buffer[:chunk_size]
+    if buffer:
+        yield bytes(buffer)
+
+
+class _FileSlice(object):
+    """
+    A read-only file object over ``length`` bytes of a file starting at
+    ``offset``, which computes the MD5 checksum of the data as it is read.
+    Used as a request body, so that a segment of a large file is streamed
+    from disk instead of being held in memory.
+
+    If a :class:`StreamHasher` is given, the data is also passed to it as
+    it is read. The body of a request may be read more than once, for
+    instance when it is rewound to be sent again, in which case only the
+    data beyond what was read before is passed on.
+    """
+
+    def __init__(self, path, offset, length, hasher=None):
+        self._file = open(path, 'rb')
+        self._offset = offset
+        self._length = length
+        self._hasher = hasher
+        self._hashed = 0
+        self.seek(0)
+
+    def __len__(self):
+        return self._length
+
+    def read(self, size=-1):
+        remaining = self._length - self._position
+        if size is None or size < 0 or size > remaining:
+            size = remaining
+        data = self._file.read(size)
+        if self._hasher and self._position + len(data) > self._hashed:
+            self._hasher.update(data[self._hashed - self._position:])
+            self._hashed = self._position + len(data)
+        self._position += len(data)
+        self.md5.update(data)
+        return data
+
+    def tell(self):
+        return self._position
+
+    def seek(self, position, whence=os.SEEK_SET):
+        # Only rewinding is supported, as when a request is sent again
+        if position != 0 or whence != os.SEEK_SET:
+            raise IOError("Can only seek to the start of a file slice")
+        self._file.seek(self._offset)
+        self._position = 0
+        self.md5 = hashlib.md5()
+        return 0
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def _md5_of_range(path, offset, length):
+    """
+    Returns the MD5 checksum of a range of a file, read in blocks.
+    """
+    with _FileSlice(path, offset, length) as f:
+        while f.read(READ_BLOCK_SIZE):
+            pass
+        return f.md5.hexdigest()
+
+
+def _read_range(path, offset, length):
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        return f.read(length)
+
+
+class _InOrderReader(object):
+    """
+    Reads the parts of a file which are uploaded concurrently in the order
+    in which they appear in the file, and passes them to a hasher, so that
+    checksums of the whole file are computed from the data which is sent,
+    without reading the file again. Parts must be submitted to the executor
+    in order, so that the parts before one which is waiting for its turn
+    have already been started.
+    """
+
+    def __init__(self, path, hasher=None):
+        self.path = path
+        self.hasher = hasher
+        self._next = 0
+        self._cancelled = False
+        self._turn = threading.Condition()
+
+    def read(self, index, offset, length, keep=True):
+        """
+        Waits until the parts before the index-th have been read, then
+        reads the part and passes it to the hasher. Returns the data, or
+        None if keep is False, as for a part which was uploaded earlier
+        and is only read to be hashed.
+        """
+        with self._turn:
+            while self._next != index:
+                if self._cancelled:
+                    # An earlier part may have been cancelled before it
+                    # was read
+                    raise GSClientException(
+                        "Upload of %s was cancelled" % (self.path,))
+                self._turn.wait()
+            try:
+                if not keep and not (self.hasher and self.hasher.enabled):
+                    return None
+                data = _read_range(self.path, offset, length)
+                if self.hasher:
+                    self.hasher.update(data)
+                return data if keep else None
+            finally:
+                self._next += 1
+                self._turn.notify_all()
+
+    def cancel(self):
+        """
+        Wakes up the parts waiting for their turn with an error, after the
+        upload has failed.
+        """
+        with self._turn:
+            self._cancelled = True
+            self._turn.notify_all()
+
+
+def _upload_chunks(chunks, upload_chunk, max_streams):
+    """
+    Calls upload_chunk(index, chunk) for each chunk, with up to max_streams
+    calls running concurrently. The next chunk is only read once a call
+    has finished, so that at most max_streams + 1 chunks are held in
+    memory. Returns the results of the calls in the order of the chunks.
+    """
+    results = {}
+    with ThreadPoolExecutor(max_streams) as executor:
+        pending = {}
+        try:
+            for index, chunk in enumerate(chunks):
+                if len(pending) >= max_streams:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        results[pending.pop(future)] = future.result()
+                pending[executor.submit(upload_chunk, index, chunk)] = index
+            for future in as_completed(pending):
+                results[pending[future]] = future.result()
+        except Exception:
+            for future in pending:
+                future.cancel()
+            raise
+    return [results[index] for index in sorted(results)]
+
 
-def create_handler(storage_type):
+def create_handler(storage_type, session=None, timeout=None, config=None):
     """
     Factory method to return a storage handler for a particular storage type.
     A storage handler handles uploads/downloads from a storage type (such as
     S3, Swift etc), usually using a relevant native SDK.
+
+    An existing :class:`requests.Session` can be supplied so that plain HTTP
+    transfers share its connection pool, and a :class:`TransferConfig` to
+    control how files are split into parts.
+
+    Handlers hold no per-file state, so they may be reused for many files
+    and shared between threads.
     """
     if not storage_type:
         return None
     storage = storage_type.lower()
     if storage == "s3":
-        return S3StorageHandler()
+        return S3StorageHandler(session=session, timeout=timeout,
+                                config=config)
     elif storage == "swift":
-        return SwiftStorageHandler()
+        return SwiftStorageHandler(session=session, timeout=timeout,
+                                   config=config)
     else:
-        return SimpleStorageHandler()
+        return SimpleStorageHandler(session=session, timeout=timeout,
+                                    config=config)
+
+
+class _ProviderCache(object):
+    """
+    A thread-safe cache of cloudbridge providers, keyed by the
+    credentials and storage location they were created with. Entries expire
+    along with their credentials, and are evicted as soon as different
+    credentials are seen for the same storage location, since the storage
+    service issues fresh temporary credentials when the old ones rotate.
+    """
+
+    def __init__(self, max_size=32):
+        self._cache = cache.LRUCache(max_size=max_size)
+        self._current = {}
+        self._lock = threading.Lock()
+
+    def get_provider(self, provider_type, config, location, expires=None):
+        """
+        Returns a provider of the given type created with the given config,
+        creating it if necessary. ``location`` identifies the storage
+        service and bucket or container that the credentials in the config
+        grant access to, and ``expires`` is the time at which they expire.
+        """
+        # cloudbridge and the provider SDKs are slow to import, and are only
+        # needed for uploads
+        from cloudbridge.factory import CloudProviderFactory
+
+        key = (provider_type, tuple(sorted(config.items())))
+        return self._get(key, location, expires,
+                         lambda: CloudProviderFactory().create_provider(
+                             provider_type, config))
+
+    def evict(self, location):
+        """
+        Removes all entries for a storage location, for instance after its
+        credentials have been rejected.
+        """
+        with self._lock:
+            for key in self._current.pop(location, ()):
+                self._cache.invalidate(key)
+
+    def _get(self, key, location, expires, create):
+        value = self._cache.get(key)
+        if value is not None:
+            return value
+        with self._lock:
+            value = self._cache.get(key)
+            if value is not None:
+                return value
+            keys = self._current.setdefault(location, set())
+            # Entries for the same location with other credentials are stale
+            for stale in [k for k in keys if k[:2] != key[:2]]:
+                self._cache.invalidate(stale)
+                keys.discard(stale)
+            value = create()
+            ttl = None
+            if expires:
+                ttl = expires - time.time() - CREDENTIALS_EXPIRY_MARGIN
+                if ttl <= 0:
+                    return value
+            self._cache.put(key, value, ttl=ttl)
+            keys.add(key)
+            return value
+
+
+_provider_cache = _ProviderCache()
 
 
 class StorageHandler():
 
     __metaclass__ = ABCMeta
 
+    def __init__(self, session=None, timeout=None, config=None):
+        self.session = session or util.create_session()
+        self.timeout = timeout
+        self.config = config or TransferConfig()
+
+    @abstractmethod
+    def upload(self, source, upload_info, refresh_upload_info=None,
+               resume=False, checksums=None, progress=None):
+        """
+        Uploads a local file to the location described by upload_info.
+
+        :type refresh_upload_info: :func:
+        :param refresh_upload_info: Returns fresh upload_info for the same
+                                    destination. Used by long running
+                                    uploads when the credentials in
+                                    upload_info are about to expire.
+
+        :type resume: :class:`bool`
+        :param resume: Continue a previously interrupted upload where
+                       possible, and keep the parts of a failed upload so
+                       that it can be continued later.
+
+        :type checksums: :class:`dict`
+        :param checksums: Filled in with the checksums of the uploaded data
+                          for each algorithm in ``config.checksums``. The
+                          data is hashed as it is read to be sent, and an
+                          ETag returned by the storage service which does
+                          not match it raises a
+                          :class:`GSChecksumException`.
+
+        :type progress: :class:`genomespaceclient.progress.TransferProgress`
+        :param progress: Updated with the number of bytes uploaded as parts
+                         of the file complete.
+
+        :return: the number of bytes uploaded.
+        """
+        pass
+
     @abstractmethod
-    def upload(self, source, upload_info):
+    def upload_stream(self, stream, upload_info, refresh_upload_info=None,
+                      checksums=None, progress=None):
+        """
+        Uploads the data read from a file-like object, or yielded by an
+        iterable of byte strings, to the location described by upload_info.
+        The size of the data need not be known in advance. Large streams
+        are uploaded in parts, so that only a few parts are held in memory
+        at a time.
+
+        :return: the number of bytes uploaded.
+        """
+        pass
+
+    @abstractmethod
+    def download(self, download_info, destination, resume=False,
+                 checksums=None, progress=None):
         pass
 
     @abstractmethod
-    def download(self, download_info, destination):
+    def download_stream(self, download_info, state=None, chunk_size=65536):
+        """
+        Yields the data of the object described by download_info in chunks
+        of up to chunk_size bytes, as it is received.
+
+        :type state: :class:`dict`
+        :param state: Filled in with the size, ETag and Last-Modified date
+                      of the object, and the number of bytes yielded so far.
+                      Passing the same dict again after the download was
+                      interrupted continues after the bytes already yielded.
+        """
         pass
 
 
 class SimpleStorageHandler(StorageHandler):
 
-    def upload(self, source, upload_info):
+    def upload(self, source, upload_info, refresh_upload_info=None,
+               resume=False, checksums=None, progress=None):
+        size = os.path.getsize(source)
+        if progress:
+            progress.start(size)
+        with StreamHasher(self.config.checksums) as hasher:
+            # The data is hashed as it is read to be uploaded
+            self._upload(source, size, upload_info, refresh_upload_info,
+                         resume, progress, hasher)
+        if checksums is not None:
+            checksums.update(hasher.hexdigests())
+        return size
+
+    def _upload(self, source, size, upload_info, refresh_upload_info,
+                resume, progress=None, hasher=None):
         raise NotImplementedError(
             "Don't know how to handle upload type: %s" %
             (upload_info.get("uploadType")))
 
-    def download(self, download_info, destination):
+    def upload_stream(self, stream, upload_info, refresh_upload_info=None,
+                      checksums=None, progress=None):
+        raise NotImplementedError(
+            "Don't know how to handle upload type: %s" %
+            (upload_info.get("uploadType")))
+
+    def download(self, download_info, destination, resume=False,
+                 checksums=None, progress=None):
+        """
+        Downloads the object at download_info['Location'] to destination.
+
+        If resume is True, the object's size, ETag and Last-Modified date
+        are recorded next to the destination file while the download is in
+        progress, and if a partially downloaded file with such a record
+        exists, only the remaining bytes are requested, provided the object
+        has not changed since. Otherwise, the whole object is downloaded.
+
+        Objects of at least ``config.multipart_threshold`` bytes are
+        downloaded as ranges of ``config.part_size`` bytes, with up to
+        ``config.max_streams`` ranges fetched concurrently.
+
+        Checksums of the downloaded data are computed for each algorithm in
+        ``config.checksums`` and stored in the checksums dict. If the MD5
+        checksum of the object is known, a mismatch raises a
+        :class:`GSChecksumException` and the destination file is removed.
+
+        If a :class:`genomespaceclient.progress.TransferProgress` is given,
+        it is updated as the data is received.
+
+        :return: the number of bytes downloaded.
+        """
+        location = download_info['Location']
         if not destination or os.path.isdir(destination):
-            disassembled_uri = urlparse(download_info['Location'])
+            disassembled_uri = urlparse(location)
             filename = os.path.basename(disassembled_uri.path)
             destination = os.path.join(destination, filename)
-        with open(destination, 'wb') as handle:
-            response = requests.get(download_info['Location'], stream=True)
+        state_file = destination + RESUME_SUFFIX
+        if not resume:
+            # A download which may not be resumed records no state, and
+            # makes any state left by an earlier download stale
+            self._remove_resume_state(state_file)
+            state_file = None
+        return self._download(location, destination, state_file, resume,
+                              checksums, progress)
+
+    def _download(self, location, destination, state_file, resume,
+                  checksums=None, progress=None):
+        state = self._load_resume_state(state_file) if resume else None
+        if state and state.get('parts') is not None:
+            try:
+                return self._download_parts(location, destination, state_file,
+                                            state, checksums, progress)
+            except _ObjectChanged:
+                log.debug("%s changed since the download started, restarting"
+                          " download", location)
+                state = None
+        if state and os.path.exists(destination):
+            offset = os.path.getsize(destination)
+        else:
+            offset = 0
+        # Requesting a range tells us whether the server supports ranges
+        headers = {'Range': 'bytes=%d-' % offset}
+        if offset:
+            # The server only honours the range if the object is unchanged.
+            headers['If-Range'] = self._get_validator(state)
+        response = self.session.get(location, stream=True,
+                                    headers=headers, timeout=self.timeout)
+        if (offset and response.status_code == 416 and
+                state.get('size') == offset):
+            # nothing left to download
+            response.close()
+            if progress:
+                progress.start(offset, offset)
+            with StreamHasher(
+                    self.config.checksums) as hasher:
+                hasher.update_from_file(destination, 0, offset)
+            self._check_checksums(hasher, state, destination, checksums)
+            self._remove_resume_state(state_file)
+            return 0
+        response.raise_for_status()
+
+        if offset and self._is_continuation(response, state, offset):
+            log.debug("Resuming download of %s from byte %s", destination,
+                      offset)
+            mode = 'ab'
+        else:
+            offset = 0
+            mode = 'wb'
+            state = self._new_resume_state(response)
+            if (response.status_code == 206 and state['size'] and
+                    state['size'] >= self.config.multipart_threshold):
+                response.close()
+                state['parts'] = []
+                self._save_resume_state(state_file, state)
+                return self._download_parts(location, destination,
+                                            state_file, state, checksums,
+                                            progress)
+            self._save_resume_state(state_file, state)
+
+        if progress:
+            progress.start(state['size'], offset)
+        with StreamHasher(self.config.checksums) as hasher:
+            # The part downloaded earlier is read back for hashing
+            hasher.update_from_file(destination, 0, offset)
+            with open(destination, mode) as handle:
+                bytes_copied = 0
+                for block in response.iter_content(65536):
+                    handle.write(block)
+                    hasher.update(block)
+                    bytes_copied += len(block)
+                    if progress:
+                        progress.update(len(block))
+        self._check_checksums(hasher, state, destination, checksums)
+        self._remove_resume_state(state_file)
+        return bytes_copied
+
+    def download_stream(self, download_info, state=None, chunk_size=65536):
+        location = download_info['Location']
+        state = {} if state is None else state
+        offset = state.get('offset', 0)
+        headers = {}
+        if offset:
+            # The server only honours the range if the object is unchanged.
+            headers = {'Range': 'bytes=%d-' % offset,
+                       'If-Range': self._get_validator(state)}
+        response = self.session.get(location, stream=True, headers=headers,
+                                    timeout=self.timeout)
+        try:
+            if (offset and response.status_code == 416 and
+                    state.get('size') == offset):
+                # nothing left to download
+                return
+            response.raise_for_status()
+            if not offset:
+                state.update(self._new_resume_state(response))
+            elif not self._is_continuation(response, state, offset):
+                # The data already yielded cannot be taken back
+                raise GSClientException(
+                    "%s changed while it was being downloaded" % (location,))
+            for block in response.iter_content(chunk_size):
+                offset += len(block)
+                state['offset'] = offset
+                yield block
+        finally:
+            response.close()
+
+    def _download_parts(self, location, destination, state_file, state,
+                        checksums=None, progress=None):
+        """
+        Downloads an object as concurrent byte ranges, each written at its
+        offset in a preallocated destination file. Completed ranges are
+        recorded in the resume state, so that only missing ranges are
+        fetched when resuming. Each range is retried on its own, and if one
+        fails, or reveals that the object has changed, the others are
+        stopped.
+
+        Checksums are computed by reading back the completed ranges at the
+        start of the file while later ranges are still being fetched, which
+        is usually served from the page cache.
+        """
+        size = state['size']
+        part_size = self.config.part_size
+        if (not os.path.exists(destination) or
+                os.path.getsize(destination) != size):
+            with open(destination, 'wb') as handle:
+                handle.truncate(size)
+            state['parts'] = []
+        done = set(state['parts'])
+        lock = threading.Lock()
+        stop = threading.Event()
+        validator = self._get_validator(state)
+        hasher = StreamHasher(self.config.checksums)
+        hashed = [0]
+
+        def hash_completed_parts():
+            # Only the completed ranges at the start of the file can be
+            # hashed, since hashes must be computed in order
+            while hashed[0] in done:
+                length = min(part_size, size - hashed[0])
+                hasher.update_from_file(destination, hashed[0], length)
+                hashed[0] += length
+
+        def fetch_part(start):
+            end = min(start + part_size, size) - 1
+            attempt = 0
+            while True:
+                try:
+                    length = self._download_range(location, destination,
+                                                  validator, start, end, size,
+                                                  stop)
+                    break
+                except _ObjectChanged:
+                    raise
+                except requests.exceptions.RequestException as e:
+                    if attempt >= self.config.max_part_retries or \
+                            stop.is_set():
+                        raise
+                    attempt += 1
+                    log.debug("Retrying bytes %s-%s of %s: %s", start, end,
+                              location, e)
+            with lock:
+                done.add(start)
+                state['parts'] = sorted(done)
+                self._save_resume_state(state_file, state)
+                hash_completed_parts()
+            if progress:
+                progress.update(length)
+            return length
+
+        pending = [start for start in range(0, size, part_size)
+                   if start not in done]
+        log.debug("Downloading %s in %s parts", location, len(pending))
+        if progress:
+            progress.start(size, sum(min(part_size, size - start)
+                                     for start in done))
+        with hasher:
+            hash_completed_parts()
+            with ThreadPoolExecutor(self.config.max_streams) as executor:
+                futures = [executor.submit(fetch_part, start)
+                           for start in pending]
+                bytes_copied = 0
+                try:
+                    for future in as_completed(futures):
+                        bytes_copied += future.result()
+                except Exception:
+                    stop.set()
+                    for future in futures:
+                        future.cancel()
+                    raise
+        self._check_checksums(hasher, state, destination, checksums)
+        self._remove_resume_state(state_file)
+        return bytes_copied
+
+    def _download_range(self, location, destination, validator, start, end,
+                        size, stop=None):
+        headers = {'Range': 'bytes=%d-%d' % (start, end)}
+        if validator:
+            headers['If-Range'] = validator
+        response = self.session.get(location, stream=True, headers=headers,
+                                    timeout=self.timeout)
+        try:
             response.raise_for_status()
-            total_length = response.headers.get('content-length')
+            expected_range = 'bytes %d-%d/%d' % (start, end, size)
+            if (response.status_code != 206 or
+                    response.headers.get('Content-Range') != expected_range):
+                raise _ObjectChanged()
             bytes_copied = 0
-            for block in response.iter_content(65536):
-                handle.write(block)
-                bytes_copied += len(block)
-                if log.isEnabledFor(logging.INFO):
-                    print("Progress: {progress:>8s} of {total:>8s}"
-                          " copied".format(
-                              progress=util.format_file_size(bytes_copied),
-                              total=util.format_file_size(int(total_length))
-                              if total_length else "unknown size", end='\r'))
-            if log.isEnabledFor(logging.INFO):
-                print("\n")
+            with open(destination, 'r+b') as handle:
+                handle.seek(start)
+                for block in response.iter_content(65536):
+                    if stop and stop.is_set():
+                        raise _PartCancelled()
+                    handle.write(block)
+                    bytes_copied += len(block)
+        finally:
+            response.close()
+        if bytes_copied != end - start + 1:
+            raise requests.exceptions.ChunkedEncodingError(
+                "Received %s of %s bytes" % (bytes_copied, end - start + 1))
+        return bytes_copied
+
+    def _load_resume_state(self, state_file):
+        try:
+            with open(state_file) as f:
+                return json.load(f)
+        except (IOError, ValueError):
+            return None
+
+    def _new_resume_state(self, response):
+        content_range = response.headers.get('Content-Range')
+        if content_range:
+            size = content_range.rsplit('/', 1)[-1]
+        else:
+            size = response.headers.get('Content-Length')
+        return {'etag': response.headers.get('ETag'),
+                'last_modified': response.headers.get('Last-Modified'),
+                'size': int(size) if size and size.isdigit() else None,
+                'md5': self._get_md5(response)}
+
+    def _get_md5(self, response):
+        """
+        Returns the MD5 checksum of the whole object reported in a response
+        by the storage service, or None if it is not known.
+        """
+        content_md5 = response.headers.get('Content-MD5')
+        if content_md5 and response.status_code == 200:
+            return md5_from_content_md5(content_md5)
+        return None
+
+    def _check_checksums(self, hasher, state, destination, checksums):
+        """
+        Compares the MD5 checksum computed by hasher, if any, with the MD5
+        checksum recorded in the resume state, and stores the computed
+        checksums in the checksums dict.
+        """
+        digests = hasher.hexdigests()
+        expected = state.get('md5')
+        if expected and digests.get('md5') not in (None, expected):
+            os.remove(destination)
+            self._remove_resume_state(destination + RESUME_SUFFIX)
+            raise GSChecksumException(
+                "MD5 checksum %s of %s does not match checksum %s reported"
+                " by the storage service" % (digests['md5'], destination,
+                                             expected))
+        if checksums is not None:
+            checksums.update(digests)
+
+    def _save_resume_state(self, state_file, state):
+        # There is no state file for a download which may not be resumed
+        if state_file:
+            with open(state_file, 'w') as f:
+                json.dump(state, f)
+
+    def _remove_resume_state(self, state_file):
+        if state_file and os.path.exists(state_file):
+            os.remove(state_file)
+
+    def _get_validator(self, state):
+        """
+        Returns the value for an If-Range header, which makes the server
+        ignore a range request if the object has changed. Weak ETags cannot
+        be used for this.
+        """
+        etag = state.get('etag')
+        if etag and not etag.startswith('W/'):
+            return etag
+        return state.get('last_modified')
+
+    def _is_continuation(self, response, state, offset):
+        """
+        Checks whether a response to a ranged request continues a previous
+        download, i.e. the server honoured the range and the object's size,
+        ETag and Last-Modified date are unchanged.
+        """
+        if response.status_code != 206:
+            return False
+        content_range = response.headers.get('Content-Range', '')
+        if not content_range.startswith('bytes %d-' % offset):
+            return False
+        size = content_range.rsplit('/', 1)[-1]
+        return (size.isdigit() and int(size) == state.get('size') and
+                response.headers.get('ETag') in (None, state.get('etag')) and
+                response.headers.get('Last-Modified') in (
+                    None, state.get('last_modified')))
 
 
 class S3StorageHandler(SimpleStorageHandler):
 
-    def upload(self, source, upload_info):
+    def _upload(self, source, size, upload_info, refresh_upload_info,
+                resume, progress=None, hasher=None):
+        upload = _S3MultipartUpload(self, source, size, upload_info,
+                                    refresh_upload_info, progress, hasher)
+        if size >= self.config.multipart_threshold:
+            return upload.run(resume)
+        try:
+            return upload.put()
+        except Exception:
+            # The credentials may have been revoked or expired early
+            _provider_cache.evict(("s3", upload_info['s3BucketName']))
+            raise
+
+    def upload_stream(self, stream, upload_info, refresh_upload_info=None,
+                      checksums=None, progress=None):
+        upload = _S3StreamUpload(self, stream, upload_info,
+                                 refresh_upload_info, progress)
+        size = upload.run()
+        if checksums is not None:
+            checksums.update(upload.checksums)
+        return size
+
+    def _get_md5(self, response):
+        md5 = super(S3StorageHandler, self)._get_md5(response)
+        etag = (response.headers.get('ETag') or '').strip('"')
+        # The ETag of an object uploaded in parts, or encrypted with a KMS
+        # key, is not its MD5 checksum
+        if (not md5 and MD5_REGEX.match(etag) and response.headers.get(
+                'x-amz-server-side-encryption') != 'aws:kms'):
+            md5 = etag.lower()
+        return md5
+
+    def _create_provider(self, upload_info):
+        from cloudbridge.factory import ProviderList
+
         creds = upload_info["amazonCredentials"]
-        provider = CloudProviderFactory().create_provider(
-            ProviderList.AWS,
-            {'aws_access_key': creds["accessKey"],
-             'aws_secret_key': creds["secretKey"],
-             'aws_session_token': creds["sessionToken"]})
-        bucket = provider.storage.buckets.get(upload_info['s3BucketName'])
-        obj = bucket.objects.create(upload_info['s3ObjectKey'])
-        obj.upload_from_file(source)
+        return _provider_cache.get_provider(
+            ProviderList.AWS, self._get_provider_config(upload_info),
+            ("s3", upload_info['s3BucketName']),
+            expires=util.parse_timestamp(creds.get('expiration')))
+
+    def _get_provider_config(self, upload_info):
+        creds = upload_info["amazonCredentials"]
+        return {'aws_access_key': creds["accessKey"],
+                'aws_secret_key': creds["secretKey"],
+                'aws_session_token': creds["sessionToken"]}
+
+
+class _S3MultipartUpload(object):
+    """
+    Uploads a file to S3 as concurrent parts using the temporary credentials
+    in an uploadinfo response, refreshing them when they are about to, or
+    have, expired.
+    """
+
+    EXPIRED_CREDENTIAL_ERRORS = ('ExpiredToken', 'ExpiredTokenException',
+                                 'RequestExpired', 'TokenRefreshRequired')
+    # S3 limits on the size and number of parts in a multipart upload
+    MIN_PART_SIZE = 5 * 1024 * 1024
+    MAX_PARTS = 10000
+
+    def __init__(self, handler, source, size, upload_info,
+                 refresh_upload_info=None, progress=None, hasher=None):
+        self.handler = handler
+        self.config = handler.config
+        self.source = source
+        self.size = size
+        self.bucket = upload_info['s3BucketName']
+        self.key = upload_info['s3ObjectKey']
+        self.refresh_upload_info = refresh_upload_info
+        self.progress = progress
+        self.hasher = hasher
+        self.upload_id = None
+        # Binary MD5 digests of the parts, by part number, which are
+        # checked by S3 and used to check the ETag of the completed upload
+        self.part_digests = {} if 'md5' in self.config.checksums else None
+        self._lock = threading.RLock()
+        # Parts are read in order, so that the file is hashed as it is read
+        self._reader = _InOrderReader(source, hasher)
+        self._set_credentials(upload_info)
+
+    def _set_credentials(self, upload_info):
+        self.s3 = self.handler._create_provider(
+            upload_info).s3_conn.meta.client
+        self.expires = util.parse_timestamp(
+            upload_info['amazonCredentials'].get('expiration'))
+
+    def _get_client(self):
+        with self._lock:
+            if (self.refresh_upload_info and self.expires and
+                    self.expires - time.time() < CREDENTIALS_EXPIRY_MARGIN):
+                self._refresh_credentials(self.s3)
+            return self.s3
+
+    def _refresh_credentials(self, stale_client):
+        with self._lock:
+            # Another part may already have refreshed the credentials
+            if self.s3 is stale_client:
+                log.debug("Refreshing upload credentials for %s", self.key)
+                self._set_credentials(self.refresh_upload_info())
+
+    def _call(self, method, **kwargs):
+        from botocore.exceptions import ClientError
+
+        s3 = self._get_client()
+        try:
+            return getattr(s3, method)(Bucket=self.bucket, Key=self.key,
+                                       **kwargs)
+        except ClientError as e:
+            code = e.response.get('Error', {}).get('Code')
+            if (code not in self.EXPIRED_CREDENTIAL_ERRORS or
+                    not self.refresh_upload_info):
+                raise
+            self._refresh_credentials(s3)
+            body = kwargs.get('Body')
+            if hasattr(body, 'seek'):
+                # A file body has already been read by the first request
+                body.seek(0)
+            return getattr(self.s3, method)(Bucket=self.bucket, Key=self.key,
+                                            **kwargs)
+
+    def _check_object_etag(self, response, md5):
+        """
+        Checks the ETag of an object uploaded with a single request against
+        the MD5 checksum of the data sent.
+        """
+        etag = response.get('ETag', '').strip('"')
+        # The ETag of an object encrypted with a KMS key is not its MD5
+        # checksum
+        if (MD5_REGEX.match(etag) and
+                response.get('ServerSideEncryption') != 'aws:kms' and
+                etag.lower() != md5):
+            raise GSChecksumException(
+                "ETag %s of %s does not match its checksum %s" % (
+                    etag, self.key, md5))
+
+    def put(self):
+        """
+        Uploads the file with a single request, streaming it from disk, and
+        checks the returned ETag against the checksum of the data sent.
+        """
+        with _FileSlice(self.source, 0, self.size, self.hasher) as body:
+            response = self._call('put_object', Body=body)
+        self._check_object_etag(response, body.md5.hexdigest())
+        if self.progress:
+            self.progress.update(self.size)
+        return self.size
+
+    def _get_parts(self):
+        """
+        Returns a list of (part number, offset, length) tuples.
+        """
+        part_size = max(self.config.part_size, self.MIN_PART_SIZE,
+                        -(-self.size // self.MAX_PARTS))
+        return [(number + 1, offset, min(part_size, self.size - offset))
+                for number, offset in enumerate(
+                    range(0, self.size, part_size))]
+
+    def _read_part(self, offset, length):
+        return _read_range(self.source, offset, length)
+
+    def _list_uploads(self):
+        """
+        Returns the unfinished multipart uploads of the key.
+        """
+        # ListMultipartUploads takes no Key, so it cannot go through _call
+        s3 = self._get_client()
+        kwargs = {'Bucket': self.bucket, 'Prefix': self.key}
+        uploads = []
+        while True:
+            page = s3.list_multipart_uploads(**kwargs)
+            uploads.extend(u for u in page.get('Uploads', [])
+                           if u['Key'] == self.key)
+            if not page.get('IsTruncated'):
+                return uploads
+            kwargs['KeyMarker'] = page['NextKeyMarker']
+            kwargs['UploadIdMarker'] = page['NextUploadIdMarker']
+
+    def _find_uploaded_parts(self, parts):
+        """
+        Looks for an unfinished multipart upload of the same key, and returns
+        a dict of part number to ETag of those of its parts which match the
+        local file. Sets upload_id if a matching upload is found.
+        """
+        from botocore.exceptions import ClientError
+
+        try:
+            uploads = self._list_uploads()
+            if not uploads:
+                return {}
+            upload_id = max(uploads, key=lambda u: u['Initiated'])['UploadId']
+            remote_parts = {}
+            paginator = self._get_client().get_paginator('list_parts')
+            for page in paginator.paginate(Bucket=self.bucket, Key=self.key,
+                                           UploadId=upload_id):
+                for part in page.get('Parts', []):
+                    remote_parts[part['PartNumber']] = part
+        except ClientError as e:
+            # The temporary credentials may not permit listing uploads
+            log.debug("Cannot resume upload of %s: %s", self.key, e)
+            return {}
+
+        self.upload_id = upload_id
+        uploaded = {}
+        for number, offset, length in parts:
+            part = remote_parts.get(number)
+            if part and part['Size'] == length and part['ETag'].strip(
+                    '"') == hashlib.md5(
+                        self._read_part(offset, length)).hexdigest():
+                uploaded[number] = part['ETag']
+                if self.part_digests is not None:
+                    self.part_digests[number] = binascii.unhexlify(
+                        part['ETag'].strip('"'))
+        log.debug("Resuming upload %s of %s with %s parts already uploaded",
+                  upload_id, self.key, len(uploaded))
+        return uploaded
+
+    def _upload_part(self, number, offset, length):
+        return self._put_part(number, self._reader.read(
+            number - 1, offset, length))
+
+    def _put_part(self, number, data):
+        kwargs = {}
+        if self.part_digests is not None:
+            digest = hashlib.md5(data).digest()
+            self.part_digests[number] = digest
+            kwargs['ContentMD5'] = content_md5(digest)
+        attempt = 0
+        while True:
+            try:
+                response = self._call('upload_part', UploadId=self.upload_id,
+                                      PartNumber=number, Body=data, **kwargs)
+                if self.progress:
+                    self.progress.update(len(data))
+                return response['ETag']
+            except Exception as e:
+                if attempt >= self.config.max_part_retries:
+                    raise
+                attempt += 1
+                log.debug("Retrying part %s of %s: %s", number, self.key, e)
+
+    def run(self, resume=False):
+        parts = self._get_parts()
+        uploaded = self._find_uploaded_parts(parts) if resume else {}
+        if self.progress and uploaded:
+            self.progress.start(self.size, sum(
+                length for number, _, length in parts if number in uploaded))
+        if not self.upload_id:
+            self.upload_id = self._call('create_multipart_upload')['UploadId']
+        try:
+            with ThreadPoolExecutor(self.config.max_streams) as executor:
+                futures = {}
+                for number, offset, length in parts:
+                    if number in uploaded:
+                        # Only read to be hashed, in turn with the others
+                        futures[executor.submit(
+                            self._reader.read, number - 1, offset, length,
+                            False)] = None
+                    else:
+                        futures[executor.submit(
+                            self._upload_part, number, offset,
+                            length)] = number
+                try:
+                    for future in as_completed(futures):
+                        etag = future.result()
+                        if futures[future] is not None:
+                            uploaded[futures[future]] = etag
+                except Exception:
+                    for future in futures:
+                        future.cancel()
+                    self._reader.cancel()
+                    raise
+            response = self._call(
+                'complete_multipart_upload', UploadId=self.upload_id,
+                MultipartUpload={'Parts': [
+                    {'PartNumber': number, 'ETag': uploaded[number]}
+                    for number in sorted(uploaded)]})
+        except Exception:
+            if not resume:
+                self._abort()
+            raise
+        self._check_etag(response)
+        return self.size
+
+    def _check_etag(self, response):
+        """
+        Checks the ETag of a completed multipart upload against the MD5
+        digests of its parts.
+        """
+        if self.part_digests is None:
+            return
+        etag = response.get('ETag', '').strip('"')
+        expected = multipart_etag([self.part_digests[number]
+                                   for number in sorted(self.part_digests)])
+        if etag and etag != expected:
+            raise GSChecksumException(
+                "ETag %s of %s does not match the checksums of the uploaded"
+                " parts (expected %s)" % (etag, self.key, expected))
+
+    def _abort(self):
+        try:
+            self._call('abort_multipart_upload', UploadId=self.upload_id)
+        except Exception as e:
+            log.warning("Could not abort multipart upload %s of %s: %s",
+                        self.upload_id, self.key, e)
+
+
+class _S3StreamUpload(_S3MultipartUpload):
+    """
+    Uploads a stream of unknown size to S3. A stream which fits in a single
+    part is uploaded with a single request. Otherwise, it is uploaded as a
+    multipart upload of parts of ``config.part_size`` bytes, which limits
+    the size of the stream to ``MAX_PARTS`` parts.
+    """
+
+    def __init__(self, handler, stream, upload_info,
+                 refresh_upload_info=None, progress=None):
+        super(_S3StreamUpload, self).__init__(
+            handler, None, 0, upload_info, refresh_upload_info, progress)
+        self.stream = stream
+        self.part_size = max(self.config.part_size, self.MIN_PART_SIZE)
+        self.checksums = {}
+
+    def _count_parts(self, chunks, hasher):
+        for index, chunk in enumerate(chunks):
+            if index >= self.MAX_PARTS:
+                raise GSClientException(
+                    "Stream uploaded to %s exceeds %s parts of %s bytes" % (
+                        self.key, self.MAX_PARTS, self.part_size))
+            self.size += len(chunk)
+            hasher.update(chunk)
+            yield chunk
+
+    def run(self, resume=False):
+        if self.progress:
+            self.progress.start(None)
+        with StreamHasher(self.config.checksums) as hasher:
+            self._run(hasher)
+        self.checksums = hasher.hexdigests()
+        return self.size
+
+    def _run(self, hasher):
+        chunks = _iter_chunks(self.stream, self.part_size)
+        first = next(chunks, b"")
+        second = next(chunks, None)
+        if second is None:
+            hasher.update(first)
+            self.size = len(first)
+            md5 = hashlib.md5(first)
+            if self.part_digests is None:
+                response = self._call('put_object', Body=first)
+            else:
+                response = self._call('put_object', Body=first,
+                                      ContentMD5=content_md5(md5.digest()))
+            self._check_object_etag(response, md5.hexdigest())
+            if self.progress:
+                self.progress.update(self.size)
+            return
+        self.upload_id = self._call('create_multipart_upload')['UploadId']
+        try:
+            etags = _upload_chunks(
+                self._count_parts(itertools.chain([first, second], chunks),
+                                  hasher),
+                lambda index, chunk: self._put_part(index + 1, chunk),
+                self.config.max_streams)
+            response = self._call(
+                'complete_multipart_upload', UploadId=self.upload_id,
+                MultipartUpload={'Parts': [
+                    {'PartNumber': index + 1, 'ETag': etag}
+                    for index, etag in enumerate(etags)]})
+        except Exception:
+            self._abort()
+            raise
+        self._check_etag(response)
 
 
 class SwiftStorageHandler(SimpleStorageHandler):
     SEGMENT_SIZE = 2 * 1024 * 1024 * 1024  # 2GB
 
-    def upload(self, source, upload_info):
-        container, location = upload_info["path"].split("/", 1)
-        provider = CloudProviderFactory().create_provider(
-            ProviderList.OPENSTACK,
-            {'os_storage_url': upload_info["swiftFileUrl"],
-             'os_auth_token': upload_info["token"]})
-        bucket = provider.storage.buckets.get(container)
-        obj = bucket.objects.create(location)
-        obj.upload_from_file(source)
+    def _upload(self, source, size, upload_info, refresh_upload_info,
+                resume, progress=None, hasher=None):
+        segment_size = self.config.segment_size or self.SEGMENT_SIZE
+        upload = _SwiftSegmentedUpload(self, source, size, segment_size,
+                                       upload_info, refresh_upload_info,
+                                       progress, hasher)
+        if size > segment_size:
+            return upload.run(resume)
+        return upload.put()
+
+    def upload_stream(self, stream, upload_info, refresh_upload_info=None,
+                      checksums=None, progress=None):
+        # Segments are held in memory, so the default segment size for
+        # files is too large for streams
+        segment_size = self.config.segment_size or self.config.part_size
+        upload = _SwiftStreamUpload(self, stream, segment_size, upload_info,
+                                    refresh_upload_info, progress)
+        size = upload.run()
+        if checksums is not None:
+            checksums.update(upload.checksums)
+        return size
+
+    def _get_md5(self, response):
+        md5 = super(SwiftStorageHandler, self)._get_md5(response)
+        etag = response.headers.get('ETag') or ''
+        # The ETag of a large object is derived from the ETags of its
+        # segments, and is quoted
+        if (not md5 and MD5_REGEX.match(etag) and
+                not response.headers.get('X-Static-Large-Object') and
+                not response.headers.get('X-Object-Manifest')):
+            md5 = etag.lower()
+        return md5
+
+
+class _SwiftSegmentedUpload(object):
+    """
+    Uploads a file to Swift as a static large object. The file is split
+    into segments which are uploaded concurrently to a separate segment
+    container, after which a manifest listing the segments is written to
+    the destination object.
+
+    Segment names include the size and modification time of the source
+    file, so that segments left behind by an interrupted upload of the
+    same file can be recognised and skipped.
+
+    Segments are streamed from disk. If checksums of the whole file are
+    wanted, segments are instead read into memory in order, and hashed as
+    they are read, which limits them to ``config.part_size`` unless the
+    file needs larger segments to fit in ``MAX_SEGMENTS``.
+    """
+
+    # Swift's default limit on the number of segments in a manifest
+    MAX_SEGMENTS = 1000
+
+    def __init__(self, handler, source, size, segment_size, upload_info,
+                 refresh_upload_info=None, progress=None, hasher=None):
+        self.handler = handler
+        self.config = handler.config
+        self.source = source
+        self.size = size
+        self.hasher = hasher
+        self._reader = None
+        if hasher and hasher.enabled:
+            self._reader = _InOrderReader(source, hasher)
+            segment_size = min(segment_size, self.config.part_size)
+        self.segment_size = max(segment_size,
+                                -(-size // self.MAX_SEGMENTS))
+        self.container, self.location = upload_info["path"].split("/", 1)
+        self.segment_container = self.container + "_segments"
+        self.segment_prefix = self._get_segment_prefix()
+        self.refresh_upload_info = refresh_upload_info
+        self.progress = progress
+        self._lock = threading.Lock()
+        self._set_credentials(upload_info)
+
+    def _get_segment_prefix(self):
+        return "%s/%s/%s/%s/" % (self.location,
+                                 os.path.getmtime(self.source), self.size,
+                                 self.segment_size)
+
+    def _set_credentials(self, upload_info):
+        self.storage_url = upload_info["swiftFileUrl"].rstrip("/")
+        self.token = upload_info["token"]
+
+    def _request(self, method, container, name="", refresh=True, **kwargs):
+        token = self.token
+        url = "%s/%s" % (self.storage_url, quote(container))
+        if name:
+            url += "/" + quote(name)
+        headers = kwargs.pop('headers', {})
+        headers['X-Auth-Token'] = token
+        response = self.handler.session.request(
+            method, url, headers=headers, timeout=self.handler.timeout,
+            **kwargs)
+        if (response.status_code == 401 and refresh and
+                self.refresh_upload_info):
+            with self._lock:
+                # Another segment may already have refreshed the token
+                if self.token == token:
+                    log.debug("Refreshing upload credentials for %s",
+                              self.location)
+                    self._set_credentials(self.refresh_upload_info())
+            data = kwargs.get('data')
+            if hasattr(data, 'seek'):
+                # A file body has already been read by the first request
+                data.seek(0)
+            return self._request(method, container, name, refresh=False,
+                                 headers=headers, **kwargs)
+        response.raise_for_status()
+        return response
+
+    def _get_segments(self):
+        """
+        Returns a list of (segment name, offset, length) tuples.
+        """
+        return [("%s%08d" % (self.segment_prefix, index), offset,
+                 min(self.segment_size, self.size - offset))
+                for index, offset in enumerate(
+                    range(0, self.size, self.segment_size))]
+
+    def _list_segments(self):
+        """
+        Returns the segments of this file which exist in the segment
+        container, as a dict of segment name to listing entry.
+        """
+        try:
+            listing = self._request(
+                'GET', self.segment_container,
+                params={'prefix': self.segment_prefix,
+                        'format': 'json'}).json()
+        except requests.exceptions.HTTPError as e:
+            log.debug("Cannot list segments of %s: %s", self.location, e)
+            return {}
+        return dict((item['name'], item) for item in listing)
+
+    def _find_uploaded_segments(self, segments):
+        """
+        Returns a dict of segment name to ETag for those segments which have
+        already been uploaded and match the local file.
+        """
+        remote = self._list_segments()
+        uploaded = {}
+        for name, offset, length in segments:
+            item = remote.get(name)
+            if item and item['bytes'] == length:
+                etag = _md5_of_range(self.source, offset, length)
+                if item['hash'] == etag:
+                    uploaded[name] = etag
+        log.debug("Resuming upload of %s with %s segments already uploaded",
+                  self.location, len(uploaded))
+        return uploaded
+
+    def put(self):
+        """
+        Uploads the file as a single object, streaming it from disk, and
+        checks the returned ETag against the checksum of the data sent.
+        """
+        with _FileSlice(self.source, 0, self.size, self.hasher) as body:
+            response = self._request('PUT', self.container, self.location,
+                                     data=body)
+        self._check_etag(response, self.location, body.md5.hexdigest())
+        if self.progress:
+            self.progress.update(self.size)
+        return self.size
+
+    def _check_etag(self, response, name, etag):
+        received = (response.headers.get('ETag') or '').strip('"')
+        if received and received != etag:
+            raise GSChecksumException(
+                "ETag %s of %s does not match its checksum %s" % (
+                    received, name, etag))
+
+    def _upload_segment(self, index, name, offset, length):
+        """
+        Uploads a segment of the file, streaming it from disk. Its checksum
+        is computed while it is sent, and compared with the ETag that Swift
+        computed from the data it received. If the whole file is being
+        hashed, the segment is read in turn instead, and its checksum sent
+        along for Swift to check.
+        """
+        if self._reader:
+            return self._put_segment(name, self._reader.read(
+                index, offset, length))
+
+        def put():
+            with _FileSlice(self.source, offset, length) as body:
+                response = self._request('PUT', self.segment_container,
+                                         name, data=body)
+            etag = body.md5.hexdigest()
+            self._check_etag(response, name, etag)
+            return etag
+        return self._put_with_retries(name, put, length)
+
+    def _put_segment(self, name, data):
+        etag = hashlib.md5(data).hexdigest()
+
+        def put():
+            self._request('PUT', self.segment_container, name, data=data,
+                          headers={'ETag': etag})
+            return etag
+        return self._put_with_retries(name, put, len(data))
+
+    def _put_with_retries(self, name, put, length):
+        attempt = 0
+        while True:
+            try:
+                etag = put()
+                if self.progress:
+                    self.progress.update(length)
+                return etag
+            except Exception as e:
+                if attempt >= self.config.max_part_retries:
+                    raise
+                attempt += 1
+                log.debug("Retrying segment %s: %s", name, e)
+
+    def run(self, resume=False):
+        segments = self._get_segments()
+        uploaded = self._find_uploaded_segments(segments) if resume else {}
+        if self.progress and uploaded:
+            self.progress.start(self.size, sum(
+                length for name, _, length in segments if name in uploaded))
+        self._request('PUT', self.segment_container)
+        try:
+            with ThreadPoolExecutor(self.config.max_streams) as executor:
+                futures = {}
+                for index, (name, offset, length) in enumerate(segments):
+                    if name not in uploaded:
+                        futures[executor.submit(
+                            self._upload_segment, index, name, offset,
+                            length)] = name
+                    elif self._reader:
+                        # Only read to be hashed, in turn with the others
+                        futures[executor.submit(
+                            self._reader.read, index, offset, length,
+                            False)] = None
+                try:
+                    for future in as_completed(futures):
+                        etag = future.result()
+                        if futures[future] is not None:
+                            uploaded[futures[future]] = etag
+                except Exception:
+                    for future in futures:
+                        future.cancel()
+                    if self._reader:
+                        self._reader.cancel()
+                    raise
+            manifest = [{'path': "/%s/%s" % (self.segment_container, name),
+                         'etag': uploaded[name],
+                         'size_bytes': length}
+                        for name, _, length in segments]
+            self._request('PUT', self.container, self.location,
+                          params={'multipart-manifest': 'put'},
+                          data=json.dumps(manifest))
+        except Exception:
+            if not resume:
+                self._delete_segments()
+            raise
+        return self.size
+
+    def _delete_segments(self):
+        for name in self._list_segments():
+            try:
+                self._request('DELETE', self.segment_container, name)
+            except Exception as e:
+                log.warning("Could not delete segment %s: %s", name, e)
+
+
+class _SwiftStreamUpload(_SwiftSegmentedUpload):
+    """
+    Uploads a stream of unknown size to Swift. A stream which fits in a
+    single segment is uploaded with a single request. Otherwise, it is
+    uploaded as a static large object, which limits the size of the stream
+    to ``MAX_SEGMENTS`` segments.
+    """
+
+    def __init__(self, handler, stream, segment_size, upload_info,
+                 refresh_upload_info=None, progress=None):
+        super(_SwiftStreamUpload, self).__init__(
+            handler, None, 0, segment_size, upload_info, refresh_upload_info,
+            progress)
+        self.stream = stream
+        self.checksums = {}
+
+    def _get_segment_prefix(self):
+        # A stream cannot be recognised again, so its segments are named
+        # after the time at which the upload started
+        return "%s/stream/%s/%s/" % (self.location, time.time(),
+                                     self.segment_size)
+
+    def _upload_stream_segment(self, index, data):
+        if index >= self.MAX_SEGMENTS:
+            raise GSClientException(
+                "Stream uploaded to %s exceeds %s segments of %s bytes" % (
+                    self.location, self.MAX_SEGMENTS, self.segment_size))
+        name = "%s%08d" % (self.segment_prefix, index)
+        return {'path': "/%s/%s" % (self.segment_container, name),
+                'etag': self._put_segment(name, data),
+                'size_bytes': len(data)}
+
+    def _hash_chunks(self, chunks, hasher):
+        for chunk in chunks:
+            hasher.update(chunk)
+            yield chunk
+
+    def run(self, resume=False):
+        if self.progress:
+            self.progress.start(None)
+        with StreamHasher(self.config.checksums) as hasher:
+            size = self._run(hasher)
+        self.checksums = hasher.hexdigests()
+        return size
+
+    def _run(self, hasher):
+        chunks = self._hash_chunks(
+            _iter_chunks(self.stream, self.segment_size), hasher)
+        first = next(chunks, b"")
+        second = next(chunks, None)
+        if second is None:
+            self._request('PUT', self.container, self.location, data=first,
+                          headers={'ETag': hashlib.md5(first).hexdigest()})
+            if self.progress:
+                self.progress.update(len(first))
+            return len(first)
+        self._request('PUT', self.segment_container)
+        try:
+            manifest = _upload_chunks(
+                itertools.chain([first, second], chunks),
+                self._upload_stream_segment, self.config.max_streams)
+            self._request('PUT', self.container, self.location,
+                          params={'multipart-manifest': 'put'},
+                          data=json.dumps(manifest))
+        except Exception:
+            self._delete_segments()
+            raise
+        return sum(segment['size_bytes'] for segment in manifest)
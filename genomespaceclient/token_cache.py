@@ -0,0 +1,138 @@
+import binascii
+import contextlib
+import hashlib
+import hmac
+import json
+import logging
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:
+    # Not available on Windows, where only threads are serialised
+    fcntl = None
+
+log = logging.getLogger(__name__)
+
+DEFAULT_TOKEN_CACHE_PATH = os.path.join(
+    os.path.expanduser("~"), ".genomespace", "tokens.json")
+
+# PBKDF2 iterations used to derive the password verifier stored with a token
+PASSWORD_HASH_ITERATIONS = 100000
+
+
+class TokenCache(object):
+    """
+    Stores GenomeSpace auth tokens on disk, keyed by server and username,
+    so that they can be reused by other clients and processes until they
+    expire.
+
+    The cache file is only readable by its owner. Updates are serialised
+    with a lock file, and written to a temporary file which then replaces
+    the cache file, so that readers never see a partially written file.
+
+    A token obtained with a password is stored with a salted hash of the
+    password, and is only returned to callers which supply the same
+    password, so that a wrong password is not accepted on the strength of
+    a cached token.
+    """
+
+    def __init__(self, path=DEFAULT_TOKEN_CACHE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def _key(self, server_url, username):
+        return "{0}|{1}".format(server_url.rstrip("/"), username)
+
+    def _read(self):
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (IOError, OSError, ValueError):
+            return {}
+
+    @contextlib.contextmanager
+    def _locked(self):
+        with self._lock:
+            directory = os.path.dirname(self.path)
+            if directory and not os.path.isdir(directory):
+                os.makedirs(directory, 0o700)
+            fd = os.open(self.path + ".lock", os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                if fcntl:
+                    fcntl.flock(fd, fcntl.LOCK_EX)
+                yield
+            finally:
+                os.close(fd)
+
+    def _write(self, tokens):
+        temp_path = "{0}.{1}.tmp".format(self.path, os.getpid())
+        fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC,
+                     0o600)
+        with os.fdopen(fd, "w") as f:
+            json.dump(tokens, f)
+        # os.rename cannot replace an existing file on Windows
+        getattr(os, "replace", os.rename)(temp_path, self.path)
+
+    def _hash_password(self, password, salt):
+        return binascii.hexlify(hashlib.pbkdf2_hmac(
+            "sha256", password.encode("utf-8"), binascii.unhexlify(salt),
+            PASSWORD_HASH_ITERATIONS)).decode("ascii")
+
+    def get(self, server_url, username, password=None):
+        """
+        Returns a (token, expiry time) tuple for a user of a server, or None
+        if no unexpired token is cached. If a password is given, a token is
+        only returned if it was stored with the same password.
+        """
+        entry = self._read().get(self._key(server_url, username))
+        if not entry or entry.get("expires", 0) <= time.time():
+            return None
+        if password is not None:
+            salt = entry.get("salt")
+            if not salt or not hmac.compare_digest(
+                    self._hash_password(password, salt),
+                    entry.get("password_hash", "")):
+                return None
+        return entry["token"], entry["expires"]
+
+    def put(self, server_url, username, token, expires, password=None):
+        """
+        Stores a token which expires at the given timestamp in seconds,
+        along with a hash of the password it was obtained with, if any.
+        Expired tokens of other users are removed at the same time.
+        """
+        cached = {"token": token, "expires": expires}
+        if password is not None:
+            cached["salt"] = binascii.hexlify(os.urandom(16)).decode("ascii")
+            cached["password_hash"] = self._hash_password(password,
+                                                          cached["salt"])
+        try:
+            with self._locked():
+                now = time.time()
+                tokens = dict((key, entry) for key, entry
+                              in self._read().items()
+                              if entry.get("expires", 0) > now)
+                tokens[self._key(server_url, username)] = cached
+                self._write(tokens)
+        except (IOError, OSError) as e:
+            log.warning("Could not write token cache %s: %s", self.path, e)
+
+    def invalidate(self, server_url, username, token=None):
+        """
+        Removes the token of a user of a server. If a token is given, the
+        cached token is only removed if it is that token, so that a token
+        which another process has just renewed is kept.
+        """
+        try:
+            with self._locked():
+                tokens = self._read()
+                key = self._key(server_url, username)
+                entry = tokens.get(key)
+                if entry and token in (None, entry.get("token")):
+                    del tokens[key]
+                    self._write(tokens)
+        except (IOError, OSError) as e:
+            log.warning("Could not write token cache %s: %s", self.path, e)
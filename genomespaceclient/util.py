@@ -1,3 +1,19 @@
+import calendar
+import email.utils
+import re
+import time
+
+try:
+    from urllib.parse import parse_qs, urlparse
+except ImportError:
+    from urlparse import parse_qs, urlparse
+
+
+ISO_8601_REGEX = re.compile(
+    r"^(\d{4})-(\d{2})-(\d{2})[T ](\d{2}):(\d{2}):(\d{2})(\.\d+)?"
+    r"(?:Z|([+-])(\d{2}):?(\d{2}))?$")
+
+
 def format_file_size(num, suffix='B'):
     """
     http://stackoverflow.com/questions/1094841/reusable-library-to-get-human-readable-version-of-file-size
@@ -7,3 +23,85 @@ def format_file_size(num, suffix='B'):
             return "%3.1f%s%s" % (num, unit, suffix)
         num /= 1024.0
     return "%.1f%s%s" % (num, 'Yi', suffix)
+
+
+def parse_file_size(size):
+    """
+    Converts a human readable file size, such as 16M or 1.5G, to a number of
+    bytes. Units are powers of 1024, and a trailing 'B' is optional.
+    """
+    units = ['', 'K', 'M', 'G', 'T', 'P', 'E', 'Z']
+    value = size.strip().upper()
+    if value.endswith('B'):
+        value = value[:-1]
+    if value and value[-1] in units[1:]:
+        return int(float(value[:-1]) * 1024 ** units.index(value[-1]))
+    return int(value)
+
+
+def parse_timestamp(value):
+    """
+    Converts a timestamp in seconds or milliseconds, an ISO 8601 date such
+    as 2017-05-09T18:56:54.000+0000, or an RFC 1123 date, to a timestamp in
+    seconds. Dates without a timezone are taken to be in UTC. Returns None
+    if the value is empty or cannot be parsed.
+    """
+    if not value:
+        return None
+    if isinstance(value, (int, float)) or str(value).isdigit():
+        value = float(value)
+        # timestamps in milliseconds are too large to be in seconds
+        return value / 1000 if value > 1e11 else value
+    match = ISO_8601_REGEX.match(value.strip())
+    if match:
+        (year, month, day, hour, minute, second, fraction, tz_sign,
+         tz_hours, tz_minutes) = match.groups()
+        timestamp = calendar.timegm(
+            (int(year), int(month), int(day), int(hour), int(minute),
+             int(second), 0, 0, 0)) + float(fraction or 0)
+        if tz_sign:
+            offset = int(tz_hours) * 3600 + int(tz_minutes) * 60
+            timestamp -= offset if tz_sign == '+' else -offset
+        return timestamp
+    parsed = email.utils.parsedate_tz(value)
+    if parsed:
+        return email.utils.mktime_tz(parsed)
+    return None
+
+
+def get_presigned_url_expiry(url):
+    """
+    Returns the time at which a presigned S3 URL (signature version 2 or 4)
+    or a Swift temporary URL expires, as a timestamp in seconds. Returns
+    None if the URL does not carry an expiry time.
+    """
+    params = dict((key.lower(), values[0]) for key, values in
+                  parse_qs(urlparse(url).query).items())
+    try:
+        if 'x-amz-date' in params and 'x-amz-expires' in params:
+            signed = calendar.timegm(
+                time.strptime(params['x-amz-date'], '%Y%m%dT%H%M%SZ'))
+            return signed + int(params['x-amz-expires'])
+        expires = params.get('expires') or params.get('temp_url_expires')
+        return int(expires) if expires else None
+    except ValueError:
+        return None
+
+
+def create_session(pool_size=10):
+    """
+    Returns a new :class:`requests.Session` which keeps up to ``pool_size``
+    keep-alive connections open per host, so that consecutive requests to
+    the same server can reuse an existing connection instead of performing a
+    fresh TCP/TLS handshake.
+    """
+    # Imported here so that the shell can use the other helpers without
+    # waiting for requests to load
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
@@ -0,0 +1,232 @@
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from genomespaceclient import util
+from genomespaceclient.exceptions import GSTransferException
+
+
+log = logging.getLogger(__name__)
+
+
+class TaskResult(object):
+    """
+    The outcome of a single task run by a :class:`WorkerPool`.
+    """
+
+    def __init__(self, key, value=None, error=None):
+        self.key = key
+        self.value = value
+        self.error = error
+
+    def __repr__(self):
+        if self.error is not None:
+            return "%s: %r" % (self.key, self.error)
+        return "%s: %r" % (self.key, self.value)
+
+
+def check_results(results, action):
+    """
+    Raises an error if any of the given :class:`TaskResult` failed. If the
+    operation consisted of a single task, its error is raised unchanged.
+    """
+    errors = [result for result in results if result.error is not None]
+    if len(results) == 1 and errors:
+        raise errors[0].error
+    if errors:
+        raise GSTransferException(
+            "Some errors occurred while %s: %s" % (action, errors), errors)
+
+
+class WorkerPool(object):
+    """
+    Runs tasks on a bounded pool of worker threads.
+
+    Tasks may submit further tasks to the same pool (e.g. a folder listing
+    submitting a task per child), and :meth:`join` waits until all of them,
+    including those submitted while the pool was running, have completed.
+    Exceptions raised by a task are recorded against its key instead of
+    aborting the remaining tasks.
+
+    When ``max_workers`` is 1, no threads are started and tasks are run in
+    the calling thread during :meth:`join`.
+    """
+
+    def __init__(self, max_workers=1):
+        self.max_workers = max(1, max_workers or 1)
+        self.results = []
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._pending = 0
+        self._queue = deque()
+        if self.max_workers > 1:
+            self._executor = ThreadPoolExecutor(self.max_workers)
+        else:
+            self._executor = None
+
+    def submit(self, key, func, *args, **kwargs):
+        """
+        Schedules ``func(*args, **kwargs)`` to run. ``key`` identifies the
+        task in the results, and is usually the path being processed.
+        """
+        if self._executor is None:
+            self._queue.append((key, func, args, kwargs))
+        else:
+            with self._lock:
+                self._pending += 1
+            self._executor.submit(self._run, key, func, args, kwargs)
+
+    def _run(self, key, func, args, kwargs):
+        try:
+            result = TaskResult(key, value=func(*args, **kwargs))
+        except Exception as e:
+            log.debug("Task %s failed: %s", key, e)
+            result = TaskResult(key, error=e)
+        with self._lock:
+            self.results.append(result)
+            if self._executor is not None:
+                self._pending -= 1
+                if not self._pending:
+                    self._idle.notify_all()
+
+    def join(self):
+        """
+        Waits for all submitted tasks to complete and returns the list of
+        :class:`TaskResult` in order of completion.
+        """
+        if self._executor is None:
+            while self._queue:
+                self._run(*self._queue.popleft())
+        else:
+            with self._idle:
+                while self._pending:
+                    self._idle.wait()
+        return self.results
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.shutdown()
+
+
+class TransferSummary(object):
+    """
+    Aggregates the results of a multi-file transfer. Tasks which return a
+    byte count are counted as transferred files; tasks which return None,
+    such as folder listings, are only included if they failed.
+
+    If checksums were requested, ``checksums`` maps the source of each
+    transferred file to a dict of its checksums by algorithm name.
+    """
+
+    def __init__(self, results, elapsed, checksums=None):
+        self.results = results
+        self.elapsed = elapsed
+        self.checksums = checksums or {}
+
+    @property
+    def transferred(self):
+        return [result for result in self.results
+                if result.error is None and result.value is not None]
+
+    @property
+    def failed(self):
+        return [result for result in self.results
+                if result.error is not None]
+
+    @property
+    def bytes_transferred(self):
+        return sum(result.value for result in self.transferred)
+
+    @property
+    def throughput(self):
+        """
+        Aggregate throughput across all files in bytes per second.
+        """
+        if not self.elapsed:
+            return 0
+        return self.bytes_transferred / self.elapsed
+
+    def __str__(self):
+        return ("{files} files ({size}) transferred in {elapsed:.1f}s"
+                " at {rate}/s, {failed} failed".format(
+                    files=len(self.transferred),
+                    size=util.format_file_size(self.bytes_transferred),
+                    elapsed=self.elapsed,
+                    rate=util.format_file_size(self.throughput),
+                    failed=len(self.failed)))
+
+
+class SyncSummary(TransferSummary):
+    """
+    Aggregates the results of a sync. In addition to the transferred files,
+    records the files which were skipped because they were unchanged, and
+    the results of deleting files which no longer exist in the source.
+    """
+
+    def __init__(self, results, elapsed, skipped=None, deletions=None,
+                 checksums=None):
+        super(SyncSummary, self).__init__(results + (deletions or []),
+                                          elapsed, checksums)
+        self.skipped = skipped or []
+        self.deletions = deletions or []
+
+    @property
+    def deleted(self):
+        return [result for result in self.deletions
+                if result.error is None]
+
+    def __str__(self):
+        return ("{files} files ({size}) transferred in {elapsed:.1f}s"
+                " at {rate}/s, {skipped} skipped, {deleted} deleted,"
+                " {failed} failed".format(
+                    files=len(self.transferred),
+                    size=util.format_file_size(self.bytes_transferred),
+                    elapsed=self.elapsed,
+                    rate=util.format_file_size(self.throughput),
+                    skipped=len(self.skipped),
+                    deleted=len(self.deleted),
+                    failed=len(self.failed)))
+
+
+class DeleteSummary(object):
+    """
+    Aggregates the results of a recursive delete, in which tasks deleting a
+    file or folder return :attr:`FILE` or :attr:`FOLDER` respectively.
+    """
+
+    FILE = "file"
+    FOLDER = "folder"
+
+    def __init__(self, results, elapsed):
+        self.results = results
+        self.elapsed = elapsed
+
+    @property
+    def deleted_files(self):
+        return [result for result in self.results
+                if result.error is None and result.value == self.FILE]
+
+    @property
+    def deleted_folders(self):
+        return [result for result in self.results
+                if result.error is None and result.value == self.FOLDER]
+
+    @property
+    def failed(self):
+        return [result for result in self.results
+                if result.error is not None]
+
+    def __str__(self):
+        return ("{files} files and {folders} folders deleted in"
+                " {elapsed:.1f}s, {failed} failed".format(
+                    files=len(self.deleted_files),
+                    folders=len(self.deleted_folders),
+                    elapsed=self.elapsed,
+                    failed=len(self.failed)))
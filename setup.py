@@ -7,8 +7,10 @@ setup(name='python-genomespaceclient',
       author='GVL Project',
       author_email='help@genome.edu.au',
       url='http://python-genomespaceclient.readthedocs.org/',
-      install_requires=['cloudbridge>=2.0.0', 'requests'],
+      install_requires=['cloudbridge>=2.0.0', 'requests',
+                        'futures; python_version == "2.7"'],
       extras_require={
+          'async': ['aiohttp>=3.0'],
           'dev': ['tox', 'sphinx', 'flake8', 'flake8-import-order']
       },
       packages=find_packages(),
@@ -0,0 +1,151 @@
+import filecmp
+import os
+import tempfile
+import unittest
+import uuid
+from test import helpers
+
+try:
+    import asyncio
+    from genomespaceclient.aio import AsyncGenomeSpaceClient, aiohttp
+except (ImportError, SyntaxError):
+    # asyncio and aiohttp are only available on Python 3
+    aiohttp = None
+
+try:
+    from urllib.parse import urljoin
+except ImportError:
+    from urlparse import urljoin
+
+
+@unittest.skipIf(aiohttp is None, "aiohttp is not installed")
+class AsyncGenomeSpaceClientTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.client = AsyncGenomeSpaceClient(
+            username=helpers.get_test_username(),
+            password=helpers.get_test_password())
+
+    def tearDown(self):
+        self._run(self.client.close())
+        self.loop.close()
+
+    def _run(self, coro):
+        return self.loop.run_until_complete(coro)
+
+    def _get_test_file(self):
+        return os.path.join(os.path.dirname(__file__), 'fixtures/logo.png')
+
+    def _get_temp_filename(self):
+        return str(uuid.uuid4())
+
+    def _get_temp_file(self):
+        return os.path.join(tempfile.gettempdir(), self._get_temp_filename())
+
+    def _get_remote_file(self):
+        filename = self._get_temp_filename() + ".txt"
+        return (urljoin(helpers.get_remote_test_folder(), filename),
+                filename)
+
+    def test_copy(self):
+        local_test_file = self._get_test_file()
+        remote_file, remote_name = self._get_remote_file()
+        local_temp_file = self._get_temp_file()
+
+        self._run(self.client.copy(local_test_file, remote_file))
+        filelist = self._run(
+            self.client.list(helpers.get_remote_test_folder()))
+        self._run(self.client.copy(remote_file, local_temp_file))
+        self._run(self.client.delete(remote_file))
+
+        found_file = [f for f in filelist.contents
+                      if f.name == remote_name]
+        self.assertTrue(len(found_file) == 1, "Expected file not found")
+        self.assertTrue(filecmp.cmp(local_test_file, local_temp_file))
+        self.assertFalse(self._run(self.client.isdir(remote_file)),
+                         "Expected file to have been deleted")
+        os.remove(local_temp_file)
+
+
+class _Entry(object):
+
+    def __init__(self, url, is_directory):
+        self.url = url
+        self.name = url.rsplit("/", 1)[-1]
+        self.is_directory = is_directory
+
+
+class _Listing(object):
+
+    def __init__(self, contents):
+        self.contents = contents
+
+
+class _Server(object):
+    """
+    Answers the requests of a client to a tree of folders, given as a dict
+    of folder url to entries, a little later each, and records the peak
+    number of requests in progress.
+    """
+
+    def __init__(self, loop, tree):
+        self.loop = loop
+        self.tree = tree
+        self.active = 0
+        self.peak = 0
+        self.deleted = []
+
+    def _respond(self, value):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        future = self.loop.create_future()
+
+        def done():
+            self.active -= 1
+            future.set_result(value)
+        self.loop.call_later(0.001, done)
+        return future
+
+    def isdir(self, genomespace_url):
+        return self._respond(genomespace_url in self.tree)
+
+    def list(self, genomespace_url):
+        return self._respond(_Listing(self.tree[genomespace_url]))
+
+    def request(self, method, genomespace_url, **kwargs):
+        self.deleted.append(genomespace_url)
+        return self._respond(None)
+
+
+@unittest.skipIf(aiohttp is None, "aiohttp is not installed")
+class AsyncGenomeSpaceClientRequestsTestCase(unittest.TestCase):
+
+    ROOT = "https://gs.example.org/datamanager/v1.0/file/Home/user/a"
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+
+    def tearDown(self):
+        self.loop.close()
+
+    def test_delete_bounded(self):
+        files = [_Entry(self.ROOT + "/b/%d.txt" % i, False)
+                 for i in range(20)]
+        server = _Server(self.loop, {
+            self.ROOT: [_Entry(self.ROOT + "/b", True)],
+            self.ROOT + "/b": files})
+        client = AsyncGenomeSpaceClient(token="token")
+        client.isdir = server.isdir
+        client.list = server.list
+        client._api_generic_request = server.request
+
+        self.loop.run_until_complete(
+            client.delete(self.ROOT, recurse=True, parallel=3))
+
+        self.assertTrue(
+            sorted(server.deleted) == sorted(
+                [f.url for f in files] + [self.ROOT + "/b", self.ROOT]),
+            "Expected the folder and its contents to be deleted")
+        self.assertTrue(server.peak == 3,
+                        "Expected no more than 3 requests at a time")
@@ -1,4 +1,6 @@
 import filecmp
+import hashlib
+import io
 import os
 import shutil
 import tempfile
@@ -8,6 +10,11 @@ from test import helpers
 from test.helpers import get_test_username
 
 from genomespaceclient import GSDataFormat, GSFileMetadata
+from genomespaceclient import GenomeSpaceClient
+from genomespaceclient import gs_glob
+from genomespaceclient.storage_handlers import TransferConfig
+
+import requests
 
 try:
     from urllib.parse import urljoin
@@ -95,6 +102,203 @@ class GenomeSpaceClientTestCase(unittest.TestCase):
         self.assertTrue(filecmp.cmp(local_test_file, local_temp_file))
         os.remove(local_temp_file)
 
+    def test_copy_resume(self):
+        client = helpers.get_genomespace_client()
+        local_test_file = self._get_test_file()
+        remote_file, _ = self._get_remote_file()
+        local_temp_file = self._get_temp_file()
+
+        # download the file in a single request
+        config = TransferConfig(
+            multipart_threshold=os.path.getsize(local_test_file) + 1)
+        ranges = []
+        get = client.session.get
+
+        def interrupted_get(url, **kwargs):
+            response = get(url, **kwargs)
+            if kwargs.get('stream'):
+                ranges.append(kwargs.get('headers', {}).get('Range'))
+            if len(ranges) == 1 and kwargs.get('stream'):
+                # interrupt the first download after the first block
+                iter_content = response.iter_content
+
+                def interrupt(chunk_size):
+                    for block in iter_content(1024):
+                        yield block
+                        raise requests.exceptions.ConnectionError(
+                            "Connection reset")
+                response.iter_content = interrupt
+            return response
+
+        client.copy(local_test_file, remote_file)
+        client.session.get = interrupted_get
+        try:
+            client.copy(remote_file, local_temp_file, resume=True,
+                        config=config)
+        finally:
+            del client.session.get
+        client.delete(remote_file)
+
+        self.assertTrue(ranges == ['bytes=0-', 'bytes=1024-'],
+                        "Expected only the missing range to be requested")
+        self.assertTrue(filecmp.cmp(local_test_file, local_temp_file))
+        self.assertFalse(os.path.exists(local_temp_file + ".gs-resume"),
+                         "Expected resume state to be removed on completion")
+        os.remove(local_temp_file)
+
+    def test_copy_multipart(self):
+        client = helpers.get_genomespace_client()
+        local_test_file = self._get_test_file()
+        remote_file, _ = self._get_remote_file()
+        local_temp_file = self._get_temp_file()
+        # force the small test file to be transferred in several parts
+        config = TransferConfig(multipart_threshold=1024, part_size=1024,
+                                max_streams=3)
+
+        client.copy(local_test_file, remote_file, config=config)
+        client.copy(remote_file, local_temp_file, config=config)
+        client.delete(remote_file)
+
+        self.assertTrue(filecmp.cmp(local_test_file, local_temp_file))
+        os.remove(local_temp_file)
+
+    def test_copy_checksums(self):
+        client = helpers.get_genomespace_client()
+        local_test_file = self._get_test_file()
+        remote_file, _ = self._get_remote_file()
+        local_temp_file = self._get_temp_file()
+        config = TransferConfig(checksums=('md5', 'sha256'))
+        with open(local_test_file, 'rb') as f:
+            data = f.read()
+        expected = {'md5': hashlib.md5(data).hexdigest(),
+                    'sha256': hashlib.sha256(data).hexdigest()}
+
+        upload = client.copy(local_test_file, remote_file, config=config)
+        download = client.copy(remote_file, local_temp_file, config=config)
+        client.delete(remote_file)
+
+        self.assertTrue(upload.checksums == {local_test_file: expected},
+                        "Unexpected checksums of uploaded file")
+        self.assertTrue(download.checksums == {remote_file: expected},
+                        "Unexpected checksums of downloaded file")
+        os.remove(local_temp_file)
+
+    def test_copy_progress(self):
+        client = helpers.get_genomespace_client()
+        local_test_file = self._get_test_file()
+        remote_file, _ = self._get_remote_file()
+        local_temp_file = self._get_temp_file()
+        size = os.path.getsize(local_test_file)
+        reports = []
+
+        def progress(name, bytes_done, total, finished):
+            reports.append((name, bytes_done, total, finished))
+
+        client.copy(local_test_file, remote_file, progress=progress)
+        client.copy(remote_file, local_temp_file, progress=progress)
+        client.delete(remote_file)
+        os.remove(local_temp_file)
+
+        finished = [report for report in reports if report[3]]
+        self.assertTrue(
+            finished == [(local_test_file, size, size, True),
+                         (remote_file, size, size, True)],
+            "Expected one final progress report for each file")
+
+    def test_open(self):
+        client = helpers.get_genomespace_client()
+        local_test_file = self._get_test_file()
+        remote_file, _ = self._get_remote_file()
+        with open(local_test_file, 'rb') as f:
+            expected = f.read()
+
+        client.copy(local_test_file, remote_file)
+        # use small blocks so that reads span several range requests
+        with client.open(remote_file, block_size=1024, read_ahead=2048,
+                         cache_size=4096) as f:
+            head = f.read(100)
+            f.seek(-100, os.SEEK_END)
+            tail = f.read()
+            f.seek(1000)
+            middle = f.read(5000)
+            f.seek(0)
+            everything = f.read()
+        client.delete(remote_file)
+
+        self.assertTrue(head == expected[:100], "Unexpected head of file")
+        self.assertTrue(tail == expected[-100:], "Unexpected tail of file")
+        self.assertTrue(middle == expected[1000:6000],
+                        "Unexpected range of file")
+        self.assertTrue(everything == expected, "Unexpected file contents")
+
+    def test_upload_stream(self):
+        client = helpers.get_genomespace_client()
+        local_test_file = self._get_test_file()
+        remote_file, _ = self._get_remote_file()
+        local_temp_file = self._get_temp_file()
+        # force the stream to be uploaded in several parts
+        config = TransferConfig(part_size=1024, max_streams=3,
+                                segment_size=1024)
+
+        with open(local_test_file, 'rb') as f:
+            size = client.upload_stream(f, remote_file, config=config)
+        client.copy(remote_file, local_temp_file)
+        client.delete(remote_file)
+
+        self.assertTrue(size == os.path.getsize(local_test_file),
+                        "Unexpected number of bytes uploaded: %s" % (size,))
+        self.assertTrue(filecmp.cmp(local_test_file, local_temp_file))
+        os.remove(local_temp_file)
+
+    def test_download_stream(self):
+        client = helpers.get_genomespace_client()
+        local_test_file = self._get_test_file()
+        remote_file, _ = self._get_remote_file()
+        with open(local_test_file, 'rb') as f:
+            expected = f.read()
+
+        client.copy(local_test_file, remote_file)
+        output = io.BytesIO()
+        size = client.download_stream(remote_file, output)
+        chunks = list(client.download_stream(remote_file, chunk_size=1024))
+        client.delete(remote_file)
+
+        self.assertTrue(size == len(expected),
+                        "Unexpected number of bytes written: %s" % (size,))
+        self.assertTrue(output.getvalue() == expected,
+                        "Unexpected file contents written")
+        self.assertTrue(b"".join(chunks) == expected and len(chunks) > 1,
+                        "Expected file contents in chunks of 1024 bytes")
+
+    def test_sync(self):
+        client = helpers.get_genomespace_client()
+        local_test_folder = self._get_test_folder()
+        remote_folder, _ = self._get_remote_folder()
+        local_temp_folder = self._get_temp_folder()
+
+        upload = client.sync(local_test_folder, remote_folder, parallel=4)
+        resync = client.sync(local_test_folder, remote_folder, parallel=4)
+        client.sync(remote_folder, local_temp_folder, parallel=4)
+        os.remove(os.path.join(local_temp_folder, "logo.png"))
+        download = client.sync(remote_folder, local_temp_folder, parallel=4)
+        client.delete(remote_folder + "logo.png")
+        mirror = client.sync(remote_folder, local_temp_folder, delete=True)
+        client.delete(remote_folder, recurse=True)
+
+        self.assertTrue(len(upload.transferred) == 5, "Should have uploaded"
+                        " 5 files but uploaded: %s" % (upload.results,))
+        self.assertTrue(len(resync.transferred) == 0 and
+                        len(resync.skipped) == 5, "Should have skipped 5"
+                        " unchanged files but got: %s" % (resync,))
+        self.assertTrue(len(download.transferred) == 1, "Should have"
+                        " downloaded only the missing file but got: %s" %
+                        (download,))
+        self.assertTrue(len(mirror.deleted) == 1, "Should have deleted 1"
+                        " local file but got: %s" % (mirror,))
+        self.assertFalse(os.path.exists(
+            os.path.join(local_temp_folder, "logo.png")))
+        shutil.rmtree(local_temp_folder)
+
     def test_copy_wildcard(self):
         client = helpers.get_genomespace_client()
         local_test_folder = self._get_test_folder()
@@ -115,6 +319,22 @@ class GenomeSpaceClientTestCase(unittest.TestCase):
                         " in local temp folder")
         shutil.rmtree(local_temp_folder)
 
+    def test_recursive_wildcard(self):
+        client = helpers.get_genomespace_client()
+        local_test_folder = self._get_test_folder()
+        remote_folder, _ = self._get_remote_folder()
+
+        client.mkdir(remote_folder)
+        client.copy(local_test_folder, remote_folder, recurse=True)
+        matches = list(gs_glob.gs_iglob(client, remote_folder + "**/*.txt"))
+        client.delete(remote_folder, recurse=True)
+
+        names = sorted(os.path.basename(match) for match in matches)
+        self.assertTrue(names == ["test_file1.txt", "test_file2.txt",
+                                  "test_file3.txt"],
+                        "Should have matched 3 text files at any depth but"
+                        " matched: %s" % (matches,))
+
     def test_copy_folder(self):
         client = helpers.get_genomespace_client()
         local_test_folder = self._get_test_folder()
@@ -143,6 +363,32 @@ class GenomeSpaceClientTestCase(unittest.TestCase):
                         " have no extra files in copied subfolder")
         shutil.rmtree(local_temp_folder)
 
+    def test_copy_folder_parallel(self):
+        client = helpers.get_genomespace_client()
+        local_test_folder = self._get_test_folder()
+        remote_folder, _ = self._get_remote_folder()
+        local_temp_folder = self._get_temp_folder()
+
+        client.mkdir(remote_folder)
+        summary = client.copy(local_test_folder, remote_folder, recurse=True,
+                              parallel=4)
+        client.copy(remote_folder, local_temp_folder, recurse=True,
+                    parallel=4)
+        client.delete(remote_folder, recurse=True)
+
+        self.assertTrue(len(summary.transferred) == 5, "Should have uploaded"
+                        " 5 files but uploaded: %s" % (summary.results,))
+        self.assertTrue(len(summary.failed) == 0, "Should have no failed"
+                        " uploads")
+        self.assertTrue(summary.bytes_transferred > 0, "Should have recorded"
+                        " the number of bytes uploaded")
+        dcmp = filecmp.dircmp(local_test_folder, local_temp_folder)
+        self.assertTrue(len(dcmp.same_files) == 3, "Should have copied 3"
+                        " identical files")
+        self.assertTrue(len(dcmp.subdirs['folder1'].same_files) == 2,
+                        "Should have copied 2 identical files in subfolder")
+        shutil.rmtree(local_temp_folder)
+
     def test_move(self):
         client = helpers.get_genomespace_client()
         local_test_file = self._get_test_file()
@@ -214,6 +460,25 @@ class GenomeSpaceClientTestCase(unittest.TestCase):
         self.assertTrue(len(found_folder) == 0,
                         "Folder was found but should have been deleted")
 
+    def test_delete_folder_parallel(self):
+        client = helpers.get_genomespace_client()
+        local_test_folder = self._get_test_folder()
+        remote_folder, remote_name = self._get_remote_folder()
+
+        client.mkdir(remote_folder)
+        client.copy(local_test_folder, remote_folder, recurse=True)
+        summary = client.delete(remote_folder, recurse=True, parallel=4)
+
+        filelist = client.list(helpers.get_remote_test_folder())
+        found_folder = [f for f in filelist.contents
+                        if self._adjust_gs_swift_bug(f.name) == remote_name]
+        self.assertTrue(len(found_folder) == 0,
+                        "Folder was found but should have been deleted")
+        self.assertTrue(len(summary.deleted_files) >= 5, "Should have"
+                        " deleted at least 5 files but got: %s" % (summary,))
+        self.assertTrue(len(summary.failed) == 0, "Should have no failed"
+                        " deletes")
+
     def test_delete_wildcard(self):
         client = helpers.get_genomespace_client()
         local_test_folder = self._get_test_folder()
@@ -277,6 +542,44 @@ class GenomeSpaceClientTestCase(unittest.TestCase):
             access_control_entries[0].sid.name == owner,
             "Expected sid name to be the owner")
 
+    def test_metadata_cache(self):
+        client = GenomeSpaceClient(username=helpers.get_test_username(),
+                                   password=helpers.get_test_password(),
+                                   metadata_cache_ttl=60)
+        local_test_file = self._get_test_file()
+        remote_file_path, _ = self._get_remote_file()
+        client.copy(local_test_file, remote_file_path)
+
+        # listing the folder should seed the cache with the file's metadata
+        client.list(helpers.get_remote_test_folder())
+        self.assertFalse(client.isdir(remote_file_path))
+        self.assertTrue(client.metadata_cache.hits == 1,
+                        "Expected metadata to be served from the cache")
+
+        client.delete(remote_file_path)
+        self.assertFalse(client.isdir(remote_file_path))
+        self.assertTrue(client.metadata_cache.hits == 1,
+                        "Expected delete to invalidate cached metadata")
+
+    def test_external_session(self):
+        session = requests.Session()
+        client = GenomeSpaceClient(username=helpers.get_test_username(),
+                                   password=helpers.get_test_password(),
+                                   session=session)
+        with client:
+            filelist = client.list(helpers.get_remote_test_folder())
+        self.assertIsInstance(filelist.contents, list)
+        self.assertTrue(client.session is session,
+                        "Expected client to use the supplied session")
+        self.assertTrue(session.cookies.get("gs-token"),
+                        "Expected login to store gs-token in the session")
+
+        with client._auth_lock:
+            client._set_token(helpers.get_remote_test_folder(), "renewed",
+                              None)
+        self.assertTrue(session.cookies.get("gs-token") == "renewed",
+                        "Expected renewal to update gs-token in the session")
+
     def test_get_token_expiry(self):
         client = helpers.get_genomespace_client()
         genomespace_url = helpers.get_genomespace_url()
@@ -0,0 +1,376 @@
+import gc
+import os
+import shutil
+import tempfile
+import time
+import unittest
+import weakref
+
+from genomespaceclient import GenomeSpaceClient
+from genomespaceclient.exceptions import GSChecksumException
+from genomespaceclient.token_cache import TokenCache
+
+import requests
+
+
+SERVER = "https://gs.example.org"
+API = SERVER + "/datamanager/v1.0/"
+ROOT = API + "file/Home/user"
+# An unversioned API base URL, which redirects to the one above
+OLD_ROOT = SERVER + "/datamanager/file/Home/user"
+STORAGE = "https://storage.example.org/"
+
+
+class _ApiResponse(object):
+
+    def __init__(self, status_code, json_data=None, headers=None,
+                 cookies=None, text=""):
+        self.status_code = status_code
+        self._json = json_data
+        self.headers = {'content-type': 'application/json'}
+        self.headers.update(headers or {})
+        self.cookies = cookies or {}
+        self.text = text
+
+    def json(self):
+        return self._json
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(
+                "%s error" % self.status_code, response=self)
+
+
+class _ApiSession(object):
+    """
+    Stands in for a requests session talking to a GenomeSpace server which
+    holds the given folders and files, given as paths relative to the
+    GenomeSpace API, such as ``file/Home/user/a``. Records the method and
+    URL of each request made.
+
+    If a password is given, logging in with it issues a new token, and
+    API requests are only accepted with a token in ``tokens``.
+    """
+
+    def __init__(self, folders=(), files=(), password=None):
+        self.folders = set(folders)
+        self.files = set(files)
+        self.password = password
+        self.tokens = set()
+        self.requests = []
+        self.cookies = []
+
+    def _identity_request(self, url, auth=None, cookies=None):
+        if url.endswith("/basic"):
+            if auth is None or auth.password != self.password:
+                return _ApiResponse(401)
+            token = "token%d" % len(self.tokens)
+            self.tokens.add(token)
+            return _ApiResponse(200, cookies={'gs-token': token})
+        if (cookies or {}).get('gs-token') in self.tokens:
+            return _ApiResponse(200, text="3600000")
+        return _ApiResponse(401)
+
+    def _metadata(self, path):
+        return {'name': path.rsplit("/", 1)[-1], 'path': "/" + path,
+                'url': API + path, 'parentUrl': API + path.rsplit("/", 1)[0],
+                'isDirectory': path in self.folders, 'size': 0}
+
+    def request(self, method, url, **kwargs):
+        self.requests.append((method, url))
+        if url.startswith(SERVER + "/identityServer/"):
+            return self._identity_request(url, kwargs.get('auth'),
+                                          kwargs.get('cookies'))
+        if self.password is not None and kwargs.get(
+                'cookies', {}).get('gs-token') not in self.tokens:
+            return _ApiResponse(401)
+        if url.startswith(SERVER + "/datamanager/file/"):
+            return _ApiResponse(302, headers={
+                'Location': API + url[len(SERVER + "/datamanager/"):]})
+        path = url[len(API):].rstrip("/")
+        kind, _, path = path.partition("/")
+        path = "file/" + path
+        exists = path in self.folders or path in self.files
+        if method == 'GET' and kind == 'filemetadata':
+            if not exists:
+                return _ApiResponse(404)
+            return _ApiResponse(200, self._metadata(path))
+        elif method == 'GET' and kind == 'uploadinfo':
+            return _ApiResponse(200, {
+                'uploadType': 'Swift', 'path': "container/" + path[5:],
+                'token': 'swift-token',
+                'swiftFileUrl': "https://swift.example.org/v1/a"})
+        elif method == 'GET' and kind == 'file' and path in self.files:
+            # A presigned storage location, valid for an hour
+            return _ApiResponse(302, headers={
+                'Location': STORAGE + path + "?Expires=%d" % (
+                    time.time() + 3600)})
+        elif method == 'GET' and kind == 'file':
+            if path not in self.folders:
+                return _ApiResponse(404)
+            return _ApiResponse(200, {
+                'contents': [self._metadata(child) for child in
+                             sorted(self.folders | self.files)
+                             if child.rsplit("/", 1)[0] == path],
+                'directory': self._metadata(path)})
+        elif method == 'PUT' and kind == 'file':
+            self.folders.add(path)
+            return _ApiResponse(200, self._metadata(path))
+        elif method == 'DELETE' and kind == 'file':
+            if not exists:
+                return _ApiResponse(404)
+            self.folders.discard(path)
+            self.files.discard(path)
+            return _ApiResponse(200)
+        return _ApiResponse(404)
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def put(self, url, **kwargs):
+        return self.request('PUT', url, **kwargs)
+
+    def delete(self, url, **kwargs):
+        return self.request('DELETE', url, **kwargs)
+
+
+class _Handler(object):
+    """
+    Stands in for a storage handler, recording the location of each file
+    uploaded or downloaded, and raising the given errors on the first
+    uploads.
+    """
+
+    def __init__(self, errors=()):
+        self.errors = list(errors)
+        self.uploads = []
+        self.downloads = []
+
+    def upload(self, source, upload_info, refresh_upload_info=None,
+               resume=False, checksums=None, progress=None):
+        self.uploads.append(upload_info['path'])
+        if self.errors:
+            raise self.errors.pop(0)
+        return os.path.getsize(source)
+
+    def download(self, download_info, destination, resume=False,
+                 checksums=None, progress=None):
+        self.downloads.append(download_info['Location'].split("?")[0])
+        with open(destination, 'wb') as f:
+            f.write(b"data")
+        return 4
+
+
+class GenomeSpaceClientRequestsTestCase(unittest.TestCase):
+
+    def _get_client(self, session, **kwargs):
+        return GenomeSpaceClient(token="token", session=session, **kwargs)
+
+    def test_delete_uses_cached_metadata(self):
+        session = _ApiSession(folders=["file/Home/user"],
+                              files=["file/Home/user/f.txt"])
+        client = self._get_client(session, metadata_cache_ttl=60)
+
+        client.list(ROOT)
+        self.assertFalse(client.isdir(ROOT + "/f.txt"))
+        del session.requests[:]
+        client.delete(ROOT + "/f.txt")
+
+        self.assertTrue(session.requests == [('DELETE', ROOT + "/f.txt")],
+                        "Expected the cached metadata to tell that the"
+                        " target is a file")
+        self.assertFalse(client.isdir(ROOT + "/f.txt"))
+        self.assertTrue(client.metadata_cache.hits == 1,
+                        "Expected delete to invalidate cached metadata"
+                        " without counting a hit")
+
+    def test_dropped_client_collected(self):
+        client = self._get_client(_ApiSession())
+        with client._auth_lock:
+            client._set_token(SERVER, "token", time.time() + 3600)
+        timer = client._token_refresh_timer
+        client_ref = weakref.ref(client)
+
+        del client
+        gc.collect()
+
+        self.assertTrue(client_ref() is None,
+                        "Expected the renewal timer not to keep the client"
+                        " alive")
+        timer.join(5)
+        self.assertFalse(timer.is_alive(),
+                         "Expected the renewal timer of a collected client"
+                         " to be cancelled")
+
+    def _get_source(self):
+        handle, source = tempfile.mkstemp()
+        self.addCleanup(os.remove, source)
+        with os.fdopen(handle, 'wb') as f:
+            f.write(b"data")
+        return source
+
+    def _upload_info_count(self, session):
+        return len([url for _, url in session.requests
+                    if "/uploadinfo/" in url])
+
+    def test_upload_info_reused(self):
+        session = _ApiSession(folders=["file/Home/user"])
+        client = self._get_client(session)
+        handler = _Handler()
+        client._get_handler = lambda storage_type, config=None: handler
+        source = self._get_source()
+
+        client.copy(source, ROOT + "/f1.txt")
+        client.copy(source, ROOT + "/f2.txt")
+
+        self.assertTrue(self._upload_info_count(session) == 1,
+                        "Expected upload credentials to be reused for files"
+                        " in the same folder")
+        self.assertTrue(handler.uploads == ["container/Home/user/f1.txt",
+                                            "container/Home/user/f2.txt"],
+                        "Expected the location of each file to be derived"
+                        " from the cached upload info")
+
+    def test_upload_info_refetched_after_transport_error(self):
+        session = _ApiSession(folders=["file/Home/user"])
+        client = self._get_client(session)
+        handler = _Handler()
+        client._get_handler = lambda storage_type, config=None: handler
+        source = self._get_source()
+        client.copy(source, ROOT + "/f1.txt")
+
+        handler.errors = [requests.exceptions.ConnectionError("reset")]
+        client.copy(source, ROOT + "/f2.txt")
+        self.assertTrue(self._upload_info_count(session) == 2,
+                        "Expected fresh upload credentials after a transport"
+                        " error with cached ones")
+
+        handler.errors = [GSChecksumException("ETag mismatch")]
+        with self.assertRaises(GSChecksumException):
+            client.copy(source, ROOT + "/f3.txt")
+        self.assertTrue(self._upload_info_count(session) == 2,
+                        "Expected other errors not to be retried with fresh"
+                        " credentials")
+
+    def _file_requests(self, session):
+        return [url for method, url in session.requests
+                if method == 'GET' and "/filemetadata/" not in url]
+
+    def test_presigned_location_reused(self):
+        session = _ApiSession(folders=["file/Home/user"],
+                              files=["file/Home/user/f.txt"])
+        client = self._get_client(session)
+        handler = _Handler()
+        client._get_handler = lambda storage_type, config=None: handler
+        destination = self._get_source()
+
+        client.copy(ROOT + "/f.txt", destination)
+        client.copy(ROOT + "/f.txt", destination)
+
+        self.assertTrue(self._file_requests(session) == [ROOT + "/f.txt"],
+                        "Expected the presigned storage location to be"
+                        " reused until it expires")
+        self.assertTrue(handler.downloads == [STORAGE + "file/Home/user/"
+                                              "f.txt"] * 2,
+                        "Expected both downloads to use the storage"
+                        " location")
+
+    def test_canonical_base_url_learnt(self):
+        session = _ApiSession(folders=["file/Home/user"],
+                              files=["file/Home/user/f.txt",
+                                     "file/Home/user/g.txt"])
+        client = self._get_client(session)
+        handler = _Handler()
+        client._get_handler = lambda storage_type, config=None: handler
+        destination = self._get_source()
+
+        client.copy(OLD_ROOT + "/f.txt", destination)
+        client.copy(OLD_ROOT + "/g.txt", destination)
+
+        self.assertTrue(
+            self._file_requests(session) == [
+                OLD_ROOT + "/f.txt", ROOT + "/f.txt", ROOT + "/g.txt"],
+            "Expected later requests to go straight to the API base URL"
+            " the old one redirects to")
+
+    def test_mkdir_checks_few_ancestors(self):
+        session = _ApiSession(folders=["file/Home/user", "file/Home/user/a",
+                                       "file/Home/user/a/b",
+                                       "file/Home/user/a/b/c"])
+        client = self._get_client(session)
+
+        client.mkdir(ROOT + "/a/b/c/d/e")
+
+        puts = [url for method, url in session.requests if method == 'PUT']
+        checks = [url for method, url in session.requests if method == 'GET']
+        self.assertTrue(puts == [ROOT + "/a/b/c/d", ROOT + "/a/b/c/d/e"],
+                        "Expected only missing folders to be created")
+        self.assertTrue(len(checks) <= 3,
+                        "Expected existing ancestors to be found by"
+                        " bisecting the path")
+
+        del session.requests[:]
+        client.mkdir(ROOT + "/a/b/c/d/f")
+        self.assertTrue(session.requests == [('PUT', ROOT + "/a/b/c/d/f")],
+                        "Expected folders known to exist not to be checked"
+                        " again")
+
+    def _login_count(self, session):
+        return len([url for _, url in session.requests
+                    if url.endswith("/identityServer/basic")])
+
+    def test_token_cache_checks_password(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        token_cache = TokenCache(os.path.join(directory, "tokens.json"))
+        session = _ApiSession(folders=["file/Home/user"], password="secret")
+
+        GenomeSpaceClient(username="user", password="secret",
+                          session=session, token_cache=token_cache).list(ROOT)
+        with self.assertRaises(requests.exceptions.HTTPError):
+            GenomeSpaceClient(username="user", password="wrong",
+                              session=session,
+                              token_cache=token_cache).list(ROOT)
+        GenomeSpaceClient(username="user", password="secret",
+                          session=session, token_cache=token_cache).list(ROOT)
+
+        self.assertTrue(self._login_count(session) == 2,
+                        "Expected a cached token to be used only with the"
+                        " password it was obtained with")
+
+    def test_revoked_token_removed_from_cache(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        token_cache = TokenCache(os.path.join(directory, "tokens.json"))
+        session = _ApiSession(folders=["file/Home/user"], password="secret")
+        GenomeSpaceClient(username="user", password="secret",
+                          session=session, token_cache=token_cache).list(ROOT)
+
+        # The token is revoked, and the password changed
+        session.tokens.clear()
+        session.password = "changed"
+        with self.assertRaises(requests.exceptions.HTTPError):
+            GenomeSpaceClient(username="user", password="secret",
+                              session=session,
+                              token_cache=token_cache).list(ROOT)
+
+        self.assertTrue(token_cache.get(SERVER, "user") is None,
+                        "Expected a revoked token to be removed from the"
+                        " token cache")
+
+    def test_handlers_kept_per_client(self):
+        client = self._get_client(_ApiSession())
+        other = self._get_client(_ApiSession())
+
+        handler = client._get_handler("Swift")
+
+        self.assertTrue(client._get_handler("swift") is handler,
+                        "Expected a client to reuse its storage handlers")
+        self.assertTrue(handler.session is client.session and
+                        other._get_handler("Swift") is not handler,
+                        "Expected storage handlers not to be shared between"
+                        " clients")
+        client.close()
+        self.assertTrue(client._get_handler("Swift") is not handler,
+                        "Expected closing a client to drop its storage"
+                        " handlers")
@@ -0,0 +1,153 @@
+import unittest
+
+from genomespaceclient import gs_glob
+
+try:
+    import asyncio
+    from genomespaceclient import aio
+except (ImportError, SyntaxError):
+    # asyncio is only available on Python 3
+    aio = None
+
+
+ROOT = "https://gs.example.org/datamanager/v1.0/file/Home/user"
+
+
+class _Entry(object):
+
+    def __init__(self, name, is_directory):
+        self.name = name
+        self.is_directory = is_directory
+
+
+class _Listing(object):
+
+    def __init__(self, contents):
+        self.contents = contents
+
+
+class _Client(object):
+    """
+    Serves folder listings from a dict of folder url to entries.
+    """
+
+    def __init__(self, tree):
+        self.tree = tree
+
+    def isdir(self, genomespace_url):
+        return genomespace_url.rstrip("/") in self.tree
+
+    def list(self, genomespace_url):
+        return _Listing(self.tree[genomespace_url.rstrip("/")])
+
+
+class GenomeSpaceGlobTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.client = _Client({
+            ROOT + "/a": [_Entry("b", True), _Entry("c", True),
+                          _Entry("x.txt", False)],
+            ROOT + "/a/b": [_Entry("f.txt", False)],
+            ROOT + "/a/c": [_Entry("d", True)],
+            ROOT + "/a/c/d": [_Entry("f.txt", False)]})
+
+    def _glob(self, pattern):
+        return sorted(match[len(ROOT):] for match in gs_glob.gs_iglob(
+            self.client, ROOT + pattern))
+
+    def test_recursive_literal(self):
+        self.assertTrue(
+            self._glob("/a/**/f.txt") == ["/a/b/f.txt", "/a/c/d/f.txt"],
+            "Expected only existing files to match after **")
+        self.assertTrue(
+            self._glob("/a/**/d/f.txt") == ["/a/c/d/f.txt"],
+            "Expected only existing folders to match after **")
+
+
+class _AsyncClient(object):
+    """
+    Serves the listings of a :class:`_Client` as awaitables, holding back
+    the listings of the folders in ``held`` until they are released.
+    """
+
+    def __init__(self, loop, tree, held=()):
+        self.loop = loop
+        self.client = _Client(tree)
+        self.held = dict((url, loop.create_future()) for url in held)
+
+    def _result(self, value):
+        future = self.loop.create_future()
+        future.set_result(value)
+        return future
+
+    def isdir(self, genomespace_url):
+        return self._result(self.client.isdir(genomespace_url))
+
+    def list(self, genomespace_url):
+        url = genomespace_url.rstrip("/")
+        if url in self.held:
+            return self.held[url]
+        return self._result(self.client.list(url))
+
+    def release(self, url):
+        self.held[url].set_result(self.client.list(url))
+
+
+@unittest.skipIf(aio is None, "asyncio is not available")
+class AsyncGenomeSpaceGlobTestCase(unittest.TestCase):
+
+    TREE = {
+        ROOT: [_Entry("a", True), _Entry("b", True)],
+        ROOT + "/a": [_Entry("f.txt", False)],
+        ROOT + "/b": [_Entry("g.txt", False)]}
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+
+    def tearDown(self):
+        self.loop.close()
+
+    def _next(self, iterator):
+        return self.loop.run_until_complete(
+            asyncio.wait_for(iterator.__anext__(), 5))
+
+    def test_matches_streamed(self):
+        client = _AsyncClient(self.loop, self.TREE, held=[ROOT + "/b"])
+        iterator = aio.gs_iglob(client, ROOT + "/*/*.txt")
+
+        first = self._next(iterator)
+        client.release(ROOT + "/b")
+        second = self._next(iterator)
+
+        self.assertTrue(first == ROOT + "/a/f.txt",
+                        "Expected a match to be yielded before the listings"
+                        " of other folders arrive")
+        self.assertTrue(second == ROOT + "/b/g.txt",
+                        "Expected the held folder to be matched once"
+                        " listed")
+        with self.assertRaises(StopAsyncIteration):
+            self._next(iterator)
+
+    def test_recursive(self):
+        tree = {
+            ROOT + "/a": [_Entry("b", True), _Entry("x.txt", False)],
+            ROOT + "/a/b": [_Entry("c", True), _Entry("f.txt", False)],
+            ROOT + "/a/b/c": [_Entry("f.txt", False)]}
+        client = _AsyncClient(self.loop, tree)
+
+        def glob(pattern):
+            iterator = aio.gs_iglob(client, ROOT + pattern)
+            matches = []
+            try:
+                while True:
+                    matches.append(self._next(iterator)[len(ROOT):])
+            except StopAsyncIteration:
+                return sorted(matches)
+
+        self.assertTrue(
+            glob("/a/**/f.txt") == ["/a/b/c/f.txt", "/a/b/f.txt"],
+            "Expected ** to match any number of nested folders")
+        self.assertTrue(
+            glob("/a/**") == ["/a/b", "/a/b/c", "/a/b/c/f.txt", "/a/b/f.txt",
+                              "/a/x.txt"],
+            "Expected a trailing ** to match everything beneath a folder")
@@ -0,0 +1,159 @@
+import gc
+import os
+import sys
+import time
+import unittest
+
+from genomespaceclient import GSDataFormat, GSFileMetadata
+from genomespaceclient.client import GSDirectoryListing
+from genomespaceclient.client import GSEffectiveAcl
+
+try:
+    import tracemalloc
+except ImportError:
+    # Only available from Python 3.4
+    tracemalloc = None
+
+
+# The listing benchmark takes several seconds and a few hundred MB, so it
+# only runs when this environment variable is set
+BENCHMARK_ENV = "GENOMESPACE_BENCHMARK"
+BENCHMARK_ENTRIES = 100000
+
+
+def _data_format_json(extension):
+    return {
+        "name": extension,
+        "url": "http://www.genomespace.org/datamanager/dataformat/" +
+               extension,
+        "fileExtension": extension,
+        "description": ""
+    }
+
+
+def _file_json(index):
+    url = "https://gs.example.org/datamanager/v1.0/file/Home/user"
+    return {
+        "name": "file%d.txt" % index,
+        "path": "/Home/user/file%d.txt" % index,
+        "url": "%s/file%d.txt" % (url, index),
+        "parentUrl": url,
+        "size": index,
+        "owner": {"name": "user"},
+        "isDirectory": False,
+        "isLink": False,
+        "lastModified": "2017-05-09T18:56:54.000+0000",
+        "dataFormat": _data_format_json("txt"),
+        "availableDataFormats": [_data_format_json(extension)
+                                 for extension in ("txt", "vcf", "bam")],
+        "effectiveAcl": {
+            "accessControlEntries": [
+                {"permission": permission, "id": str(index),
+                 "sid": {"name": "user", "type": "User", "id": "1"}}
+                for permission in ("W", "R")],
+            "object": {"objectId": str(index), "objectType": "DataManager"},
+            "id": str(index)
+        }
+    }
+
+
+class GenomeSpaceModelsTestCase(unittest.TestCase):
+
+    def test_data_formats_shared(self):
+        first = GSFileMetadata.from_json(_file_json(1))
+        second = GSFileMetadata.from_json(_file_json(2))
+        self.assertTrue(
+            first.data_format is second.data_format,
+            "Expected identical data formats to be shared")
+        self.assertTrue(
+            first.available_data_formats[0] is first.data_format,
+            "Expected identical data formats to be shared")
+        self.assertTrue(
+            isinstance(first.data_format, GSDataFormat) and
+            first.data_format.file_extension == "txt",
+            "Expected data format to be parsed")
+
+    def test_shared_data_formats_bounded(self):
+        for index in range(GSDataFormat.SHARED_FORMATS + 10):
+            GSDataFormat.from_json({'name': "format%d" % index})
+        self.assertTrue(
+            len(GSDataFormat._shared) <= GSDataFormat.SHARED_FORMATS,
+            "Expected the number of shared data formats to be bounded")
+
+    def test_effective_acl_parsed_lazily(self):
+        metadata = GSFileMetadata.from_json(_file_json(1))
+        acl = metadata.effective_acl
+        self.assertTrue(
+            isinstance(acl, GSEffectiveAcl) and
+            acl.object.object_id == "1" and
+            acl.access_control_entries[1].sid.type == "User",
+            "Expected effective ACL to be parsed on first access")
+        self.assertTrue(metadata.effective_acl is acl,
+                        "Expected effective ACL to be parsed only once")
+
+        metadata.effective_acl = None
+        self.assertTrue(metadata.effective_acl is None,
+                        "Expected effective ACL to be replaced")
+
+    def test_listing_parsed(self):
+        listing = GSDirectoryListing.from_json({
+            "contents": [_file_json(index) for index in range(3)],
+            "directory": _file_json(-1)})
+        self.assertTrue(
+            [entry.name for entry in listing.contents] ==
+            ["file0.txt", "file1.txt", "file2.txt"] and
+            listing.directory.size == -1,
+            "Expected all entries to be parsed")
+        self.assertTrue(
+            all(entry._effective_acl_json is not None
+                for entry in listing.contents),
+            "Expected effective ACLs to be left unparsed")
+        listing.contents[0].effective_acl
+        self.assertTrue(listing.contents[0]._effective_acl_json is None,
+                        "Expected unparsed ACL to be released once parsed")
+
+    def test_models_have_slots(self):
+        metadata = GSFileMetadata.from_json(_file_json(1))
+        for model in (metadata, metadata.data_format,
+                      metadata.effective_acl,
+                      metadata.effective_acl.object,
+                      metadata.effective_acl.access_control_entries[0],
+                      metadata.effective_acl.access_control_entries[0].sid):
+            self.assertFalse(hasattr(model, '__dict__'),
+                             "Expected %s to use __slots__" %
+                             type(model).__name__)
+        with self.assertRaises(AttributeError):
+            metadata.unknown_attribute = True
+
+    @unittest.skipUnless(os.environ.get(BENCHMARK_ENV),
+                         "Set %s to run the listing benchmark" %
+                         BENCHMARK_ENV)
+    def test_listing_benchmark(self):
+        # Memory is traced from before the JSON is built, so that unparsed
+        # JSON which is still referenced by the listing is accounted for
+        gc.collect()
+        if tracemalloc:
+            tracemalloc.start()
+        json_data = {
+            "contents": [_file_json(index)
+                         for index in range(BENCHMARK_ENTRIES)],
+            "directory": _file_json(-1)
+        }
+        start = time.time()
+        listing = GSDirectoryListing.from_json(json_data)
+        parse_time = time.time() - start
+        del json_data
+        gc.collect()
+        memory = tracemalloc.get_traced_memory()[0] if tracemalloc else 0
+        for entry in listing.contents:
+            entry.effective_acl
+        acl_time = time.time() - start - parse_time
+        if tracemalloc:
+            tracemalloc.stop()
+
+        sys.stderr.write(
+            "\n%d entries: parsed in %.2fs (+%.2fs for ACLs), %.1f MB "
+            "retained\n" % (BENCHMARK_ENTRIES, parse_time, acl_time,
+                            memory / 1024.0 / 1024.0))
+        self.assertTrue(len(listing.contents) == BENCHMARK_ENTRIES,
+                        "Expected all entries to be parsed")
@@ -118,6 +118,45 @@ class GenomeSpaceShellTestCase(unittest.TestCase):
                         " have no extra files in copied subfolder")
         shutil.rmtree(local_temp_folder)
 
+    def test_copy_folder_parallel(self):
+        local_test_folder = self._get_test_folder()
+        local_temp_folder = self._get_temp_folder()
+        remote_folder, _ = self._get_remote_folder()
+
+        self._call_shell_command("mkdir", remote_folder)
+        self._call_shell_command("cp", "-R", local_test_folder,
+                                 remote_folder)
+        self._call_shell_command("cp", "-R", "--parallel", "4",
+                                 remote_folder, local_temp_folder)
+        self._call_shell_command("rm", "-R", remote_folder)
+
+        dcmp = filecmp.dircmp(local_test_folder, local_temp_folder)
+        self.assertTrue(len(dcmp.same_files) == 3, "Should have copied 3"
+                        " identical files")
+        self.assertTrue(len(dcmp.subdirs['folder1'].same_files) == 2,
+                        "Should have copied 2 identical files in subfolder")
+        shutil.rmtree(local_temp_folder)
+
+    def test_sync(self):
+        local_test_folder = self._get_test_folder()
+        local_temp_folder = self._get_temp_folder()
+        remote_folder, _ = self._get_remote_folder()
+
+        self._call_shell_command("sync", local_test_folder, remote_folder)
+        self._call_shell_command("sync", remote_folder, local_temp_folder)
+        output = self._call_shell_command("sync", remote_folder,
+                                          local_temp_folder)
+        self._call_shell_command("rm", "-R", remote_folder)
+
+        self.assertTrue("5 skipped" in output, "Expected unchanged files to"
+                        " be skipped. Received: %s" % (output,))
+        dcmp = filecmp.dircmp(local_test_folder, local_temp_folder)
+        self.assertTrue(len(dcmp.same_files) == 3, "Should have copied 3"
+                        " identical files")
+        self.assertTrue(len(dcmp.subdirs['folder1'].same_files) == 2,
+                        "Should have copied 2 identical files in subfolder")
+        shutil.rmtree(local_temp_folder)
+
     def test_copy_wildcard(self):
         local_test_folder = self._get_test_folder()
         remote_folder, _ = self._get_remote_folder()
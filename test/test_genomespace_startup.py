@@ -0,0 +1,45 @@
+import subprocess
+import sys
+import unittest
+
+
+def _import_times(statement):
+    """
+    Runs a statement in a new interpreter with -X importtime, and returns a
+    dict of the cumulative import time in microseconds of each module.
+    """
+    output = subprocess.check_output(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        stderr=subprocess.STDOUT, universal_newlines=True)
+    times = {}
+    for line in output.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            _, cumulative, module = line.split("|")
+            if cumulative.strip().isdigit():
+                times[module.strip()] = int(cumulative)
+    return times
+
+
+@unittest.skipIf(sys.version_info < (3, 7),
+                 "-X importtime requires Python 3.7 or later")
+class GenomeSpaceStartupTestCase(unittest.TestCase):
+
+    def test_shell_startup(self):
+        times = _import_times("import genomespaceclient")
+        sys.stderr.write("\nimport genomespaceclient: %.1f ms\n" %
+                         (times["genomespaceclient"] / 1000.0,))
+        for module in ("cloudbridge", "requests"):
+            self.assertTrue(
+                module not in times,
+                "Expected %s not to be imported before a subcommand runs"
+                % (module,))
+
+    def test_client_startup(self):
+        times = _import_times(
+            "from genomespaceclient import GenomeSpaceClient")
+        self.assertTrue(
+            "genomespaceclient.client" in times,
+            "Expected the client to be imported on first use")
+        self.assertTrue(
+            "cloudbridge" not in times,
+            "Expected cloudbridge not to be imported before an upload")
@@ -0,0 +1,469 @@
+import datetime
+import hashlib
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+import boto3
+
+from botocore.stub import ANY, Stubber
+
+from genomespaceclient import storage_handlers
+from genomespaceclient.exceptions import GSChecksumException
+from genomespaceclient.storage_handlers import TransferConfig
+
+import requests
+
+try:
+    from urllib.parse import quote
+except ImportError:
+    from urllib import quote
+
+
+class _Provider(object):
+    """
+    Stands in for a cloudbridge provider, exposing a stubbed S3 client.
+    """
+
+    class _Meta(object):
+        pass
+
+    def __init__(self, client):
+        self.s3_conn = _Provider._Meta()
+        self.s3_conn.meta = _Provider._Meta()
+        self.s3_conn.meta.client = client
+
+
+class _S3Client(object):
+    """
+    Stands in for an S3 client, reading the body of put_object twice, as
+    botocore does when it computes a checksum of the body before sending
+    it, and returning the given ETag, or the MD5 checksum of the body.
+    """
+
+    def __init__(self, etag=None):
+        self.etag = etag
+        self.objects = {}
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        if hasattr(Body, 'read'):
+            Body.read(1000)
+            Body.seek(0)
+            body = Body.read()
+        else:
+            body = Body
+        self.objects[(Bucket, Key)] = body
+        return {'ETag': '"%s"' % (self.etag or hashlib.md5(body).hexdigest())}
+
+
+class S3StorageHandlerTestCase(unittest.TestCase):
+
+    PART_SIZE = 5 * 1024 * 1024
+
+    def setUp(self):
+        self.s3 = boto3.client('s3', region_name='us-east-1',
+                               aws_access_key_id='key',
+                               aws_secret_access_key='secret')
+        self.stubber = Stubber(self.s3)
+        self.handler = storage_handlers.S3StorageHandler(
+            config=TransferConfig(multipart_threshold=1,
+                                  part_size=self.PART_SIZE))
+        self.handler._create_provider = lambda info: _Provider(self.s3)
+        self.upload_info = {'s3BucketName': 'bucket', 's3ObjectKey': 'key',
+                            'amazonCredentials': {}}
+        self.data = os.urandom(self.PART_SIZE + 1024)
+        handle, self.source = tempfile.mkstemp()
+        with os.fdopen(handle, 'wb') as f:
+            f.write(self.data)
+
+    def tearDown(self):
+        os.remove(self.source)
+
+    def test_resume_multipart_upload(self):
+        first_etag = '"%s"' % hashlib.md5(
+            self.data[:self.PART_SIZE]).hexdigest()
+        initiated = datetime.datetime(2017, 5, 9)
+        # The upload being resumed is on the second page of the listing
+        self.stubber.add_response(
+            'list_multipart_uploads',
+            {'Uploads': [{'Key': 'key-other', 'UploadId': 'other',
+                          'Initiated': initiated}],
+             'IsTruncated': True, 'NextKeyMarker': 'key-other',
+             'NextUploadIdMarker': 'other'},
+            {'Bucket': 'bucket', 'Prefix': 'key'})
+        self.stubber.add_response(
+            'list_multipart_uploads',
+            {'Uploads': [{'Key': 'key', 'UploadId': 'upload',
+                          'Initiated': initiated}],
+             'IsTruncated': False},
+            {'Bucket': 'bucket', 'Prefix': 'key', 'KeyMarker': 'key-other',
+             'UploadIdMarker': 'other'})
+        self.stubber.add_response(
+            'list_parts',
+            {'Parts': [{'PartNumber': 1, 'ETag': first_etag,
+                        'Size': self.PART_SIZE}]},
+            {'Bucket': 'bucket', 'Key': 'key', 'UploadId': 'upload'})
+        # Only the missing part is uploaded
+        self.stubber.add_response(
+            'upload_part', {'ETag': '"second"'},
+            {'Bucket': 'bucket', 'Key': 'key', 'UploadId': 'upload',
+             'PartNumber': 2, 'Body': ANY, 'ContentMD5': ANY})
+        self.stubber.add_response(
+            'complete_multipart_upload', {},
+            {'Bucket': 'bucket', 'Key': 'key', 'UploadId': 'upload',
+             'MultipartUpload': {'Parts': [
+                 {'PartNumber': 1, 'ETag': first_etag},
+                 {'PartNumber': 2, 'ETag': '"second"'}]}})
+
+        self.handler.config = TransferConfig(
+            multipart_threshold=1, part_size=self.PART_SIZE,
+            checksums=('md5', 'sha256'))
+        checksums = {}
+        with self.stubber:
+            size = self.handler.upload(self.source, self.upload_info,
+                                       resume=True, checksums=checksums)
+
+        self.stubber.assert_no_pending_responses()
+        self.assertTrue(size == len(self.data),
+                        "Expected the size of the file to be returned")
+        self.assertTrue(
+            checksums['sha256'] == hashlib.sha256(self.data).hexdigest(),
+            "Expected the parts to be hashed in order")
+
+    def test_put_checksums(self):
+        client = _S3Client()
+        self.handler.config = TransferConfig(checksums=('md5', 'sha256'))
+        self.handler._create_provider = lambda info: _Provider(client)
+        checksums = {}
+
+        self.handler.upload(self.source, self.upload_info,
+                            checksums=checksums)
+
+        self.assertTrue(client.objects[('bucket', 'key')] == self.data,
+                        "Expected the file to be uploaded")
+        self.assertTrue(
+            checksums == {'md5': hashlib.md5(self.data).hexdigest(),
+                          'sha256': hashlib.sha256(self.data).hexdigest()},
+            "Expected the data sent to be hashed once")
+
+    def test_put_etag_mismatch(self):
+        client = _S3Client(etag='0' * 32)
+        self.handler.config = TransferConfig()
+        self.handler._create_provider = lambda info: _Provider(client)
+
+        with self.assertRaises(GSChecksumException):
+            self.handler.upload(self.source, self.upload_info)
+
+    def test_stream_put_etag_mismatch(self):
+        client = _S3Client(etag='0' * 32)
+        self.handler.config = TransferConfig()
+        self.handler._create_provider = lambda info: _Provider(client)
+
+        with self.assertRaises(GSChecksumException):
+            self.handler.upload_stream(io.BytesIO(b"data"), self.upload_info)
+
+
+class _SwiftResponse(object):
+
+    def __init__(self, etag=None):
+        self.status_code = 201
+        self.headers = {'ETag': etag} if etag else {}
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return []
+
+
+class _SwiftSession(object):
+    """
+    Stands in for a requests session, reading request bodies as
+    http.client does, and recording the segments and manifest received.
+    """
+
+    BLOCK_SIZE = 8192
+
+    def __init__(self, etag=None):
+        self.etag = etag
+        self.objects = {}
+        self.streamed = 0
+
+    def request(self, method, url, headers=None, timeout=None, data=None,
+                params=None):
+        if method != 'PUT' or data is None:
+            return _SwiftResponse()
+        if hasattr(data, 'read'):
+            self.streamed += 1
+            body = b"".join(iter(lambda: data.read(self.BLOCK_SIZE), b""))
+        else:
+            body = data.encode() if hasattr(data, 'encode') else data
+        self.objects[url] = body
+        return _SwiftResponse(self.etag or hashlib.md5(body).hexdigest())
+
+
+class SwiftStorageHandlerTestCase(unittest.TestCase):
+
+    UPLOAD_INFO = {'path': 'container/dir/file.bin', 'token': 'token',
+                   'swiftFileUrl': 'http://swift.example.org/v1/a'}
+
+    def setUp(self):
+        self.data = os.urandom(10000)
+        handle, self.source = tempfile.mkstemp()
+        with os.fdopen(handle, 'wb') as f:
+            f.write(self.data)
+
+    def tearDown(self):
+        os.remove(self.source)
+
+    def test_put_checksums(self):
+        session = _SwiftSession()
+        handler = storage_handlers.SwiftStorageHandler(
+            session=session, config=TransferConfig(checksums=('sha256',)))
+        checksums = {}
+
+        handler.upload(self.source, self.UPLOAD_INFO, checksums=checksums)
+
+        self.assertTrue(session.objects[
+            'http://swift.example.org/v1/a/container/dir/file.bin'] ==
+            self.data, "Expected the file to be uploaded as one object")
+        self.assertTrue(
+            checksums == {'sha256': hashlib.sha256(self.data).hexdigest()},
+            "Expected the data sent to be hashed")
+
+    def test_put_etag_mismatch(self):
+        handler = storage_handlers.SwiftStorageHandler(
+            session=_SwiftSession(etag='0' * 32))
+
+        with self.assertRaises(GSChecksumException):
+            handler.upload(self.source, self.UPLOAD_INFO)
+
+    def test_segmented_upload_streams_segments(self):
+        data = self.data
+        session = _SwiftSession()
+        handler = storage_handlers.SwiftStorageHandler(
+            session=session,
+            config=TransferConfig(segment_size=3000, max_streams=2))
+
+        size = handler.upload(self.source, self.UPLOAD_INFO)
+
+        manifest = json.loads(session.objects[
+            'http://swift.example.org/v1/a/container/dir/file.bin'].decode())
+        segments = [session.objects['http://swift.example.org/v1/a' +
+                                    quote(segment['path'])]
+                    for segment in manifest]
+        self.assertTrue(size == len(data) and b"".join(segments) == data,
+                        "Expected the file to be uploaded as segments")
+        self.assertTrue(
+            [segment['etag'] for segment in manifest] ==
+            [hashlib.md5(segment).hexdigest() for segment in segments],
+            "Expected segment checksums to be computed while streaming")
+        self.assertTrue(session.streamed == len(segments),
+                        "Expected segments to be streamed from the file")
+
+    def test_segmented_upload_hashes_segments_in_order(self):
+        session = _SwiftSession()
+        handler = storage_handlers.SwiftStorageHandler(
+            session=session,
+            config=TransferConfig(segment_size=3000, part_size=2000,
+                                  max_streams=3, checksums=('sha256',)))
+        checksums = {}
+
+        def update_from_file(*args):
+            self.fail("Expected the file not to be read again to hash it")
+
+        hasher_class = storage_handlers.StreamHasher
+        original = hasher_class.update_from_file
+        hasher_class.update_from_file = update_from_file
+        try:
+            handler.upload(self.source, self.UPLOAD_INFO,
+                           checksums=checksums)
+        finally:
+            hasher_class.update_from_file = original
+
+        manifest = json.loads(session.objects[
+            'http://swift.example.org/v1/a/container/dir/file.bin'].decode())
+        self.assertTrue(len(manifest) == 5,
+                        "Expected segments held in memory to be limited to"
+                        " the part size")
+        self.assertTrue(
+            checksums == {'sha256': hashlib.sha256(self.data).hexdigest()},
+            "Expected segments to be hashed in order")
+
+
+class _DownloadResponse(object):
+
+    def __init__(self, status_code, headers, body, fail_after=None,
+                 on_block=None):
+        self.status_code = status_code
+        self.headers = headers
+        self.body = body
+        self.fail_after = fail_after
+        self.on_block = on_block
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size):
+        for offset in range(0, len(self.body), chunk_size):
+            if self.fail_after is not None and offset >= self.fail_after:
+                raise requests.exceptions.ConnectionError("Connection reset")
+            if self.on_block:
+                self.on_block()
+            yield self.body[offset:offset + chunk_size]
+
+    def close(self):
+        pass
+
+
+class _DownloadSession(object):
+    """
+    Stands in for a requests session, serving an object with support for
+    ranges, and recording the Range header of each request. The first
+    response may be made to fail after some bytes. If a directory is
+    watched, its contents are recorded in ``seen`` as each block is sent.
+    """
+
+    ETAG = '"etag"'
+
+    def __init__(self, data, fail_after=None, watch=None):
+        self.data = data
+        self.fail_after = fail_after
+        self.watch = watch
+        self.ranges = []
+        self.seen = set()
+
+    def _on_block(self):
+        if self.watch:
+            self.seen.update(os.listdir(self.watch))
+
+    def get(self, url, stream=False, headers=None, timeout=None):
+        byte_range = (headers or {}).get('Range')
+        self.ranges.append(byte_range)
+        fail_after, self.fail_after = self.fail_after, None
+        headers = {'ETag': self.ETAG, 'Content-Length': str(len(self.data))}
+        if not byte_range:
+            return _DownloadResponse(200, headers, self.data, fail_after,
+                                     self._on_block)
+        offset = int(byte_range[len('bytes='):-1])
+        headers['Content-Range'] = 'bytes %d-%d/%d' % (
+            offset, len(self.data) - 1, len(self.data))
+        return _DownloadResponse(206, headers, self.data[offset:], fail_after,
+                                 self._on_block)
+
+
+class _ChangingSession(object):
+    """
+    Stands in for a requests session serving an object in ranges, which
+    is replaced once the range starting at ``change_at`` is requested. The
+    other ranges are sent slowly, and the number of blocks sent recorded.
+    """
+
+    ETAG = '"etag"'
+
+    def __init__(self, data, change_at):
+        self.data = data
+        self.change_at = change_at
+        self.changed = threading.Event()
+        self.blocks_sent = 0
+
+    def _send_slowly(self, body):
+        self.changed.wait(5)
+        for offset in range(0, len(body), 1000):
+            time.sleep(0.01)
+            self.blocks_sent += 1
+            yield body[offset:offset + 1000]
+
+    def get(self, url, stream=False, headers=None, timeout=None):
+        start, _, end = headers['Range'][len('bytes='):].partition('-')
+        start = int(start)
+        end = int(end) if end else len(self.data) - 1
+        headers = {'ETag': self.ETAG, 'Content-Length': str(len(self.data))}
+        if start == self.change_at:
+            # The object was replaced, so If-Range returns all of it
+            self.changed.set()
+            return _DownloadResponse(200, headers, self.data)
+        headers['Content-Range'] = 'bytes %d-%d/%d' % (start, end,
+                                                       len(self.data))
+        response = _DownloadResponse(206, headers,
+                                     self.data[start:end + 1])
+        if start:
+            response.iter_content = lambda chunk_size: self._send_slowly(
+                response.body)
+        return response
+
+
+class SimpleStorageHandlerTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.data = os.urandom(100000)
+        self.directory = tempfile.mkdtemp()
+        self.destination = os.path.join(self.directory, 'file.bin')
+        self.state_file = self.destination + storage_handlers.RESUME_SUFFIX
+        self.download_info = {'Location': 'http://storage.example.org/f'}
+
+    def tearDown(self):
+        for name in os.listdir(self.directory):
+            os.remove(os.path.join(self.directory, name))
+        os.rmdir(self.directory)
+
+    def test_resume_download(self):
+        # An interrupted download leaves a truncated file and its state
+        with open(self.destination, 'wb') as f:
+            f.write(self.data[:30000])
+        with open(self.state_file, 'w') as f:
+            json.dump({'etag': _DownloadSession.ETAG, 'last_modified': None,
+                       'size': len(self.data), 'md5': None}, f)
+        session = _DownloadSession(self.data)
+        handler = storage_handlers.SimpleStorageHandler(session=session)
+
+        size = handler.download(self.download_info, self.destination,
+                                resume=True)
+
+        self.assertTrue(session.ranges == ['bytes=30000-'],
+                        "Expected only the missing range to be requested")
+        with open(self.destination, 'rb') as f:
+            self.assertTrue(size == 70000 and f.read() == self.data,
+                            "Expected the download to be completed")
+        self.assertFalse(os.path.exists(self.state_file),
+                         "Expected resume state to be removed on completion")
+
+    def test_failed_download_state_removed(self):
+        session = _DownloadSession(self.data, fail_after=65536)
+        handler = storage_handlers.SimpleStorageHandler(session=session)
+
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            handler.download(self.download_info, self.destination)
+
+        self.assertFalse(os.path.exists(self.state_file),
+                         "Expected resume state of a download which will"
+                         " not be resumed to be removed")
+
+    def test_download_without_resume_keeps_no_state(self):
+        session = _DownloadSession(self.data, watch=self.directory)
+        handler = storage_handlers.SimpleStorageHandler(session=session)
+
+        handler.download(self.download_info, self.destination)
+
+        self.assertTrue(session.seen == set(['file.bin']),
+                        "Expected no resume state to be written for a"
+                        " download which will not be resumed")
+        self.assertTrue(os.listdir(self.directory) == ['file.bin'],
+                        "Expected no resume state to be left behind")
+
+    def test_changed_object_stops_parts(self):
+        session = _ChangingSession(self.data, change_at=50000)
+        handler = storage_handlers.SimpleStorageHandler(
+            session=session, config=TransferConfig(
+                multipart_threshold=1, part_size=25000, max_streams=4))
+
+        with self.assertRaises(storage_handlers._ObjectChanged):
+            handler.download(self.download_info, self.destination)
+
+        self.assertTrue(session.blocks_sent < 25,
+                        "Expected the other ranges to be stopped once the"
+                        " object changed")
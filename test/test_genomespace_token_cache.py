@@ -0,0 +1,47 @@
+import os
+import shutil
+import stat
+import tempfile
+import time
+import unittest
+
+from genomespaceclient.token_cache import TokenCache
+
+
+SERVER = "https://gs.example.org"
+
+
+class TokenCacheTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "tokens.json")
+        self.cache = TokenCache(self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_password_checked(self):
+        expires = time.time() + 3600
+        self.cache.put(SERVER, "user", "token", expires, "secret")
+
+        self.assertTrue(
+            self.cache.get(SERVER, "user", "secret") == ("token", expires),
+            "Expected the token to be returned with the same password")
+        self.assertTrue(self.cache.get(SERVER, "user", "wrong") is None,
+                        "Expected no token with a different password")
+        with open(self.path) as f:
+            self.assertFalse("secret" in f.read(),
+                             "Expected the password not to be stored")
+        self.assertTrue(stat.S_IMODE(os.stat(self.path).st_mode) == 0o600,
+                        "Expected the cache to be readable by its owner only")
+
+    def test_invalidate_token(self):
+        self.cache.put(SERVER, "user", "renewed", time.time() + 3600)
+
+        self.cache.invalidate(SERVER, "user", "stale")
+        self.assertTrue(self.cache.get(SERVER, "user") is not None,
+                        "Expected a token renewed since to be kept")
+        self.cache.invalidate(SERVER, "user", "renewed")
+        self.assertTrue(self.cache.get(SERVER, "user") is None,
+                        "Expected the token to be removed")